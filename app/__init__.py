@@ -1,5 +1,5 @@
 import os
-from flask import Flask, render_template
+from flask import Flask, render_template, flash, redirect, request, url_for
 from flask_login import current_user
 from datetime import datetime
 from dotenv import load_dotenv
@@ -7,6 +7,30 @@ from dotenv import load_dotenv
 from .extensions import db, bcrypt, login_manager
 
 
+def _add_missing_columns() -> None:
+    """Add model columns that are missing from tables created by an older version.
+
+    ``db.create_all`` only creates whole tables, so columns added to existing
+    models later are appended here with ``ALTER TABLE ... ADD COLUMN``. New
+    columns must therefore be nullable or carry a server default.
+    """
+    from sqlalchemy import inspect
+    from sqlalchemy.schema import CreateColumn
+
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                conn.execute(db.text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+
 def create_app() -> Flask:
     # Load .env from project root explicitly and override existing env vars
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -29,13 +53,45 @@ def create_app() -> Flask:
     db.init_app(app)
     bcrypt.init_app(app)
     login_manager.init_app(app)
+    from .services import passwords
+    passwords.init_app(app)
+
+    @app.errorhandler(passwords.PasswordHashingBusy)
+    def password_hashing_busy(_e):
+        flash("Lots of people are signing in right now. Please try again in a moment.", "warning")
+        return redirect(request.referrer or url_for("auth.login"))
+
+    # Jinja bytecode cache and rendered-fragment cache for interview pages
+    from .services import fragments
+    fragments.init_app(app)
+    from .services import pdf
+    pdf.init_app(app)
+    from .services import images
+    images.init_app(app)
+    # Fingerprinted, precompressed static files (see scripts/collect_static.py)
+    from .services import assets
+    assets.init_app(app)
+    # Batched writer for the LLM usage ledger
+    from .services import llm_usage
+    llm_usage.init_app(app)
+    # Server-Timing, SQL repeat warnings and the admin request profiler
+    from .services import instrumentation
+    instrumentation.init_app(app)
 
     # Create tables if not exist (for initial bootstrapping)
     with app.app_context():
         from .models import user, interview, media, prompt, summary  # noqa: F401
         from .models import persona  # registers CommStyle, Persona, PersonaStyle
+        from .models import import_state  # registers ImportCheckpoint, ImportIdMap
+        from .models import transcription  # registers TranscriptionJob
+        from .models import usage  # registers UsageRollup
+        from .models import llm_call  # registers LlmCall
+        from .models import opening_question  # registers OpeningQuestion
+        from .models import app_setting  # registers AppSetting
         from .models.user import User
         db.create_all()
+        _add_missing_columns()
+        passwords.settle_rounds(app)
 
         # Seed initial admin if none exists
         if User.query.count() == 0:
@@ -54,12 +110,14 @@ def create_app() -> Flask:
     from .blueprints.interview.routes import interview_bp
     from .blueprints.api.routes import api_bp
     from .blueprints.styles.routes import styles_bp
+    from .blueprints.media.routes import media_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp, url_prefix="/admin")
     app.register_blueprint(interview_bp, url_prefix="/interview")
     app.register_blueprint(api_bp, url_prefix="/api")
     app.register_blueprint(styles_bp, url_prefix="/styles")
+    app.register_blueprint(media_bp, url_prefix="/media")
 
     # Root
     @app.get("/")
@@ -71,16 +129,26 @@ def create_app() -> Flask:
                 from .models.interview import Interview, Message
                 from .models.summary import Summary
                 from .models.persona import Persona
+                from sqlalchemy import func
 
                 interviews = (
                     Interview.query.filter_by(user_id=current_user.id)
                     .order_by(Interview.created_at.desc())
                     .all()
                 )
-                # Compute simple message counts per interview id
-                msg_counts = {i.id: Message.query.filter_by(interview_id=i.id).count() for i in interviews}
+                # Message counts for all of the user's interviews in one grouped query
+                msg_counts = dict(
+                    db.session.query(Message.interview_id, func.count(Message.id))
+                    .join(Interview, Interview.id == Message.interview_id)
+                    .filter(Interview.user_id == current_user.id)
+                    .group_by(Message.interview_id)
+                    .all()
+                )
                 # Summary presence per interview id
-                summary_ids = {s.interview_id for s in Summary.query.filter_by(user_id=current_user.id).all()}
+                summary_ids = {
+                    interview_id
+                    for (interview_id,) in db.session.query(Summary.interview_id).filter_by(user_id=current_user.id, kind="session")
+                }
                 # Personas overview
                 persona_count = Persona.query.filter_by(user_id=current_user.id).count()
                 default_persona = (
@@ -95,7 +163,7 @@ def create_app() -> Flask:
                     summary_ids=summary_ids,
                     persona_count=persona_count,
                     default_persona=default_persona,
-                    summaries_count=Summary.query.filter_by(user_id=current_user.id).count(),
+                    summaries_count=len(summary_ids),
                 )
         except Exception:
             # If any dashboard query fails, render the page without dashboard data
@@ -104,4 +172,15 @@ def create_app() -> Flask:
         context.setdefault("current_year", datetime.utcnow().year)
         return render_template("index.html", **context)
 
+    if app.config["COMPRESS_RESPONSES"]:
+        from .middleware.compression import CompressionMiddleware
+
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            min_size=app.config["COMPRESS_MIN_SIZE"],
+            level=app.config["COMPRESS_LEVEL"],
+            brotli_quality=app.config["COMPRESS_BROTLI_QUALITY"],
+        )
+        app.extensions["compression"] = app.wsgi_app
+
     return app
@@ -1,9 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, abort, current_app, jsonify, render_template, request, redirect, session, url_for, flash
 from flask_login import login_required, current_user
 from ...extensions import db
 from ...models.user import User
 from ...models.prompt import Prompt
-from ...models.persona import CommStyle, Persona, PersonaStyle
+from ...models.persona import Persona, PersonaStyle
+from ...models.interview import Interview
+from ...services.interview_settings import invalidate_interview_settings
+from ...services import instrumentation, llm_usage, style_sync, usage
+from sqlalchemy import or_
 import yaml
 import os
 
@@ -24,60 +28,107 @@ def check_admin():
 @admin_bp.get("/")
 @login_required
 def dashboard():
-    users = User.query.order_by(User.created_at.desc()).all()
-    prompts = Prompt.query.order_by(Prompt.updated_at.desc()).all()
-    personas = Persona.query.order_by(Persona.is_system.desc(), Persona.name.asc()).all()
-    comm_styles = CommStyle.query.order_by(CommStyle.sort.asc(), CommStyle.style_name.asc()).all()
-    return render_template("admin/dashboard.html", users=users, prompts=prompts, personas=personas, comm_styles=comm_styles)
+    q = request.args.get("q", "").strip()
+    user_query = db.select(User).order_by(User.created_at.desc(), User.id.desc())
+    if q:
+        # Prefix match keeps the email index usable on large user tables
+        pattern = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        user_query = user_query.where(or_(User.email.like(pattern, escape="\\"), User.name.like(pattern, escape="\\")))
+    users = db.paginate(user_query, page=request.args.get("page", 1, type=int), per_page=25, error_out=False)
+    prompts = db.paginate(
+        db.select(Prompt).order_by(Prompt.updated_at.desc()),
+        page=request.args.get("prompts_page", 1, type=int),
+        per_page=10,
+        error_out=False,
+    )
+    return render_template(
+        "admin/dashboard.html",
+        users=users,
+        prompts=prompts,
+        q=q,
+        activity=usage.user_activity(u.id for u in users.items),
+        daily=usage.daily_totals(14),
+        rollups_as_of=usage.rollups_as_of(),
+    )
+
+
+@admin_bp.get("/metrics")
+@login_required
+def metrics():
+    # Counters are per worker process; each request sees the worker that served it
+    data = {"pid": os.getpid()}
+    compression = current_app.extensions.get("compression")
+    if compression is not None:
+        data["compression"] = compression.stats.as_dict()
+    ledger = current_app.extensions.get("llm_ledger")
+    if ledger is not None:
+        data["llm_ledger"] = ledger.stats()
+    return jsonify(data)
+
+
+@admin_bp.get("/llm-usage")
+@login_required
+def llm_usage_report():
+    days = max(1, min(request.args.get("days", 30, type=int), 365))
+    return render_template(
+        "admin/llm_usage.html",
+        days=days,
+        daily=llm_usage.by_day(days),
+        users=llm_usage.by_user(days),
+        interviews=llm_usage.by_interview(days),
+        purposes=llm_usage.by_purpose(days),
+    )
+
+
+@admin_bp.post("/profiling")
+@login_required
+def toggle_profiling():
+    enabled_raw = request.form.get("enabled") or (request.json.get("enabled") if request.is_json else None)
+    session[instrumentation.SESSION_KEY] = str(enabled_raw).lower() in {"1", "true", "on", "yes"}
+    if request.headers.get("X-Requested-With") == "fetch":
+        return ("", 204)
+    return redirect(request.referrer or url_for("admin.profiles"))
+
+
+@admin_bp.get("/profiles")
+@login_required
+def profiles():
+    return render_template(
+        "admin/profiles.html",
+        profiles=instrumentation.list_profiles(),
+        enabled=bool(session.get(instrumentation.SESSION_KEY)),
+    )
+
+
+@admin_bp.get("/profiles/<profile_id>")
+@login_required
+def profile_detail(profile_id: str):
+    sort = request.args.get("sort", "cumulative")
+    profile = instrumentation.load_profile(profile_id, sort=sort)
+    if profile is None:
+        abort(404)
+    return render_template("admin/profile_detail.html", profile=profile, sort=sort, sort_keys=instrumentation.SORT_KEYS)
 
 
 @admin_bp.post("/styles/seed")
 @login_required
 def seed_comm_styles():
-    # Load from ses_specs/comm_styles.yaml
-    root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))  # app/blueprints -> app
-    project_root = os.path.dirname(root)
-    yaml_path = os.path.join(project_root, "ses_specs", "comm_styles.yaml")
+    # Sync styles and system personas from ses_specs/comm_styles.yaml
+    dry_run = request.form.get("dry_run") == "1"
     try:
-        with open(yaml_path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f) or {}
-    except Exception as e:
-        flash(f"Failed to read comm_styles.yaml: {e}", "danger")
-        return redirect(url_for("admin.dashboard"))
+        plan = style_sync.sync_from_yaml(dry_run=dry_run)
+    except (OSError, yaml.YAMLError, style_sync.StyleSyncError) as e:
+        flash(f"Failed to sync comm_styles.yaml: {e}", "danger")
+        return redirect(request.referrer or url_for("admin.dashboard"))
 
-    created = 0
-    updated = 0
-    sort_index = 0
-    for key, prompt in data.items():
-        sort_index += 10
-        # Normalize key: handle YAML null key and whitespace
-        key_str = key if isinstance(key, str) else "null"
-        key_str = (key_str or "null").strip() or "null"
-        # Suggested display name
-        def _to_name(k: str) -> str:
-            base = k.replace("_", " ").replace("-", " ")
-            return base.title()
-
-        style = CommStyle.query.filter_by(key=key_str).first()
-        if style:
-            style.prompt = str(prompt or "").strip()
-            if not style.style_name:
-                style.style_name = _to_name(key_str)
-            style.sort = style.sort or sort_index
-            updated += 1
-        else:
-            style = CommStyle(
-                key=key_str,
-                style_name=_to_name(key_str),
-                visible=True,
-                sort=sort_index,
-                prompt=str(prompt or "").strip(),
-            )
-            db.session.add(style)
-            created += 1
-    db.session.commit()
-    flash(f"Styles synced. Created {created}, updated {updated}.", "success")
-    return redirect(url_for("admin.dashboard"))
+    if dry_run:
+        lines = [c.describe() for c in plan.changes[:20]]
+        if len(plan.changes) > 20:
+            lines.append(f"... and {len(plan.changes) - 20} more")
+        flash("Preview (nothing saved). " + plan.summary() + (" " + "; ".join(lines) if lines else ""), "info")
+    else:
+        flash("Styles synced. " + plan.summary(), "success")
+    return redirect(request.referrer or url_for("admin.dashboard"))
 
 
 @admin_bp.post("/personas")
@@ -107,14 +158,9 @@ def create_persona():
             Persona.query.filter_by(user_id=current_user.id, is_system=False, is_default=True).update({Persona.is_default: False})
 
     # Attach styles
-    for sid in style_ids:
-        try:
-            s_id = int(sid)
-        except Exception:
-            continue
-        if not CommStyle.query.get(s_id):
-            continue
-        db.session.add(PersonaStyle(persona_id=persona.id, comm_style_id=s_id))
+    db.session.add_all(
+        PersonaStyle(persona_id=persona.id, comm_style_id=s_id) for s_id in style_sync.existing_style_ids(style_ids)
+    )
 
     db.session.commit()
     flash("Persona saved", "success")
@@ -128,8 +174,13 @@ def delete_persona(persona_id: int):
     if not p.is_system and p.user_id != current_user.id and not current_user.is_admin:
         flash("Not authorized to delete this persona", "danger")
         return redirect(url_for("admin.dashboard"))
+    # Interviews that selected this persona fall back to the default
+    affected = [i for (i,) in db.session.query(Interview.id).filter_by(persona_id=p.id).all()]
+    Interview.query.filter_by(persona_id=p.id).update({Interview.persona_id: None})
     db.session.delete(p)
     db.session.commit()
+    for interview_id in affected:
+        invalidate_interview_settings(interview_id)
     flash("Persona deleted", "success")
     return redirect(url_for("admin.dashboard"))
 
@@ -65,7 +65,12 @@ def login_post():
     if not user.check_password(password):
         flash("Invalid credentials", "danger")
         return redirect(url_for("auth.login"))
-    
+
+    # Upgrade hashes made with an older work factor while we have the plaintext
+    if user.password_needs_rehash():
+        user.set_password(password)
+        db.session.commit()
+
     login_user(user)
     return redirect(url_for("index"))
 
@@ -1,11 +1,19 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, send_file, make_response, session
+from flask import Blueprint, current_app, jsonify, render_template, request, redirect, url_for, flash, abort, send_file, make_response, session, Response, stream_with_context
 from flask_login import login_required, current_user
 from ...extensions import db
 from ...models.interview import Interview, Message
 from ...models.summary import Summary
-from ...services.llm import get_chat_response, summarize_transcript
+from ...services.llm import get_chat_response
+from ...services.export import stream_account_archive
+from ...services.summaries import refresh_session_summary, summary_in_format
+from ...services.chat_turns import TurnBusy, run_turn, turn_key
+from ...services.opening_questions import RECOMMENDED_TOPICS, UNTITLED, start_interview
+from ...services.interview_settings import get_interview_settings, select_interview_persona, set_interview_flag
+from ...services import pdf
+from ...services.http_cache import make_etag, not_modified, cache_headers, cacheable
 from ...models.persona import Persona
-import io
+from sqlalchemy import and_, func, select
+from datetime import datetime
 
 
 interview_bp = Blueprint("interview", __name__)
@@ -20,35 +28,9 @@ def list_interviews():
         .all()
     )
 
-    # Suggested topics – complementary areas commonly included in a life history
-    recommended_topics = [
-        "Childhood",
-        "Family",
-        "School",
-        "Work and Career",
-        "Relationships",
-        "Marriage",
-        "Children",
-        "Hobbies",
-        "Travel",
-        "Traditions",
-        "Turning Points",
-        "Faith and Beliefs",
-        "Homes and Places Lived",
-        "Military Service",
-        "Community Service",
-        "Health and Challenges",
-        "Technology in Your Life",
-        "Daily Life and Routines",
-        "Holidays and Celebrations",
-        "Favorite Books and Movies",
-        "Lessons Learned",
-        "Advice to Descendants",
-    ]
-
     existing_titles_lower = {i.title.strip().lower() for i in interviews if i.title}
     suggestions = [
-        t for t in recommended_topics if t.strip().lower() not in existing_titles_lower
+        t for t in RECOMMENDED_TOPICS if t.strip().lower() not in existing_titles_lower
     ][:10]
 
     return render_template(
@@ -56,13 +38,29 @@ def list_interviews():
     )
 
 
+@interview_bp.get("/export/archive")
+@login_required
+def export_account_archive():
+    # Streamed as it is built so large family archives never sit in memory or on disk
+    stamp = datetime.utcnow().strftime("%Y-%m-%d")
+    response = Response(
+        stream_with_context(stream_account_archive(current_user.id)),
+        mimetype="application/zip",
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename=chatmyhistory_export_{stamp}.zip"
+    # Tell nginx-style proxies not to buffer the whole body before relaying it
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 @interview_bp.post("/")
 @login_required
 def create_interview():
-    title = request.form.get("title", "").strip() or "Untitled Topic"
+    title = request.form.get("title", "").strip() or UNTITLED
     interview = Interview(user_id=current_user.id, title=title)
     db.session.add(interview)
     db.session.commit()
+    start_interview(interview)
     return redirect(url_for("interview.view_interview", interview_id=interview.id))
 
 
@@ -73,7 +71,38 @@ def view_interview(interview_id: int):
     if interview.user_id != current_user.id and not current_user.is_admin:
         flash("Not authorized", "danger")
         return redirect(url_for("interview.list_interviews"))
-    messages = Message.query.filter_by(interview_id=interview.id).order_by(Message.created_at.asc()).all()
+
+    # Everything the page shows is covered by these versions; answer 304 before loading messages
+    msg_count, last_msg_id, last_msg_at = db.session.execute(
+        select(func.count(Message.id), func.max(Message.id), func.max(Message.created_at))
+        .where(Message.interview_id == interview.id)
+    ).one()
+    summary_updated_at = db.session.execute(
+        select(Summary.updated_at).where(Summary.interview_id == interview.id, Summary.kind == "session")
+    ).scalar()
+    persona_count, personas_updated_at = db.session.execute(
+        select(func.count(Persona.id), func.max(Persona.updated_at))
+        .where((Persona.user_id == current_user.id) | (Persona.is_system == True))  # noqa: E712
+    ).one()
+    has_legacy_session = any(
+        f"{prefix}_{interview.id}" in session for prefix in ("sel_persona", "debug_chat", "no_thread")
+    )
+    etag = make_etag(
+        "transcript", interview.id, interview.title, msg_count, last_msg_id, summary_updated_at,
+        persona_count, personas_updated_at, get_interview_settings(interview.id),
+        current_user.id, current_user.version, bool(session.get("profile_requests")),
+    )
+    last_modified = max(d for d in (last_msg_at, summary_updated_at, interview.created_at) if d)
+    if not has_legacy_session:
+        cached = not_modified(etag, last_modified)
+        if cached is not None:
+            return cached
+
+    messages = (
+        Message.query.filter_by(interview_id=interview.id)
+        .order_by(Message.created_at.asc(), Message.id.asc())
+        .all()
+    )
     # Try to load existing session summary (if any) for quick link/UI cue
     summary = Summary.query.filter_by(interview_id=interview.id, kind="session").first()
     # Persona dropdown data
@@ -82,18 +111,24 @@ def view_interview(interview_id: int):
         .order_by(Persona.is_system.desc(), Persona.name.asc())
         .all()
     )
+    settings = get_interview_settings(interview.id)
+    # One-time move of selections left in older cookie sessions to the server-side store
+    legacy_persona = session.pop(f"sel_persona_{interview.id}", None)
+    session.pop(f"debug_chat_{interview.id}", None)
+    session.pop(f"no_thread_{interview.id}", None)
+    if legacy_persona and settings.persona_id is None:
+        try:
+            legacy_id = int(legacy_persona)
+        except (TypeError, ValueError):
+            legacy_id = None
+        if legacy_id and any(p.id == legacy_id for p in personas):
+            select_interview_persona(interview.id, legacy_id)
+            settings = get_interview_settings(interview.id)
+
     # Determine selected persona: per-interview selection overrides defaults
     selected_persona_id = None
-    # Try session override first
-    sel_key = f"sel_persona_{interview.id}"
-    try:
-        sel_val = session.get(sel_key)
-        if sel_val:
-            sel_val_int = int(sel_val)
-            if any(p.id == sel_val_int for p in personas):
-                selected_persona_id = sel_val_int
-    except Exception:
-        selected_persona_id = None
+    if settings.persona_id and any(p.id == settings.persona_id for p in personas):
+        selected_persona_id = settings.persona_id
     # Fallback to default persona (user default then system default)
     if not selected_persona_id:
         for p in personas:
@@ -101,21 +136,11 @@ def view_interview(interview_id: int):
                 selected_persona_id = p.id
                 break
 
-    # Debug toggle from session (admin-only UI will control this)
-    debug_enabled = False
-    try:
-        debug_enabled = bool(session.get(f"debug_chat_{interview.id}"))
-    except Exception:
-        debug_enabled = False
+    # Admin-only toggles (debug dump, no-thread)
+    debug_enabled = settings.debug_chat
+    no_thread_enabled = settings.no_thread
 
-    # No-thread toggle from session (admin-only UI)
-    no_thread_enabled = False
-    try:
-        no_thread_enabled = session.get(f"no_thread_{interview.id}") == "1"
-    except Exception:
-        no_thread_enabled = False
-
-    return render_template(
+    response = make_response(render_template(
         "interview/detail.html",
         interview=interview,
         messages=messages,
@@ -124,7 +149,25 @@ def view_interview(interview_id: int):
         selected_persona_id=selected_persona_id,
         debug_enabled=debug_enabled,
         no_thread_enabled=no_thread_enabled,
-    )
+        # Same for every render of this transcript state, so a resubmitted form reuses its turn
+        turn_state=f"{msg_count}-{last_msg_id or 0}",
+    ))
+    if not has_legacy_session and cacheable():
+        cache_headers(response, etag, last_modified)
+    return response
+
+
+@interview_bp.get("/<int:interview_id>/opening")
+@login_required
+def opening_status(interview_id: int):
+    # Polled by an empty transcript while its opening question is generated
+    interview = Interview.query.get_or_404(interview_id)
+    if interview.user_id != current_user.id and not current_user.is_admin:
+        abort(404)
+    count = db.session.execute(
+        select(func.count(Message.id)).where(Message.interview_id == interview.id)
+    ).scalar()
+    return jsonify({"ready": bool(count)})
 
 
 @interview_bp.post("/<int:interview_id>/send")
@@ -139,16 +182,21 @@ def send_message(interview_id: int):
     if not content:
         return redirect(url_for("interview.view_interview", interview_id=interview.id))
 
-    user_msg = Message(interview_id=interview.id, role="user", content=content)
-    db.session.add(user_msg)
-    db.session.commit()
+    _run_turn(
+        interview.id,
+        "send",
+        content,
+        lambda: Message(interview_id=interview_id, role="user", content=content),
+    )
+    return redirect(url_for("interview.view_interview", interview_id=interview_id))
 
-    assistant_content = get_chat_response(interview_id=interview.id)
-    assistant_msg = Message(interview_id=interview.id, role="assistant", content=assistant_content)
-    db.session.add(assistant_msg)
-    db.session.commit()
 
-    return redirect(url_for("interview.view_interview", interview_id=interview.id))
+def _run_turn(interview_id: int, kind: str, content: str, make_message) -> None:
+    key = turn_key(request.form.get("idempotency_key") or request.headers.get("Idempotency-Key"), kind, content)
+    try:
+        run_turn(interview_id, key, kind, make_message, lambda: get_chat_response(interview_id=interview_id))
+    except TurnBusy:
+        flash("Still answering your previous message. Please try again in a moment.", "warning")
 
 
 @interview_bp.post("/<int:interview_id>/rename")
@@ -159,7 +207,7 @@ def rename_interview(interview_id: int):
         flash("Not authorized", "danger")
         return redirect(url_for("interview.list_interviews"))
 
-    new_title = request.form.get("title", "").strip() or "Untitled Topic"
+    new_title = request.form.get("title", "").strip() or UNTITLED
     interview.title = new_title
     db.session.commit()
     flash("Topic title updated.", "success")
@@ -182,16 +230,13 @@ def change_topic(interview_id: int):
         "Ask exactly one concise, warm question to begin the new topic."
     )
 
-    sys_msg = Message(interview_id=interview.id, role="system", content=system_instruction)
-    db.session.add(sys_msg)
-    db.session.commit()
-
-    assistant_content = get_chat_response(interview_id=interview.id)
-    assistant_msg = Message(interview_id=interview.id, role="assistant", content=assistant_content)
-    db.session.add(assistant_msg)
-    db.session.commit()
-
-    return redirect(url_for("interview.view_interview", interview_id=interview.id))
+    _run_turn(
+        interview.id,
+        "change_topic",
+        system_instruction,
+        lambda: Message(interview_id=interview_id, role="system", content=system_instruction),
+    )
+    return redirect(url_for("interview.view_interview", interview_id=interview_id))
 
 
 @interview_bp.post("/<int:interview_id>/persona")
@@ -201,7 +246,7 @@ def set_interview_persona(interview_id: int):
     if interview.user_id != current_user.id and not current_user.is_admin:
         return ("", 403)
 
-    pid_raw = request.form.get("persona_id") or request.json.get("persona_id") if request.is_json else None
+    pid_raw = request.form.get("persona_id") or (request.json.get("persona_id") if request.is_json else None)
     try:
         pid = int(pid_raw) if pid_raw is not None else None
     except Exception:
@@ -214,7 +259,7 @@ def set_interview_persona(interview_id: int):
     if not p or (not p.is_system and p.user_id != current_user.id):
         return ("", 404)
 
-    session[f"sel_persona_{interview.id}"] = pid
+    select_interview_persona(interview.id, pid)
     # Return no content for XHR or redirect back if normal form post
     if request.headers.get("X-Requested-With") == "fetch":
         return ("", 204)
@@ -230,7 +275,7 @@ def toggle_debug(interview_id: int):
     # Accept form or JSON
     enabled_raw = request.form.get("enabled") or (request.json.get("enabled") if request.is_json else None)
     enabled = str(enabled_raw).lower() in {"1", "true", "on", "yes"}
-    session[f"debug_chat_{interview.id}"] = "1" if enabled else "0"
+    set_interview_flag(interview.id, "debug_chat", enabled)
     # For fetch requests, send no content
     if request.headers.get("X-Requested-With") == "fetch":
         return ("", 204)
@@ -245,7 +290,7 @@ def toggle_no_thread(interview_id: int):
         return ("", 403)
     enabled_raw = request.form.get("enabled") or (request.json.get("enabled") if request.is_json else None)
     enabled = str(enabled_raw).lower() in {"1", "true", "on", "yes"}
-    session[f"no_thread_{interview.id}"] = "1" if enabled else "0"
+    set_interview_flag(interview.id, "no_thread", enabled)
     if request.headers.get("X-Requested-With") == "fetch":
         return ("", 204)
     return redirect(url_for("interview.view_interview", interview_id=interview.id))
@@ -259,116 +304,118 @@ def summarize_interview(interview_id: int):
         flash("Not authorized", "danger")
         return redirect(url_for("interview.list_interviews"))
 
-    # Fetch transcript
-    history = (
-        Message.query.filter_by(interview_id=interview.id)
-        .order_by(Message.created_at.asc())
-        .all()
-    )
-    if not history:
-        flash("No messages to summarize yet.", "warning")
-        return redirect(url_for("interview.view_interview", interview_id=interview.id))
-
-    convo = [{"role": m.role, "content": m.content} for m in history]
-
-    # Generate structured HTML summary via LLM
-    def _strip_code_fences(text: str) -> str:
-        t = text.strip()
-        if t.startswith("```"):
-            # Remove leading ```lang and trailing ```
-            first_newline = t.find("\n")
-            if first_newline != -1:
-                t = t[first_newline + 1 :]
-            if t.endswith("```"):
-                t = t[:-3]
-            return t.strip()
-        return t
-
+    person_name = current_user.name if current_user.is_authenticated else None
     try:
-        person_name = current_user.name if current_user.is_authenticated else None
-        html = summarize_transcript(convo, output_format="html", person_name=person_name)
-        html = _strip_code_fences(html)
+        result = refresh_session_summary(
+            interview.id, interview.user_id, person_name=person_name, full=request.form.get("full") == "1"
+        )
+    except LookupError as e:
+        flash(str(e), "warning")
+        return redirect(url_for("interview.view_interview", interview_id=interview_id))
     except Exception as e:
         flash(f"Summarization failed: {e}", "danger")
-        return redirect(url_for("interview.view_interview", interview_id=interview.id))
+        return redirect(url_for("interview.view_interview", interview_id=interview_id))
+
+    if result.mode == "unchanged":
+        flash("The summary already covers the whole conversation.", "info")
+    return redirect(url_for("interview.view_summary", interview_id=interview_id))
 
-    # Upsert summary record
-    summary = Summary.query.filter_by(interview_id=interview.id, kind="session").first()
-    if summary:
-        summary.content = html
-    else:
-        summary = Summary(user_id=interview.user_id, interview_id=interview.id, kind="session", format="html", content=html)
-        db.session.add(summary)
-    db.session.commit()
 
-    return redirect(url_for("interview.view_summary", interview_id=interview.id))
+def _summary_version(interview_id: int):
+    """(owner user id, summary id, summary updated_at, interview title) in one indexed lookup; 404 if no interview."""
+    row = db.session.execute(
+        select(Interview.user_id, Summary.id, Summary.updated_at, Interview.title)
+        .outerjoin(Summary, and_(Summary.interview_id == Interview.id, Summary.kind == "session"))
+        .where(Interview.id == interview_id)
+    ).first()
+    if row is None:
+        abort(404)
+    return row
 
 
 @interview_bp.get("/<int:interview_id>/summary")
 @login_required
 def view_summary(interview_id: int):
-    interview = Interview.query.get_or_404(interview_id)
-    if interview.user_id != current_user.id and not current_user.is_admin:
+    owner_id, summary_id, summary_updated_at, title = _summary_version(interview_id)
+    if owner_id != current_user.id and not current_user.is_admin:
         flash("Not authorized", "danger")
         return redirect(url_for("interview.list_interviews"))
+    if summary_id is not None:
+        # The page shows the interview title, which a rename changes without touching the summary
+        etag = make_etag("summary", summary_id, summary_updated_at, title, current_user.id, current_user.version)
+        cached = not_modified(etag, summary_updated_at)
+        if cached is not None:
+            return cached
 
+    interview = Interview.query.get_or_404(interview_id)
     summary = Summary.query.filter_by(interview_id=interview.id, kind="session").first()
     if not summary:
         # Offer to create one if missing
         flash("No summary yet. Generate one from the interview page.", "info")
         return redirect(url_for("interview.view_interview", interview_id=interview.id))
 
-    return render_template("interview/summary.html", interview=interview, summary=summary)
+    response = make_response(render_template("interview/summary.html", interview=interview, summary=summary))
+    if cacheable():
+        etag = make_etag("summary", summary.id, summary.updated_at, interview.title, current_user.id, current_user.version)
+        cache_headers(response, etag, summary.updated_at)
+    return response
+
+
+EXPORT_FORMATS = {
+    "markdown": ("text/markdown; charset=utf-8", "md"),
+    "text": ("text/plain; charset=utf-8", "txt"),
+}
 
 
 @interview_bp.get("/<int:interview_id>/export/markdown")
 @login_required
 def export_summary_markdown(interview_id: int):
-    interview = Interview.query.get_or_404(interview_id)
-    if interview.user_id != current_user.id and not current_user.is_admin:
-        flash("Not authorized", "danger")
-        return redirect(url_for("interview.list_interviews"))
+    return _export_summary(interview_id, "markdown")
 
-    history = (
-        Message.query.filter_by(interview_id=interview.id)
-        .order_by(Message.created_at.asc())
-        .all()
-    )
-    if not history:
-        flash("No messages to summarize yet.", "warning")
-        return redirect(url_for("interview.view_interview", interview_id=interview.id))
 
-    convo = [{"role": m.role, "content": m.content} for m in history]
+@interview_bp.get("/<int:interview_id>/export/text")
+@login_required
+def export_summary_text(interview_id: int):
+    return _export_summary(interview_id, "text")
 
-    def _strip_code_fences(text: str) -> str:
-        t = text.strip()
-        if t.startswith("```"):
-            first_newline = t.find("\n")
-            if first_newline != -1:
-                t = t[first_newline + 1 :]
-            if t.endswith("```"):
-                t = t[:-3]
-            return t.strip()
-        return t
 
-    person_name = current_user.name if current_user.is_authenticated else None
-    md = summarize_transcript(convo, output_format="markdown", person_name=person_name)
-    md = _strip_code_fences(md)
+def _export_summary(interview_id: int, fmt: str):
+    # Converted locally from the stored HTML summary, so the download matches what the user saw
+    owner_id, summary_id, summary_updated_at, _title = _summary_version(interview_id)
+    if owner_id != current_user.id and not current_user.is_admin:
+        flash("Not authorized", "danger")
+        return redirect(url_for("interview.list_interviews"))
+    if summary_id is None:
+        flash("No summary available to export. Generate one first.", "warning")
+        return redirect(url_for("interview.view_interview", interview_id=interview_id))
+    etag = make_etag(f"summary-{fmt}", summary_id, summary_updated_at)
+    cached = not_modified(etag, summary_updated_at)
+    if cached is not None:
+        return cached
 
-    response = make_response(md)
-    response.headers["Content-Type"] = "text/markdown; charset=utf-8"
-    response.headers["Content-Disposition"] = (
-        f"attachment; filename=interview_{interview.id}_summary.md"
-    )
-    return response
+    summary = db.session.get(Summary, summary_id)
+    content = summary_in_format(summary, fmt)
+
+    mimetype, ext = EXPORT_FORMATS[fmt]
+    response = make_response(content)
+    response.headers["Content-Type"] = mimetype
+    response.headers["Content-Disposition"] = f"attachment; filename=interview_{interview_id}_summary.{ext}"
+    return cache_headers(response, etag, summary_updated_at)
 
 
 @interview_bp.get("/<int:interview_id>/export/pdf")
 @login_required
 def export_summary_pdf(interview_id: int):
-    try:
-        from xhtml2pdf import pisa  # type: ignore
-    except Exception:
+    owner_id, summary_id, summary_updated_at, _title = _summary_version(interview_id)
+    if owner_id != current_user.id and not current_user.is_admin:
+        flash("Not authorized", "danger")
+        return redirect(url_for("interview.list_interviews"))
+    if summary_id is not None:
+        cached = not_modified(make_etag("summary-pdf", summary_id, summary_updated_at, pdf.PDF_TEMPLATE_VERSION), summary_updated_at)
+        if cached is not None:
+            return cached
+
+    if not pdf.available():
         flash(
             "Sorry, I cannot export a PDF right now. Please tell the administrator 'PDF export requires xhtml2pdf. Please install dependencies and retry.'",
             "danger",
@@ -376,36 +423,24 @@ def export_summary_pdf(interview_id: int):
         return redirect(url_for("interview.view_summary", interview_id=interview_id))
 
     interview = Interview.query.get_or_404(interview_id)
-    if interview.user_id != current_user.id and not current_user.is_admin:
-        flash("Not authorized", "danger")
-        return redirect(url_for("interview.list_interviews"))
-
     summary = Summary.query.filter_by(interview_id=interview.id, kind="session").first()
     if not summary:
         flash("No summary available to export. Generate one first.", "warning")
         return redirect(url_for("interview.view_interview", interview_id=interview.id))
 
-    html_doc = f"""
-    <html><head>
-    <meta charset='utf-8'>
-    <style>
-      body {{ font-family: DejaVu Sans, Arial, sans-serif; }}
-      h1, h2, h3 {{ color: #111; }}
-      .standout {{ font-style: italic; }}
-    </style>
-    </head><body>
-    {summary.content}
-    </body></html>
-    """
-
-    buffer = io.BytesIO()
-    pisa.CreatePDF(io.StringIO(html_doc), dest=buffer)  # type: ignore
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
-
-    return send_file(
-        io.BytesIO(pdf_bytes),
+    try:
+        path = pdf.summary_pdf_path(summary)
+    except Exception as e:
+        current_app.logger.exception("PDF export failed for summary %s", summary.id)
+        flash(f"PDF export failed: {e}", "danger")
+        return redirect(url_for("interview.view_summary", interview_id=interview.id))
+
+    etag = make_etag("summary-pdf", summary.id, summary.updated_at, pdf.PDF_TEMPLATE_VERSION)
+    response = send_file(
+        path,
         mimetype="application/pdf",
         as_attachment=True,
         download_name=f"interview_{interview.id}_summary.pdf",
-    )
\ No newline at end of file
+        etag=False,
+    )
+    return cache_headers(response, etag, summary.updated_at)
\ No newline at end of file
@@ -0,0 +1,233 @@
+from flask import Blueprint, Response, jsonify, request, abort, url_for, send_file, current_app
+from flask_login import login_required, current_user
+from ...extensions import db
+from ...models.interview import Interview, Message
+from ...models.media import Media, Upload
+from ...models.transcription import TranscriptionJob
+from ...services.transcription import create_job, job_state
+from ...services import images
+from ...services.storage import blob_sha256, resolve_storage_path, storage_roots
+import mimetypes
+import os
+from ...services.uploads import (
+    UploadError,
+    cancel_upload,
+    complete_upload,
+    start_upload,
+    upload_state,
+    write_chunk,
+)
+
+
+media_bp = Blueprint("media", __name__)
+
+
+@media_bp.errorhandler(UploadError)
+def upload_error(e: UploadError):
+    return jsonify({"error": str(e), **e.extra}), e.status
+
+
+def _media_json(media: Media) -> dict:
+    return {
+        "status": "complete",
+        "media_id": media.id,
+        "kind": media.kind,
+        "sha256": media.sha256,
+        "size": media.size_bytes,
+    }
+
+
+def _own_upload(upload_id: str) -> Upload:
+    upload = db.session.get(Upload, upload_id)
+    if upload is None or upload.user_id != current_user.id:
+        abort(404)
+    return upload
+
+
+@media_bp.post("/uploads")
+@login_required
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    interview_id = data.get("interview_id")
+    if interview_id is not None:
+        interview = db.session.get(Interview, interview_id)
+        if interview is None or interview.user_id != current_user.id:
+            abort(404)
+    result = start_upload(
+        current_user.id,
+        data.get("filename", ""),
+        data.get("size"),
+        mime_type=data.get("mime_type"),
+        kind=data.get("kind"),
+        sha256=data.get("sha256"),
+        interview_id=interview_id,
+    )
+    if isinstance(result, Media):
+        # Already stored for this user; nothing to send
+        return jsonify(_media_json(result)), 200
+    body = upload_state(result)
+    body["upload_url"] = url_for("media.upload_chunk", upload_id=result.id)
+    return jsonify(body), 201
+
+
+@media_bp.get("/uploads/<upload_id>")
+@login_required
+def get_upload(upload_id: str):
+    return jsonify(upload_state(_own_upload(upload_id)))
+
+
+@media_bp.put("/uploads/<upload_id>")
+@login_required
+def upload_chunk(upload_id: str):
+    upload = _own_upload(upload_id)
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        raise UploadError("Upload-Offset header is required")
+    # request.stream is bounded by Content-Length and is never buffered whole
+    upload = write_chunk(upload, offset, request.stream, request.content_length, request.headers.get("X-Chunk-Sha256"))
+    return jsonify(upload_state(upload))
+
+
+@media_bp.post("/uploads/<upload_id>/complete")
+@login_required
+def finish_upload(upload_id: str):
+    upload = _own_upload(upload_id)
+    data = request.get_json(silent=True) or {}
+    media = complete_upload(upload, caption=(data.get("caption") or None))
+    if current_app.config.get("IMAGE_EAGER_DERIVATIVES", True):
+        images.warm(media)
+    return jsonify(_media_json(media))
+
+
+@media_bp.delete("/uploads/<upload_id>")
+@login_required
+def delete_upload(upload_id: str):
+    cancel_upload(_own_upload(upload_id))
+    return "", 204
+
+
+@media_bp.post("/<int:media_id>/transcribe")
+@login_required
+def transcribe_media(media_id: int):
+    media = db.session.get(Media, media_id)
+    if media is None or media.user_id != current_user.id:
+        abort(404)
+    if media.kind not in ("audio", "video"):
+        return jsonify({"error": "Only audio or video can be transcribed"}), 400
+    data = request.get_json(silent=True) or {}
+    interview_id = data.get("interview_id") or media.interview_id
+    interview = db.session.get(Interview, interview_id) if interview_id else None
+    if interview is None or interview.user_id != current_user.id:
+        return jsonify({"error": "Choose the interview the recording belongs to"}), 400
+    job = create_job(media, interview.id, language=data.get("language"))
+    body = job_state(job)
+    body["status_url"] = url_for("media.transcription_status", job_id=job.id)
+    return jsonify(body), 202
+
+
+@media_bp.get("/transcriptions/<int:job_id>")
+@login_required
+def transcription_status(job_id: int):
+    job = db.session.get(TranscriptionJob, job_id)
+    if job is None or job.user_id != current_user.id:
+        abort(404)
+    return jsonify(job_state(job))
+
+
+@media_bp.get("/<int:media_id>/image/<size>")
+@login_required
+def media_image(media_id: int, size: str):
+    media = db.session.get(Media, media_id)
+    if media is None or (media.user_id != current_user.id and not current_user.is_admin):
+        abort(404)
+    if media.kind != "photo" or size not in images.SIZES or not images.available():
+        abort(404)
+    # Only browsers that name WebP explicitly get it; "image/*" is not enough
+    fmt = "webp" if "image/webp" in request.accept_mimetypes.values() else "jpeg"
+    try:
+        path = images.derivative(media, size, fmt)
+    except images.ImageUndecodable:
+        abort(415)
+    except images.ImageUnavailable:
+        abort(404)
+    except images.ImageRenderTimeout:
+        # The render keeps going in the pool; the next request will usually find it done
+        response = Response("Image is still being prepared", status=503, mimetype="text/plain")
+        response.headers["Retry-After"] = "5"
+        return response
+    response = send_file(path, mimetype=images.FORMATS[fmt][1], max_age=365 * 24 * 3600)
+    # The original never changes (stored by hash), so neither does its rendition
+    response.cache_control.private = True
+    response.cache_control.public = False
+    response.cache_control.immutable = True
+    response.vary.add("Accept")
+    return response
+
+
+def _serve_stored_file(stored_path: str, mimetype: str | None, download_name: str | None = None):
+    """Send a stored file with Range/If-Range support, or hand it to the front-end server.
+
+    MEDIA_SENDFILE=x-accel emits X-Accel-Redirect to ``MEDIA_ACCEL_PREFIX/<n>/<path>``
+    (n = index of the storage root: 0 for MEDIA_DIR, 1 for UPLOAD_DIR) for an
+    nginx ``internal`` location; x-sendfile emits the absolute path for Apache's
+    mod_xsendfile. Otherwise Flask serves the file itself, which honours ranges
+    and uses the WSGI server's sendfile support where it has one.
+    """
+    path = resolve_storage_path(stored_path)
+    if path is None:
+        abort(404)
+    # Blobs are named by hash alone, so the original name is the better guide to the type
+    mimetype = mimetype or mimetypes.guess_type(download_name or path)[0] or "application/octet-stream"
+    mode = current_app.config.get("MEDIA_SENDFILE", "")
+    if mode in ("x-accel", "x-sendfile"):
+        response = Response(mimetype=mimetype)
+        if mode == "x-accel":
+            real = os.path.realpath(path)
+            for index, root in enumerate(map(os.path.realpath, storage_roots())):
+                if real.startswith(root + os.sep):
+                    rel = os.path.relpath(real, root).replace(os.sep, "/")
+                    prefix = current_app.config.get("MEDIA_ACCEL_PREFIX", "/_protected").rstrip("/")
+                    response.headers["X-Accel-Redirect"] = f"{prefix}/{index}/{rel}"
+                    break
+            else:
+                abort(404)
+        else:
+            response.headers["X-Sendfile"] = path
+        if download_name:
+            response.headers.set("Content-Disposition", "inline", filename=download_name)
+    else:
+        response = send_file(path, mimetype=mimetype, conditional=True, download_name=download_name)
+    response.headers["Accept-Ranges"] = "bytes"
+    response.cache_control.private = True
+    response.cache_control.max_age = 3600
+    return response
+
+
+@media_bp.get("/<int:media_id>/file")
+@login_required
+def media_file(media_id: int):
+    media = db.session.get(Media, media_id)
+    if media is None or (media.user_id != current_user.id and not current_user.is_admin):
+        abort(404)
+    return _serve_stored_file(media.file_path, media.mime_type, media.original_name)
+
+
+@media_bp.get("/messages/<int:message_id>/audio")
+@login_required
+def message_audio(message_id: int):
+    row = db.session.execute(
+        db.select(Message.audio_path, Interview.user_id)
+        .join(Interview, Interview.id == Message.interview_id)
+        .where(Message.id == message_id)
+    ).first()
+    if row is None or not row.audio_path or (row.user_id != current_user.id and not current_user.is_admin):
+        abort(404)
+    mimetype = None
+    sha256 = blob_sha256(row.audio_path)
+    if sha256:
+        # Transcribed segments point at the recording's blob, which has no extension to guess from
+        mimetype = db.session.execute(
+            db.select(Media.mime_type).where(Media.sha256 == sha256, Media.mime_type.is_not(None)).limit(1)
+        ).scalar()
+    return _serve_stored_file(row.audio_path, mimetype)
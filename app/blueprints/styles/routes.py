@@ -2,11 +2,20 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from ...extensions import db
 from ...models.persona import CommStyle, Persona, PersonaStyle
+from ...models.user import User
+from ...services.style_sync import existing_style_ids
 
 
 styles_bp = Blueprint("styles", __name__)
 
 
+def _set_my_default_persona(persona_id):
+	# current_user is a cached snapshot, so write through the ORM row
+	me = User.query.get(current_user.id)
+	if me:
+		me.default_persona_id = persona_id
+
+
 @styles_bp.get("/")
 @login_required
 def styles_home():
@@ -54,15 +63,10 @@ def create_persona():
 	db.session.flush()
 	if is_default:
 		Persona.query.filter_by(user_id=current_user.id, is_system=False, is_default=True).update({Persona.is_default: False})
-		current_user.default_persona_id = persona.id
-	for sid in style_ids:
-		try:
-			s_id = int(sid)
-		except Exception:
-			continue
-		if not CommStyle.query.get(s_id):
-			continue
-		db.session.add(PersonaStyle(persona_id=persona.id, comm_style_id=s_id))
+		_set_my_default_persona(persona.id)
+	db.session.add_all(
+		PersonaStyle(persona_id=persona.id, comm_style_id=s_id) for s_id in existing_style_ids(style_ids)
+	)
 	db.session.commit()
 	flash("Persona saved", "success")
 	return redirect(url_for("styles.styles_home"))
@@ -77,7 +81,7 @@ def set_default_persona(persona_id: int):
 		return redirect(url_for("styles.styles_home"))
 	Persona.query.filter_by(user_id=current_user.id, is_system=False, is_default=True).update({Persona.is_default: False})
 	p.is_default = True
-	current_user.default_persona_id = p.id
+	_set_my_default_persona(p.id)
 	db.session.commit()
 	flash("Default persona set", "success")
 	return redirect(url_for("styles.styles_home"))
@@ -110,25 +114,20 @@ def update_persona(persona_id: int):
 	if is_default:
 		Persona.query.filter_by(user_id=current_user.id, is_system=False, is_default=True).update({Persona.is_default: False})
 		p.is_default = True
-		current_user.default_persona_id = p.id
+		_set_my_default_persona(p.id)
 	else:
 		# If turning off default on this persona, clear user's default reference if pointing here
 		if current_user.default_persona_id == p.id:
-			current_user.default_persona_id = None
+			_set_my_default_persona(None)
 
 	# Replace styles
 	# Clear existing
 	for ps in list(p.styles):
 		db.session.delete(ps)
 	# Add selected
-	for sid in style_ids:
-		try:
-			s_id = int(sid)
-		except Exception:
-			continue
-		if not CommStyle.query.get(s_id):
-			continue
-		db.session.add(PersonaStyle(persona_id=p.id, comm_style_id=s_id))
+	db.session.add_all(
+		PersonaStyle(persona_id=p.id, comm_style_id=s_id) for s_id in existing_style_ids(style_ids)
+	)
 
 	db.session.commit()
 	flash("Persona updated", "success")
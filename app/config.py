@@ -28,15 +28,95 @@ class Config:
         os.getenv("SQLALCHEMY_TRACK_MODIFICATIONS", "false").lower() == "true"
     )
 
+    # Password hashing: unless BCRYPT_LOG_ROUNDS is set, the first worker calibrates
+    # the bcrypt cost to BCRYPT_TARGET_MS and stores it for the others; hashing
+    # runs on a capped thread pool.
+    BCRYPT_LOG_ROUNDS: int = int(os.getenv("BCRYPT_LOG_ROUNDS", "12"))
+    BCRYPT_TARGET_MS: float = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_QUEUE: int = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+    PASSWORD_HASH_WAIT: float = float(os.getenv("PASSWORD_HASH_WAIT", "10"))
+
+    # Seconds a worker trusts a cached login user before re-checking users.version
+    USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", "30"))
+    # Chat turns: lease on an interview while a reply is generated (longer than any
+    # provider call), and how long a second request waits for it before giving up
+    CHAT_TURN_LOCK_SECONDS: float = float(os.getenv("CHAT_TURN_LOCK_SECONDS", "180"))
+    CHAT_TURN_WAIT_SECONDS: float = float(os.getenv("CHAT_TURN_WAIT_SECONDS", "90"))
+    # Idempotency keys only need to outlive a retry; older turns are pruned by rollup_usage.py
+    CHAT_TURN_KEEP_HOURS: float = float(os.getenv("CHAT_TURN_KEEP_HOURS", "24"))
+    # New interviews open with a question from the per-topic cache (or one generated
+    # in the background); the warmer regenerates cache entries older than this
+    OPENING_QUESTIONS: bool = os.getenv("OPENING_QUESTIONS", "true").lower() == "true"
+    OPENING_QUESTION_MAX_AGE_HOURS: float = float(os.getenv("OPENING_QUESTION_MAX_AGE_HOURS", "168"))
+    # Seconds a worker may reuse per-interview settings (persona, admin toggles)
+    INTERVIEW_SETTINGS_CACHE_TTL: float = float(os.getenv("INTERVIEW_SETTINGS_CACHE_TTL", "5"))
+
+    # Templates: compiled-template cache directory (empty to disable) and how many
+    # rendered message/summary blocks each worker keeps
+    JINJA_CACHE_DIR: str = os.getenv("JINJA_CACHE_DIR", "storage/jinja_cache")
+    FRAGMENT_CACHE_SIZE: int = int(os.getenv("FRAGMENT_CACHE_SIZE", "5000"))
+
+    # PDF export: rendered files are cached here and built on a small process pool
+    PDF_CACHE_DIR: str = os.getenv("PDF_CACHE_DIR", "storage/pdf_cache")
+    PDF_RENDER_WORKERS: int = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+    PDF_RENDER_TIMEOUT: float = float(os.getenv("PDF_RENDER_TIMEOUT", "120"))
+
+    # Response compression (gzip, or brotli when the brotli package is installed)
+    COMPRESS_RESPONSES: bool = os.getenv("COMPRESS_RESPONSES", "true").lower() == "true"
+    COMPRESS_MIN_SIZE: int = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    COMPRESS_LEVEL: int = int(os.getenv("COMPRESS_LEVEL", "6"))
+    COMPRESS_BROTLI_QUALITY: int = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+    # Photo renditions (thumbnails / web sizes), rendered on a process pool
+    IMAGE_RENDER_WORKERS: int = int(os.getenv("IMAGE_RENDER_WORKERS", "2"))
+    IMAGE_RENDER_TIMEOUT: float = float(os.getenv("IMAGE_RENDER_TIMEOUT", "60"))
+    IMAGE_QUALITY: int = int(os.getenv("IMAGE_QUALITY", "80"))
+    IMAGE_EAGER_DERIVATIVES: bool = os.getenv("IMAGE_EAGER_DERIVATIVES", "true").lower() == "true"
+
     # Storage
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "storage/uploads")
     MEDIA_DIR: str = os.getenv("MEDIA_DIR", "storage/media")
+    # Chunked uploads: largest chunk a client may send, and largest file accepted
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+    UPLOAD_MAX_SIZE: int = int(os.getenv("UPLOAD_MAX_SIZE", str(4 * 1024 * 1024 * 1024)))
+    # Serving stored media: "" (Flask streams it), "x-accel" (nginx) or "x-sendfile" (Apache)
+    MEDIA_SENDFILE: str = os.getenv("MEDIA_SENDFILE", "").lower()
+    MEDIA_ACCEL_PREFIX: str = os.getenv("MEDIA_ACCEL_PREFIX", "/_protected")
 
     # LLM
     LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai").lower()
     OPENAI_API_KEY: str | None = os.getenv("OPENAI_API_KEY")
     ANTHROPIC_API_KEY: str | None = os.getenv("ANTHROPIC_API_KEY")
     GOOGLE_API_KEY: str | None = os.getenv("GOOGLE_API_KEY")
+    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    ANTHROPIC_MODEL: str = os.getenv("ANTHROPIC_MODEL", "claude-3-haiku-20240307")
+    GOOGLE_MODEL: str = os.getenv("GOOGLE_MODEL", "gemini-1.5-flash")
+    # Usage ledger: seconds between batched writes, and optional price overrides as JSON
+    # {"model": [usd_per_1m_input, usd_per_1m_output, usd_per_1m_cached_input]}
+    LLM_LEDGER_FLUSH_SECONDS: float = float(os.getenv("LLM_LEDGER_FLUSH_SECONDS", "2"))
+    LLM_PRICES: str | None = os.getenv("LLM_PRICES")
+    # Summaries are refreshed by merging in new messages; rebuild from the whole
+    # transcript after this many merges in a row
+    SUMMARY_REBUILD_AFTER: int = int(os.getenv("SUMMARY_REBUILD_AFTER", "5"))
+    # Seconds the offline "stub" provider waits before replying
+    LLM_STUB_DELAY: float = float(os.getenv("LLM_STUB_DELAY", "0"))
 
     # Transcription
     TRANSCRIPTION_PROVIDER: str = os.getenv("TRANSCRIPTION_PROVIDER", "openai").lower()
+    TRANSCRIPTION_MODEL: str = os.getenv("TRANSCRIPTION_MODEL", "whisper-1")
+    # Recordings are cut at silences into chunks of about this many seconds
+    TRANSCRIPTION_CHUNK_SECONDS: float = float(os.getenv("TRANSCRIPTION_CHUNK_SECONDS", "60"))
+    TRANSCRIPTION_MAX_CHUNK_SECONDS: float = float(os.getenv("TRANSCRIPTION_MAX_CHUNK_SECONDS", "120"))
+    TRANSCRIPTION_CONCURRENCY: int = int(os.getenv("TRANSCRIPTION_CONCURRENCY", "4"))
+    # Run jobs on a thread in the web process; set false to leave them to scripts/run_transcriptions.py
+    TRANSCRIPTION_IN_PROCESS: bool = os.getenv("TRANSCRIPTION_IN_PROCESS", "true").lower() == "true"
+    TRANSCRIPTION_STUB_DELAY: float = float(os.getenv("TRANSCRIPTION_STUB_DELAY", "0"))
+
+    # Diagnostics: Server-Timing header and timing log line for "admin", "all" or "off";
+    # warn when a request repeats one SQL statement more than SQL_REPEAT_WARN
+    # times (0 disables); where admin request profiles are kept
+    SERVER_TIMING: str = os.getenv("SERVER_TIMING", "admin").lower()
+    SQL_REPEAT_WARN: int = int(os.getenv("SQL_REPEAT_WARN", "10"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "storage/profiles")
+    PROFILE_KEEP: int = int(os.getenv("PROFILE_KEEP", "50"))
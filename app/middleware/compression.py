@@ -0,0 +1,221 @@
+"""WSGI middleware that gzip/brotli-compresses text responses.
+
+Applied by content type and size, after Flask has built the response. Bodies
+with a Content-Length are compressed in one go; streamed bodies (no length,
+e.g. SSE or chunked generators) are compressed chunk by chunk with a sync
+flush after each one, so every chunk still reaches the client as soon as the
+app yields it. Responses that are already encoded, partial (206), or of
+binary types such as PDF, ZIP, audio and images pass through untouched.
+
+A compressed body is a different representation from the identity one, so
+its ETag gets a per-encoding suffix (``"abc"`` becomes ``"abc-gzip"``);
+``http_cache.not_modified`` accepts either form in If-None-Match.
+"""
+from __future__ import annotations
+from typing import Iterable, Optional
+import threading
+import time
+import zlib
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # optional
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = {
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "text/markdown",
+    "text/javascript",
+    "text/event-stream",
+    "application/javascript",
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+ENCODINGS = ("br", "gzip")
+
+
+def encoded_etag(value: str, encoding: str) -> str:
+    """``value`` (a quoted, possibly weak ETag) with the encoding appended to its opaque part."""
+    if value.endswith('"'):
+        return f'{value[:-1]}-{encoding}"'
+    return value
+
+
+class CompressionStats:
+    """Running totals for the admin metrics view."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+        self.by_encoding = {"gzip": 0, "br": 0}
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float) -> None:
+        with self._lock:
+            self.responses += 1
+            self.by_encoding[encoding] = self.by_encoding.get(encoding, 0) + 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.cpu_seconds += cpu_seconds
+
+    def record_skip(self) -> None:
+        with self._lock:
+            self.skipped += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "compressed_responses": self.responses,
+                "skipped_responses": self.skipped,
+                "by_encoding": dict(self.by_encoding),
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+                "cpu_ms": round(self.cpu_seconds * 1000, 1),
+            }
+
+
+class _Encoder:
+    def __init__(self, encoding: str, level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._br.process(data)
+            return out + self._br.flush() if flush else out
+        out = self._z.compress(data)
+        return out + self._z.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._br.finish()
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, *, min_size: int = 1024, level: int = 6, brotli_quality: int = 4,
+                 types: Optional[Iterable[str]] = None):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.types = set(types or COMPRESSIBLE_TYPES)
+        self.stats = CompressionStats()
+
+    def _choose_encoding(self, environ) -> Optional[str]:
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return None
+        accept = environ.get("HTTP_ACCEPT_ENCODING", "").lower()
+        offered = {}
+        for part in accept.split(","):
+            name, _, params = part.strip().partition(";")
+            q = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    q = float(params.strip()[2:])
+                except ValueError:
+                    q = 0.0
+            if name:
+                offered[name.strip()] = q
+        if brotli is not None and offered.get("br", 0) > 0:
+            return "br"
+        if offered.get("gzip", 0) > 0:
+            return "gzip"
+        return None
+
+    def _should_compress(self, status: str, headers) -> bool:
+        code = int(status.split(" ", 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return False
+        values = {k.lower(): v for k, v in headers}
+        if "content-encoding" in values or "content-range" in values:
+            return False
+        if "no-transform" in values.get("cache-control", "").lower():
+            return False
+        content_type = values.get("content-type", "").split(";", 1)[0].strip().lower()
+        if content_type not in self.types:
+            return False
+        length = values.get("content-length")
+        if length is not None and length.isdigit() and int(length) < self.min_size:
+            return False
+        return True
+
+    def __call__(self, environ, start_response):
+        encoding = self._choose_encoding(environ)
+        state = {"encoder": None, "streaming": False}
+
+        def _start_response(status, headers, exc_info=None):
+            if encoding and self._should_compress(status, headers):
+                state["streaming"] = not any(k.lower() == "content-length" for k, _ in headers)
+                state["encoder"] = _Encoder(encoding, self.level, self.brotli_quality)
+                headers = [
+                    (k, encoded_etag(v, encoding) if k.lower() == "etag" else v)
+                    for k, v in headers
+                    if k.lower() != "content-length"
+                ]
+                headers.append(("Content-Encoding", encoding))
+            elif encoding:
+                self.stats.record_skip()
+            _add_vary(headers)
+            return start_response(status, headers, exc_info)
+
+        app_iter = self.app(environ, _start_response)
+        # Werkzeug responses call start_response before returning, so anything not
+        # being compressed (files, PDFs, media) goes back untouched and keeps
+        # wsgi.file_wrapper / sendfile support.
+        if state["encoder"] is None:
+            return app_iter
+        return self._encode(app_iter, state["encoder"], state["streaming"])
+
+    def _encode(self, app_iter, encoder: _Encoder, streaming: bool):
+        bytes_in = bytes_out = 0
+        cpu = 0.0
+        try:
+            for chunk in app_iter:
+                if not chunk:
+                    continue
+                started = time.thread_time()
+                out = encoder.compress(chunk, flush=streaming)
+                cpu += time.thread_time() - started
+                bytes_in += len(chunk)
+                bytes_out += len(out)
+                if out:
+                    yield out
+            started = time.thread_time()
+            tail = encoder.finish()
+            cpu += time.thread_time() - started
+            bytes_out += len(tail)
+            self.stats.record(encoder.encoding, bytes_in, bytes_out, cpu)
+            if tail:
+                yield tail
+        finally:
+            close = getattr(app_iter, "close", None)
+            if close is not None:
+                close()
+
+
+def _add_vary(headers) -> None:
+    for i, (k, v) in enumerate(headers):
+        if k.lower() == "vary":
+            if "accept-encoding" not in v.lower():
+                headers[i] = (k, f"{v}, Accept-Encoding")
+            return
+    headers.append(("Vary", "Accept-Encoding"))
+
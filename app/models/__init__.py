@@ -1,5 +1,10 @@
 from .user import User  # noqa: F401
-from .interview import Interview, Message  # noqa: F401
-from .media import Media  # noqa: F401
+from .interview import Interview, Message, InterviewSettings, ChatTurn  # noqa: F401
+from .media import Media, Upload  # noqa: F401
 from .prompt import Prompt  # noqa: F401
 from .summary import Summary  # noqa: F401
+from .transcription import TranscriptionJob  # noqa: F401
+from .usage import UsageRollup  # noqa: F401
+from .llm_call import LlmCall  # noqa: F401
+from .opening_question import OpeningQuestion  # noqa: F401
+from .app_setting import AppSetting  # noqa: F401
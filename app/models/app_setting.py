@@ -0,0 +1,16 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class AppSetting(db.Model):
+    """A deployment-wide value settled once and then shared by every worker.
+
+    Used for values a worker would otherwise work out for itself at startup
+    and might disagree about, such as the calibrated bcrypt cost.
+    """
+
+    __tablename__ = "app_settings"
+
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.String(255), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
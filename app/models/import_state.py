@@ -0,0 +1,40 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class ImportCheckpoint(db.Model):
+    """How far a dump import has progressed through one table.
+
+    Updated in the same transaction as each inserted chunk, so a resumed
+    import skips exactly the rows that were committed.
+    """
+
+    __tablename__ = "import_checkpoints"
+
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(255), nullable=False)
+    table_name = db.Column(db.String(64), nullable=False)
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("source", "table_name", name="uq_import_checkpoint_source_table"),
+    )
+
+
+class ImportIdMap(db.Model):
+    """Mapping from an id in an imported dump to the id of the row it became here."""
+
+    __tablename__ = "import_id_map"
+
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(255), nullable=False)
+    table_name = db.Column(db.String(64), nullable=False)
+    old_id = db.Column(db.Integer, nullable=False)
+    new_id = db.Column(db.Integer, nullable=False)
+    # False when the dump row matched an existing row (e.g. same user email)
+    created = db.Column(db.Boolean, nullable=False, default=True)
+
+    __table_args__ = (
+        db.UniqueConstraint("source", "table_name", "old_id", name="uq_import_id_map_old"),
+    )
@@ -8,10 +8,17 @@ class Interview(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
     title = db.Column(db.String(255), nullable=False)
+    # Interviewer persona chosen for this interview; None means the user/system default
+    persona_id = db.Column(db.Integer, db.ForeignKey("personas.id"), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Lease held while a chat turn is in flight, so turns never overlap across workers
+    turn_lock = db.Column(db.String(32), nullable=True)
+    turn_lock_expires_at = db.Column(db.DateTime, nullable=True)
 
     user = db.relationship("User", back_populates="interviews")
     messages = db.relationship("Message", back_populates="interview", cascade="all, delete-orphan")
+    settings = db.relationship("InterviewSettings", uselist=False, cascade="all, delete-orphan")
+    turns = db.relationship("ChatTurn", cascade="all, delete-orphan")
 
 
 class Message(db.Model):
@@ -22,6 +29,41 @@ class Message(db.Model):
     role = db.Column(db.String(20), nullable=False)  # system|user|assistant
     content = db.Column(db.Text, nullable=False)
     audio_path = db.Column(db.String(512), nullable=True)
+    # Position of this text within audio_path, for server-side transcriptions
+    audio_start_ms = db.Column(db.Integer, nullable=True)
+    audio_end_ms = db.Column(db.Integer, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     interview = db.relationship("Interview", back_populates="messages")
+
+
+class InterviewSettings(db.Model):
+    """Per-interview UI toggles that used to live in the cookie session."""
+
+    __tablename__ = "interview_settings"
+
+    interview_id = db.Column(db.Integer, db.ForeignKey("interviews.id"), primary_key=True)
+    debug_chat = db.Column(db.Boolean, default=False, nullable=False)
+    no_thread = db.Column(db.Boolean, default=False, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class ChatTurn(db.Model):
+    """One send/change-topic request, keyed so a repeated POST reuses the first result."""
+
+    __tablename__ = "chat_turns"
+
+    id = db.Column(db.Integer, primary_key=True)
+    interview_id = db.Column(db.Integer, db.ForeignKey("interviews.id"), nullable=False, index=True)
+    idempotency_key = db.Column(db.String(64), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # send|change_topic
+    status = db.Column(db.String(20), nullable=False, default="pending")  # pending|done|failed
+    user_message_id = db.Column(db.Integer, nullable=True)
+    assistant_message_id = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("interview_id", "idempotency_key", name="uq_chat_turn_key"),
+    )
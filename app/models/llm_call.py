@@ -0,0 +1,27 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class LlmCall(db.Model):
+    """One request to a chat model, written in batches by ``services.llm_usage``.
+
+    user_id and interview_id are plain columns rather than foreign keys so the
+    ledger outlives deleted accounts and interviews.
+    """
+
+    __tablename__ = "llm_calls"
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    interview_id = db.Column(db.Integer, nullable=True, index=True)
+    purpose = db.Column(db.String(32), nullable=False)  # chat|opening|summary_<format>|summary_update_<format>
+    provider = db.Column(db.String(32), nullable=False)
+    model = db.Column(db.String(128), nullable=False)
+    input_tokens = db.Column(db.Integer, nullable=True)
+    output_tokens = db.Column(db.Integer, nullable=True)
+    cached_tokens = db.Column(db.Integer, nullable=True)
+    latency_ms = db.Column(db.Integer, nullable=False)
+    outcome = db.Column(db.String(16), nullable=False)  # ok|error
+    error = db.Column(db.String(255), nullable=True)
+    cost_usd = db.Column(db.Float, nullable=True)
@@ -11,4 +11,36 @@ class Media(db.Model):
     kind = db.Column(db.String(20), nullable=False)  # photo|audio|video|document
     file_path = db.Column(db.String(512), nullable=False)
     caption = db.Column(db.String(512), nullable=True)
+    # Set for files stored by content hash (chunked uploads); the blob may be shared
+    sha256 = db.Column(db.String(64), nullable=True, index=True)
+    size_bytes = db.Column(db.BigInteger, nullable=True)
+    mime_type = db.Column(db.String(128), nullable=True)
+    original_name = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class Upload(db.Model):
+    """A resumable chunked upload in progress.
+
+    Chunks are appended to a partial file under UPLOAD_DIR; ``received_bytes``
+    is the offset the next chunk must start at, so a client that lost its
+    connection asks for it and carries on from there.
+    """
+
+    __tablename__ = "uploads"
+
+    id = db.Column(db.String(32), primary_key=True)  # random token used in URLs
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    interview_id = db.Column(db.Integer, db.ForeignKey("interviews.id"), nullable=True)
+    filename = db.Column(db.String(255), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    mime_type = db.Column(db.String(128), nullable=True)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    # Whole-file hash announced by the client, checked on completion when given
+    sha256 = db.Column(db.String(64), nullable=True)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default="pending")  # pending|complete
+    media_id = db.Column(db.Integer, db.ForeignKey("media.id"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
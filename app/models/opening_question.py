@@ -0,0 +1,24 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class OpeningQuestion(db.Model):
+    """A pre-generated first assistant question for a (topic, persona) pair.
+
+    persona_key is the persona whose styles shaped the question, or 0 when no
+    persona applied. prompt_hash identifies the exact prompt used, so an entry
+    goes stale as soon as the persona's styles change.
+    """
+
+    __tablename__ = "opening_questions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(255), nullable=False)  # normalised: stripped, lower case
+    persona_key = db.Column(db.Integer, nullable=False, default=0)
+    prompt_hash = db.Column(db.String(40), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    generated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("topic", "persona_key", name="uq_opening_question_topic_persona"),
+    )
@@ -12,6 +12,9 @@ class Summary(db.Model):
     kind = db.Column(db.String(50), nullable=False, default="session")
     format = db.Column(db.String(20), nullable=False, default="html")  # html|markdown|text
     content = db.Column(db.Text, nullable=False)
+    # Newest message the content covers, and incremental merges since the last full rebuild
+    last_message_id = db.Column(db.Integer, nullable=True)
+    incremental_updates = db.Column(db.Integer, default=0, server_default="0", nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
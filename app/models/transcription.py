@@ -0,0 +1,25 @@
+from datetime import datetime
+from ..extensions import db
+
+
+class TranscriptionJob(db.Model):
+    """Server-side transcription of one audio file into an interview's messages."""
+
+    __tablename__ = "transcription_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    interview_id = db.Column(db.Integer, db.ForeignKey("interviews.id"), nullable=False, index=True)
+    media_id = db.Column(db.Integer, db.ForeignKey("media.id"), nullable=True, index=True)
+    audio_path = db.Column(db.String(512), nullable=False)
+    language = db.Column(db.String(16), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default="queued")  # queued|running|done|failed
+    audio_seconds = db.Column(db.Float, nullable=True)
+    chunks_total = db.Column(db.Integer, nullable=False, default=0)
+    chunks_done = db.Column(db.Integer, nullable=False, default=0)
+    messages_created = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -0,0 +1,19 @@
+from ..extensions import db
+
+
+class UsageRollup(db.Model):
+    """Per-user activity counts for one UTC day, maintained by ``scripts/rollup_usage.py``."""
+
+    __tablename__ = "usage_rollups"
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    interviews = db.Column(db.Integer, nullable=False, default=0)
+    messages = db.Column(db.Integer, nullable=False, default=0)
+    summaries = db.Column(db.Integer, nullable=False, default=0)
+    llm_calls = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint("day", "user_id", name="uq_usage_rollup_day_user"),
+    )
@@ -1,7 +1,12 @@
 from datetime import datetime
 from typing import Optional
+import time
+from flask import current_app
 from flask_login import UserMixin
-from ..extensions import db, login_manager, bcrypt
+from sqlalchemy import event
+from ..extensions import db, login_manager
+from ..services.cache import TTLCache
+from ..services import passwords
 
 
 class User(db.Model, UserMixin):
@@ -14,24 +19,92 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(255), nullable=True)
     default_persona_id = db.Column(db.Integer, db.ForeignKey("personas.id"), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Bumped on every change so cached snapshots in other workers can tell they are stale
+    version = db.Column(db.Integer, default=0, server_default="0", nullable=False)
 
     interviews = db.relationship("Interview", back_populates="user", lazy=True)
 
     def set_password(self, password: str) -> None:
-        self.password_hash = bcrypt.generate_password_hash(password).decode("utf-8")
+        self.password_hash = passwords.hash_password(password)
 
     def check_password(self, password: str) -> bool:
         # Treat None or whitespace-only hashes as not set
         if not self.password_hash or (isinstance(self.password_hash, str) and self.password_hash.strip() == ""):
             return False
         try:
-            return bcrypt.check_password_hash(self.password_hash, password)
+            return passwords.verify_password(self.password_hash, password)
+        except passwords.PasswordHashingBusy:
+            raise
         except Exception:
             # If the stored value is not a valid bcrypt hash, do not raise.
             # Caller may handle plaintext migration.
             return False
 
+    def password_needs_rehash(self) -> bool:
+        """True when the stored hash uses a lower bcrypt work factor than the current one."""
+        return passwords.needs_rehash(self.password_hash)
+
+
+class UserSnapshot(UserMixin):
+    """Read-only copy of the user fields requests need, safe to share across requests.
+
+    Returned by ``load_user`` in place of the ORM row, so it is not attached to
+    a session; views that change the account must load ``User`` explicitly.
+    """
+
+    def __init__(self, user: User):
+        self.id = user.id
+        self.email = user.email
+        self.name = user.name
+        self.is_admin = bool(user.is_admin)
+        self.default_persona_id = user.default_persona_id
+        self.version = user.version or 0
+
+
+# user id -> (snapshot, monotonic time the version was last confirmed)
+_user_cache = TTLCache(maxsize=10000)
+
+
+def invalidate_user(user_id: int) -> None:
+    _user_cache.pop(int(user_id))
+
+
+@event.listens_for(User, "before_update")
+def _bump_user_version(mapper, connection, target: User) -> None:
+    if db.session.is_modified(target, include_collections=False):
+        target.version = (target.version or 0) + 1
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_cached_user(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
+
 
 @login_manager.user_loader
-def load_user(user_id: str) -> Optional["User"]:
-    return User.query.get(int(user_id))
+def load_user(user_id: str) -> Optional[UserSnapshot]:
+    """Load the session user, hitting the database at most once per USER_CACHE_TTL.
+
+    Within the TTL a cached snapshot is returned with no query at all; after it,
+    a primary-key lookup of ``version`` decides whether the snapshot still holds.
+    """
+    uid = int(user_id)
+    now = time.monotonic()
+    cached = _user_cache.get(uid)
+    if cached is not None:
+        snapshot, checked_at = cached
+        if now - checked_at < current_app.config.get("USER_CACHE_TTL", 30):
+            return snapshot
+        version = db.session.query(User.version).filter_by(id=uid).scalar()
+        if version is None:
+            invalidate_user(uid)
+            return None
+        if version == snapshot.version:
+            _user_cache.set(uid, (snapshot, now))
+            return snapshot
+    user = User.query.get(uid)
+    if user is None:
+        return None
+    snapshot = UserSnapshot(user)
+    _user_cache.set(uid, (snapshot, now))
+    return snapshot
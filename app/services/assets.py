@@ -0,0 +1,73 @@
+"""Fingerprinted static assets.
+
+``scripts/collect_static.py`` copies files from ``static/`` into
+``static/dist/`` under content-hashed names, next to ``.gz`` and ``.br``
+variants, and records ``original -> hashed`` in ``static/dist/manifest.json``.
+Templates link assets through ``asset_url()``; the ``/assets/`` route picks the
+best precompressed variant for the client and marks it immutable, since a
+changed file always gets a new name. Without a manifest (e.g. while running
+``watch:css`` in development) ``asset_url`` falls back to the plain static URL.
+"""
+from __future__ import annotations
+from typing import Dict, Set
+import json
+import mimetypes
+import os
+from flask import abort, request, send_from_directory, url_for
+
+
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+# Only text formats are worth precompressing
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".svg", ".json", ".map", ".txt", ".html", ".xml"}
+ONE_YEAR = 365 * 24 * 3600
+
+_manifest: Dict[str, str] = {}
+# Hashed names from the manifest; the only files the asset route will serve
+_served: Set[str] = set()
+_dist_dir = ""
+
+
+def load_manifest(dist_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(dist_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(filename: str) -> str:
+    hashed = _manifest.get(filename)
+    if hashed is None:
+        return url_for("static", filename=filename)
+    return url_for("asset", filename=hashed)
+
+
+def serve_asset(filename: str):
+    if filename not in _served:
+        abort(404)
+    accepted = request.accept_encodings
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    chosen, encoding = filename, None
+    for suffix, name in ((".br", "br"), (".gz", "gzip")):
+        if accepted[name] and os.path.exists(os.path.join(_dist_dir, filename + suffix)):
+            chosen, encoding = filename + suffix, name
+            break
+    response = send_from_directory(_dist_dir, chosen, mimetype=mimetype, max_age=ONE_YEAR)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app) -> None:
+    global _manifest, _dist_dir, _served
+    _dist_dir = os.path.join(app.static_folder, DIST_DIRNAME)
+    _manifest = load_manifest(_dist_dir)
+    _served = set(_manifest.values())
+    if not _manifest:
+        app.logger.info("No static manifest in %s; serving unversioned assets", _dist_dir)
+    app.add_url_rule("/assets/<path:filename>", "asset", serve_asset)
+    app.jinja_env.globals["asset_url"] = asset_url
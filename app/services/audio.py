@@ -0,0 +1,138 @@
+"""Audio helpers for transcription: duration, silence detection and slicing.
+
+ffmpeg/ffprobe are used when they are on PATH and handle any format the
+browser or a phone records (webm, m4a, mp3, ...). Without them only PCM WAV
+files can be processed, via the standard ``wave`` module.
+"""
+from __future__ import annotations
+from typing import List, Optional, Tuple
+import os
+import re
+import shutil
+import subprocess
+import warnings
+import wave
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        import audioop  # type: ignore  # removed in Python 3.13
+except ImportError:
+    audioop = None
+
+
+_SILENCE_START = re.compile(r"silence_start: (-?[\d.]+)")
+_SILENCE_END = re.compile(r"silence_end: (-?[\d.]+)")
+
+
+class AudioError(RuntimeError):
+    pass
+
+
+def have_ffmpeg() -> bool:
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+def _is_wav(path: str) -> bool:
+    try:
+        with wave.open(path, "rb"):
+            return True
+    except (wave.Error, EOFError, OSError):
+        return False
+
+
+def duration_seconds(path: str) -> float:
+    if have_ffmpeg():
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        return float(out)
+    if _is_wav(path):
+        with wave.open(path, "rb") as w:
+            return w.getnframes() / float(w.getframerate())
+    raise AudioError("ffmpeg is required to read this audio format")
+
+
+def detect_silences(path: str, noise_db: float = -35.0, min_silence: float = 0.5) -> List[Tuple[float, float]]:
+    """Return (start, end) seconds of quiet stretches at least ``min_silence`` long."""
+    if have_ffmpeg():
+        proc = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-nostats", "-i", path,
+             "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}", "-f", "null", "-"],
+            capture_output=True, text=True,
+        )
+        starts = [float(m) for m in _SILENCE_START.findall(proc.stderr)]
+        ends = [float(m) for m in _SILENCE_END.findall(proc.stderr)]
+        return [(max(s, 0.0), e) for s, e in zip(starts, ends)]
+    if audioop is None or not _is_wav(path):
+        return []
+    # Pure-Python fallback for WAV: RMS over 50 ms frames
+    silences = []
+    with wave.open(path, "rb") as w:
+        rate, width, channels = w.getframerate(), w.getsampwidth(), w.getnchannels()
+        frame = max(1, rate // 20)
+        threshold = (2 ** (8 * width - 1)) * (10 ** (noise_db / 20.0))
+        pos = 0
+        quiet_from: Optional[float] = None
+        while True:
+            data = w.readframes(frame)
+            if not data:
+                break
+            t = pos / float(rate)
+            quiet = audioop.rms(data, width) < threshold
+            if quiet and quiet_from is None:
+                quiet_from = t
+            elif not quiet and quiet_from is not None:
+                if t - quiet_from >= min_silence:
+                    silences.append((quiet_from, t))
+                quiet_from = None
+            pos += len(data) // (width * channels)
+        end = pos / float(rate)
+        if quiet_from is not None and end - quiet_from >= min_silence:
+            silences.append((quiet_from, end))
+    return silences
+
+
+def plan_chunks(duration: float, silences: List[Tuple[float, float]], target: float = 60.0,
+                maximum: float = 120.0) -> List[Tuple[float, float]]:
+    """Split [0, duration] into chunks of roughly ``target`` seconds, cutting in silences.
+
+    Each cut goes in the middle of the silence nearest to ``target`` seconds
+    after the previous cut; when no silence falls before ``maximum`` the chunk
+    is cut hard at ``maximum``.
+    """
+    cuts = [(s + e) / 2.0 for s, e in silences]
+    chunks = []
+    start = 0.0
+    while duration - start > maximum:
+        window = [c for c in cuts if start + 1.0 < c <= start + maximum]
+        cut = min(window, key=lambda c: abs(c - (start + target))) if window else start + maximum
+        chunks.append((start, cut))
+        start = cut
+    if duration - start > 0.05 or not chunks:
+        chunks.append((start, duration))
+    return chunks
+
+
+def extract_chunk(path: str, start: float, end: float, dest: str) -> str:
+    """Write [start, end) of ``path`` to ``dest`` as 16 kHz mono WAV (or a raw WAV slice without ffmpeg)."""
+    if have_ffmpeg():
+        subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-ss", f"{start:.3f}", "-to", f"{end:.3f}",
+             "-i", path, "-ac", "1", "-ar", "16000", dest],
+            check=True,
+        )
+        return dest
+    if not _is_wav(path):
+        raise AudioError("ffmpeg is required to read this audio format")
+    with wave.open(path, "rb") as src:
+        rate = src.getframerate()
+        src.setpos(int(start * rate))
+        frames = src.readframes(int((end - start) * rate))
+        with wave.open(dest, "wb") as out:
+            out.setnchannels(src.getnchannels())
+            out.setsampwidth(src.getsampwidth())
+            out.setframerate(rate)
+            out.writeframes(frames)
+    return dest
@@ -0,0 +1,167 @@
+"""One chat turn at a time per interview, with idempotent retries.
+
+A turn (the user's message, or a change-topic instruction, plus the
+assistant's reply) runs while holding a lease on the interview row. The lease
+is a conditional UPDATE of ``interviews.turn_lock``, so it holds across
+workers and processes. A second request for the same interview waits for the
+lease instead of calling the model in parallel, and transcripts cannot
+interleave.
+
+Every turn also has an idempotency key. A double-click or browser retry
+carries the same key, so it waits for the first request and reuses its
+result. A retry of a failed turn reuses the stored user message and only asks
+the model again. Keys only matter within the retry window, so
+``prune_turns`` (run by ``scripts/rollup_usage.py``) deletes turns older than
+CHAT_TURN_KEEP_HOURS.
+"""
+from __future__ import annotations
+from typing import Callable, Optional
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import hashlib
+import time
+import uuid
+from flask import current_app
+from sqlalchemy import delete, or_, select, update
+from ..extensions import db
+from ..models.interview import ChatTurn, Interview, Message
+
+
+class TurnBusy(RuntimeError):
+    """Raised when another turn on the interview is still running after the wait limit."""
+
+
+def turn_key(client_key: Optional[str], kind: str, content: str) -> str:
+    """Idempotency key for a turn, bound to what is being sent.
+
+    ``client_key`` comes from the form or an Idempotency-Key header. Hashing it
+    together with the content means two different messages never share a
+    result, even when a client reuses a key. Without a client key the turn is
+    never deduplicated.
+    """
+    client_key = (client_key or "").strip()[:200] or uuid.uuid4().hex
+    return hashlib.sha256(f"{kind}\n{client_key}\n{content}".encode("utf-8")).hexdigest()
+
+
+def _acquire(interview_id: int) -> Optional[str]:
+    token = uuid.uuid4().hex
+    now = datetime.utcnow()
+    lease = timedelta(seconds=float(current_app.config.get("CHAT_TURN_LOCK_SECONDS", 180)))
+    claimed = db.session.execute(
+        update(Interview)
+        .where(Interview.id == interview_id)
+        .where(or_(Interview.turn_lock.is_(None), Interview.turn_lock_expires_at < now))
+        .values(turn_lock=token, turn_lock_expires_at=now + lease)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return token if claimed else None
+
+
+def _release(interview_id: int, token: str) -> None:
+    db.session.rollback()
+    db.session.execute(
+        update(Interview)
+        .where(Interview.id == interview_id, Interview.turn_lock == token)
+        .values(turn_lock=None, turn_lock_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+@contextmanager
+def interview_lease(interview_id: int):
+    """Hold the interview's turn lease for the block, waiting up to CHAT_TURN_WAIT_SECONDS for it."""
+    deadline = time.monotonic() + float(current_app.config.get("CHAT_TURN_WAIT_SECONDS", 90))
+    while True:
+        token = _acquire(interview_id)
+        if token is not None:
+            break
+        if time.monotonic() >= deadline:
+            raise TurnBusy("Another message for this interview is still being answered")
+        time.sleep(0.25)
+        db.session.rollback()
+    try:
+        yield
+    finally:
+        _release(interview_id, token)
+
+
+def prune_turns(older_than: Optional[timedelta] = None) -> int:
+    """Delete chat turns created before ``older_than`` ago (default CHAT_TURN_KEEP_HOURS). Returns how many."""
+    if older_than is None:
+        older_than = timedelta(hours=float(current_app.config.get("CHAT_TURN_KEEP_HOURS", 24)))
+    deleted = db.session.execute(
+        delete(ChatTurn)
+        .where(ChatTurn.created_at < datetime.utcnow() - older_than)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+def _find(interview_id: int, key: str) -> Optional[ChatTurn]:
+    return db.session.execute(
+        select(ChatTurn).where(ChatTurn.interview_id == interview_id, ChatTurn.idempotency_key == key)
+    ).scalar_one_or_none()
+
+
+def run_turn(interview_id: int, key: str, kind: str, make_message: Callable[[], Message],
+             respond: Callable[[], str]) -> ChatTurn:
+    """Store the message from ``make_message``, then the reply from ``respond``, exactly once per key."""
+    deadline = time.monotonic() + float(current_app.config.get("CHAT_TURN_WAIT_SECONDS", 90))
+    while True:
+        turn = _find(interview_id, key)
+        if turn is not None and turn.status == "done":
+            return turn
+        token = _acquire(interview_id)
+        if token is not None:
+            break
+        if time.monotonic() >= deadline:
+            raise TurnBusy("Another message for this interview is still being answered")
+        time.sleep(0.25)
+        # End the read transaction so the next poll sees other workers' commits
+        db.session.rollback()
+
+    turn_id = None
+    try:
+        # Re-check under the lease: the turn we waited on may be this one
+        turn = _find(interview_id, key)
+        if turn is not None and turn.status == "done":
+            return turn
+        if turn is None:
+            turn = ChatTurn(interview_id=interview_id, idempotency_key=key, kind=kind, status="pending")
+            db.session.add(turn)
+        if turn.user_message_id is None:
+            message = make_message()
+            db.session.add(message)
+            db.session.flush()
+            turn.user_message_id = message.id
+        turn.status = "pending"
+        db.session.flush()
+        turn_id = turn.id
+        db.session.commit()
+
+        # respond() holds no connection while the model works; the reply is stored in a short new transaction
+        reply = respond()
+        assistant = Message(interview_id=interview_id, role="assistant", content=reply)
+        db.session.add(assistant)
+        db.session.flush()
+        db.session.execute(
+            update(ChatTurn).where(ChatTurn.id == turn_id)
+            .values(assistant_message_id=assistant.id, status="done", error=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return turn
+    except Exception as e:
+        db.session.rollback()
+        if turn_id is not None:
+            db.session.execute(
+                update(ChatTurn).where(ChatTurn.id == turn_id)
+                .values(status="failed", error=f"{e.__class__.__name__}: {e}"[:255])
+            )
+            db.session.commit()
+        raise
+    finally:
+        _release(interview_id, token)
@@ -0,0 +1,495 @@
+"""Streaming importer for mysqldump files produced by older deployments.
+
+The dump is read line by line (mysqldump writes one extended INSERT per line),
+rows are remapped onto fresh ids in the live schema and written in chunked
+transactions. Progress is checkpointed in the same transaction as each chunk,
+so an interrupted import resumes exactly where it stopped.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from datetime import date, datetime
+import codecs
+import io
+import os
+import re
+import time
+from sqlalchemy import bindparam, insert, select, update
+from ..extensions import db
+from ..models.import_state import ImportCheckpoint, ImportIdMap
+from ..models.interview import Interview, Message
+from ..models.media import Media
+from ..models.persona import CommStyle, Persona, PersonaStyle
+from ..models.prompt import Prompt
+from ..models.summary import Summary
+from ..models.user import User
+
+
+class DumpParseError(ValueError):
+    pass
+
+
+_MODELS = {
+    "users": User,
+    "comm_styles": CommStyle,
+    "prompts": Prompt,
+    "personas": Persona,
+    "interviews": Interview,
+    "persona_styles": PersonaStyle,
+    "messages": Message,
+    "media": Media,
+    "summaries": Summary,
+}
+
+# Tables are imported in passes so parents are always mapped before children,
+# whatever order the dump lists them in.
+PASSES: Tuple[Tuple[str, ...], ...] = (
+    ("users", "comm_styles", "prompts"),
+    ("personas", "interviews"),
+    ("persona_styles", "messages", "media", "summaries"),
+)
+
+# Foreign key columns and the table whose id map they are translated through.
+_FOREIGN_KEYS: Dict[str, Dict[str, str]] = {
+    "personas": {"user_id": "users"},
+    "interviews": {"user_id": "users"},
+    "persona_styles": {"persona_id": "personas", "comm_style_id": "comm_styles"},
+    "messages": {"interview_id": "interviews"},
+    "media": {"user_id": "users", "interview_id": "interviews"},
+    "summaries": {"user_id": "users", "interview_id": "interviews"},
+}
+
+# Natural keys used to match dump rows to rows that already exist, so an
+# import never clobbers or duplicates accounts, styles or prompts.
+_NATURAL_KEYS = {"users": "email", "comm_styles": "key", "prompts": "name"}
+
+# Tables whose new ids are needed to remap children.
+_MAPPED_TABLES = {"users", "comm_styles", "personas", "interviews"}
+
+
+# --- Encoding detection -------------------------------------------------------
+
+def detect_encoding(head: bytes) -> str:
+    """Guess the text encoding of a dump from its first few KB."""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith(codecs.BOM_UTF32_LE) or head.startswith(codecs.BOM_UTF32_BE):
+        return "utf-32"
+    if head.startswith(codecs.BOM_UTF16_LE) or head.startswith(codecs.BOM_UTF16_BE):
+        return "utf-16"
+    # BOM-less UTF-16: mostly-ASCII SQL has a NUL in every other byte
+    sample = head[:4096]
+    if len(sample) >= 4:
+        even_nuls = sample[0::2].count(0)
+        odd_nuls = sample[1::2].count(0)
+        if odd_nuls > len(sample) // 4 and even_nuls == 0:
+            return "utf-16-le"
+        if even_nuls > len(sample) // 4 and odd_nuls == 0:
+            return "utf-16-be"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def repair_oem_mojibake(value: str) -> str:
+    """Undo UTF-8 text that was decoded as code page 437 on the way into the dump.
+
+    This is what PowerShell's ``mysqldump > file.sql`` produces: the UTF-16 file
+    holds characters like ``Γ¥ñ∩╕Å`` where ``❤️`` was meant.
+    """
+    if value.isascii():
+        return value
+    try:
+        return value.encode("cp437").decode("utf-8")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return value
+
+
+# --- Statement parsing --------------------------------------------------------
+
+_CREATE_RE = re.compile(r"^CREATE TABLE `([^`]+)`")
+_COLUMN_RE = re.compile(r"^\s+`([^`]+)`\s")
+_INSERT_RE = re.compile(r"^INSERT INTO `([^`]+)`\s*(?:\(([^)]*)\)\s*)?VALUES\s*", re.I)
+_VALUE_RE = re.compile(
+    r"\s*(?:"
+    r"(?P<null>NULL)"
+    r"|(?:_\w+\s*)?'(?P<str>[^'\\]*(?:(?:\\.|'')[^'\\]*)*)'"
+    r"|0x(?P<hex>[0-9A-Fa-f]*)"
+    r"|(?P<num>[-+]?[0-9.]+(?:[eE][-+]?[0-9]+)?)"
+    r")\s*",
+    re.S,
+)
+_ESCAPE_RE = re.compile(r"\\(.)|''", re.S)
+_ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+
+
+def _unescape(raw: str) -> str:
+    if "\\" not in raw and "''" not in raw:
+        return raw
+    return _ESCAPE_RE.sub(lambda m: "'" if m.group(0) == "''" else _ESCAPES.get(m.group(1), m.group(1)), raw)
+
+
+def parse_rows(text: str, pos: int = 0) -> Iterator[list]:
+    """Yield each ``(...)`` tuple of an INSERT ... VALUES list as a Python list."""
+    n = len(text)
+    while True:
+        while pos < n and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= n or text[pos] == ";":
+            return
+        if text[pos] != "(":
+            raise DumpParseError(f"Expected '(' at offset {pos}: {text[pos:pos + 40]!r}")
+        pos += 1
+        row: list = []
+        while True:
+            m = _VALUE_RE.match(text, pos)
+            if not m:
+                raise DumpParseError(f"Unreadable value at offset {pos}: {text[pos:pos + 40]!r}")
+            if m.group("null") is not None:
+                row.append(None)
+            elif m.group("str") is not None:
+                row.append(_unescape(m.group("str")))
+            elif m.group("hex") is not None:
+                row.append(bytes.fromhex(m.group("hex")))
+            else:
+                num = m.group("num")
+                row.append(int(num) if num.lstrip("+-").isdigit() else float(num))
+            pos = m.end()
+            sep = text[pos:pos + 1]
+            pos += 1
+            if sep == ",":
+                continue
+            if sep == ")":
+                break
+            raise DumpParseError(f"Expected ',' or ')' at offset {pos - 1}")
+        yield row
+
+
+class _DumpReader:
+    """Iterate rows of selected tables in a dump without loading it into memory."""
+
+    def __init__(self, path: str, encoding: Optional[str] = None):
+        self.path = path
+        self.size = os.path.getsize(path)
+        if encoding is None:
+            with open(path, "rb") as f:
+                encoding = detect_encoding(f.read(65536))
+        self.encoding = encoding
+        self.columns: Dict[str, List[str]] = {}
+        self.bytes_read = 0
+
+    def rows(self, tables: Sequence[str]) -> Iterator[Tuple[str, List[str], list]]:
+        wanted = set(tables)
+        with open(self.path, "rb") as raw:
+            text = io.TextIOWrapper(raw, encoding=self.encoding, errors="replace", newline=None)
+            creating: Optional[str] = None
+            pending: List[str] = []
+            for line in text:
+                self.bytes_read = raw.tell()
+                if pending:
+                    pending.append(line)
+                    if not line.rstrip().endswith(";"):
+                        continue
+                    line = "".join(pending)
+                    pending = []
+                elif creating is not None:
+                    m = _COLUMN_RE.match(line)
+                    if m:
+                        self.columns[creating].append(m.group(1))
+                    elif line.startswith(")"):
+                        creating = None
+                    continue
+                elif line.startswith("CREATE TABLE"):
+                    m = _CREATE_RE.match(line)
+                    if m:
+                        creating = m.group(1)
+                        self.columns[creating] = []
+                    continue
+                elif line.startswith("INSERT INTO"):
+                    # Cheap table check first: most lines in a pass are skipped
+                    end = line.find("`", 13)
+                    if line[13:end] not in wanted:
+                        continue
+                    if not line.rstrip().endswith(";"):
+                        pending = [line]
+                        continue
+                else:
+                    continue
+
+                m = _INSERT_RE.match(line)
+                if not m:
+                    continue
+                table = m.group(1)
+                if table not in wanted:
+                    continue
+                if m.group(2):
+                    columns = [c.strip().strip("`") for c in m.group(2).split(",")]
+                else:
+                    columns = self.columns.get(table)
+                    if not columns:
+                        raise DumpParseError(f"No column list or CREATE TABLE seen for `{table}`")
+                for row in parse_rows(line, m.end()):
+                    yield table, columns, row
+            self.bytes_read = self.size
+
+
+# --- Import -------------------------------------------------------------------
+
+def _coerce(column, value):
+    """Convert a dump literal to what the SQLAlchemy column type expects."""
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime and isinstance(value, str):
+        if value.startswith("0000-00-00"):
+            return None
+        return datetime.fromisoformat(value)
+    if python_type is date and isinstance(value, str):
+        return None if value.startswith("0000-00-00") else date.fromisoformat(value)
+    if python_type is bool:
+        return bool(int(value))
+    if python_type is int and not isinstance(value, int):
+        return int(value)
+    if python_type is str and not isinstance(value, str):
+        return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+    return value
+
+
+class DumpImporter:
+    """Import one dump into the current database.
+
+    ``source`` identifies the dump for checkpoints and id maps; re-running with
+    the same source resumes, a new source starts from scratch.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        source: Optional[str] = None,
+        batch_size: int = 1000,
+        pause: float = 0.0,
+        fix_mojibake: bool = False,
+        encoding: Optional[str] = None,
+        log: Callable[[str], None] = print,
+    ):
+        self.reader = _DumpReader(path, encoding=encoding)
+        self.source = source or f"{os.path.basename(path)}:{self.reader.size}"
+        self.batch_size = max(1, batch_size)
+        self.pause = pause
+        self.fix_mojibake = fix_mojibake
+        self.log = log
+        self.maps: Dict[str, Dict[int, int]] = {t: {} for t in _MAPPED_TABLES}
+        self.created_users: set[int] = set()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    # -- state
+
+    def _load_state(self) -> Dict[str, int]:
+        done = {
+            cp.table_name: cp.rows_done
+            for cp in ImportCheckpoint.query.filter_by(source=self.source).all()
+        }
+        rows = db.session.execute(
+            select(ImportIdMap.table_name, ImportIdMap.old_id, ImportIdMap.new_id, ImportIdMap.created)
+            .where(ImportIdMap.source == self.source)
+            .execution_options(yield_per=10000)
+        )
+        for table_name, old_id, new_id, created in rows:
+            self.maps.setdefault(table_name, {})[old_id] = new_id
+            if table_name == "users" and created:
+                self.created_users.add(old_id)
+        db.session.commit()
+        return done
+
+    def reset(self) -> None:
+        ImportCheckpoint.query.filter_by(source=self.source).delete()
+        ImportIdMap.query.filter_by(source=self.source).delete()
+        db.session.commit()
+
+    # -- row preparation
+
+    def _prepare(self, table: str, columns: List[str], values: list) -> Tuple[Optional[int], Optional[dict]]:
+        model_table = _MODELS[table].__table__
+        row = {}
+        for name, value in zip(columns, values):
+            col = model_table.columns.get(name)
+            if col is None:
+                continue  # column dropped from the current schema
+            if self.fix_mojibake and isinstance(value, str):
+                value = repair_oem_mojibake(value)
+            row[name] = _coerce(col, value)
+        old_id = row.pop("id", None)
+        for name, ref in _FOREIGN_KEYS.get(table, {}).items():
+            value = row.get(name)
+            if value is None:
+                continue
+            new_value = self.maps[ref].get(value)
+            if new_value is None:
+                return old_id, None  # parent was not imported; skip the orphan
+            row[name] = new_value
+        # NOT NULL columns the dump left NULL fall back to model defaults
+        for name in list(row):
+            col = model_table.columns[name]
+            if row[name] is None and not col.nullable:
+                del row[name]
+        if table == "users":
+            row["email"] = (row.get("email") or "").strip().lower()
+            # Personas are not mapped yet; fixed up after the second pass
+            row.pop("default_persona_id", None)
+        return old_id, row
+
+    # -- writing
+
+    def _existing_by_key(self, table: str, rows: List[Tuple[Optional[int], dict]]) -> Dict[str, int]:
+        key = _NATURAL_KEYS.get(table)
+        if not key:
+            return {}
+        model = _MODELS[table]
+        keys = {r[key] for _, r in rows if r.get(key) is not None}
+        if not keys:
+            return {}
+        col = getattr(model, key)
+        return {k: i for i, k in db.session.execute(select(model.id, col).where(col.in_(keys))).all()}
+
+    def _write_chunk(self, table: str, chunk: List[Tuple[Optional[int], Optional[dict]]], consumed: int) -> None:
+        model = _MODELS[table]
+        stats = self.stats.setdefault(table, {"inserted": 0, "matched": 0, "skipped": 0})
+        rows = [(old, r) for old, r in chunk if r is not None]
+        stats["skipped"] += len(chunk) - len(rows)
+        new_maps: List[dict] = []
+
+        key = _NATURAL_KEYS.get(table)
+        existing = self._existing_by_key(table, rows)
+        to_insert: List[Tuple[Optional[int], dict]] = []
+        seen: set = set()
+        dupes: List[Tuple[Optional[int], str]] = []
+        for old, r in rows:
+            k = r.get(key) if key else None
+            if k is not None and k in existing:
+                stats["matched"] += 1
+                if old is not None and table in _MAPPED_TABLES:
+                    new_maps.append({"old_id": old, "new_id": existing[k], "created": False})
+                continue
+            if k is not None and k in seen:
+                # Duplicate natural key inside the dump itself: share the first row
+                dupes.append((old, k))
+                continue
+            if k is not None:
+                seen.add(k)
+            to_insert.append((old, r))
+
+        if to_insert:
+            if table in _MAPPED_TABLES and not key:
+                # No natural key to read ids back by, so insert one by one
+                # (still inside this chunk's single transaction).
+                for old, r in to_insert:
+                    new_id = db.session.execute(insert(model.__table__).values(**r)).inserted_primary_key[0]
+                    if old is not None:
+                        new_maps.append({"old_id": old, "new_id": new_id, "created": True})
+            else:
+                # Multi-row INSERT; executemany is rewritten into batched
+                # VALUES lists by the MySQL driver.
+                db.session.execute(insert(model.__table__), self._uniform([r for _, r in to_insert], model))
+                if table in _MAPPED_TABLES:
+                    inserted = self._existing_by_key(table, to_insert)
+                    for old, k in [(old, r[key]) for old, r in to_insert] + dupes:
+                        if old is not None and k in inserted:
+                            new_maps.append({"old_id": old, "new_id": inserted[k], "created": True})
+            stats["inserted"] += len(to_insert)
+
+        if new_maps:
+            for m in new_maps:
+                m.update(source=self.source, table_name=table)
+                self.maps[table][m["old_id"]] = m["new_id"]
+                if table == "users" and m["created"]:
+                    self.created_users.add(m["old_id"])
+            db.session.execute(insert(ImportIdMap.__table__), new_maps)
+
+        cp = ImportCheckpoint.query.filter_by(source=self.source, table_name=table).first()
+        if cp is None:
+            cp = ImportCheckpoint(source=self.source, table_name=table, rows_done=0)
+            db.session.add(cp)
+        cp.rows_done = (cp.rows_done or 0) + consumed
+        db.session.commit()
+        if self.pause:
+            # Give concurrent traffic a turn at the tables between chunks
+            time.sleep(self.pause)
+
+    @staticmethod
+    def _uniform(rows: List[dict], model) -> List[dict]:
+        """executemany needs every row to carry the same keys."""
+        keys = set().union(*(r.keys() for r in rows))
+        if all(len(r) == len(keys) for r in rows):
+            return rows
+        table = model.__table__
+        out = []
+        for r in rows:
+            full = dict(r)
+            for k in keys - r.keys():
+                col = table.columns[k]
+                default = col.default.arg if col.default is not None else None
+                full[k] = default(None) if callable(default) else default
+            out.append(full)
+        return out
+
+    def _fix_user_defaults(self) -> None:
+        """Point imported users at their imported default persona."""
+        updates = []
+        for _, columns, values in self.reader.rows(("users",)):
+            row = dict(zip(columns, values))
+            old_user, old_persona = row.get("id"), row.get("default_persona_id")
+            if old_user not in self.created_users or old_persona is None:
+                continue
+            new_persona = self.maps["personas"].get(old_persona)
+            if new_persona:
+                updates.append({"b_id": self.maps["users"][old_user], "b_persona": new_persona})
+        if updates:
+            stmt = (
+                update(User.__table__)
+                .where(User.__table__.c.id == bindparam("b_id"))
+                .values(default_persona_id=bindparam("b_persona"))
+            )
+            db.session.execute(stmt, updates)
+            db.session.commit()
+
+    # -- driver
+
+    def run(self) -> Dict[str, Dict[str, int]]:
+        done = self._load_state()
+        self.log(f"Importing {self.reader.path} ({self.reader.encoding}, {self.reader.size:,} bytes) as '{self.source}'")
+        for number, tables in enumerate(PASSES, 1):
+            seen: Dict[str, int] = {}
+            chunks: Dict[str, List[Tuple[Optional[int], Optional[dict]]]] = {}
+            started = time.monotonic()
+            last_report = started
+            total_rows = 0
+            for table, columns, values in self.reader.rows(tables):
+                seen[table] = seen.get(table, 0) + 1
+                if seen[table] <= done.get(table, 0):
+                    continue  # committed by an earlier run
+                chunk = chunks.setdefault(table, [])
+                chunk.append(self._prepare(table, columns, values))
+                if len(chunk) >= self.batch_size:
+                    self._write_chunk(table, chunk, len(chunk))
+                    total_rows += len(chunk)
+                    chunks[table] = []
+                now = time.monotonic()
+                if now - last_report >= 5:
+                    last_report = now
+                    pct = 100.0 * self.reader.bytes_read / max(self.reader.size, 1)
+                    rate = total_rows / max(now - started, 1e-6)
+                    self.log(f"  pass {number}/{len(PASSES)} {table}: {seen[table]:,} rows read, {pct:5.1f}% of file, {rate:,.0f} rows/s")
+            for table, chunk in chunks.items():
+                if chunk:
+                    self._write_chunk(table, chunk, len(chunk))
+                    total_rows += len(chunk)
+            elapsed = time.monotonic() - started
+            self.log(f"pass {number}/{len(PASSES)} ({', '.join(tables)}) done: {total_rows:,} new rows in {elapsed:.1f}s")
+            if number == 2:
+                self._fix_user_defaults()
+        return self.stats
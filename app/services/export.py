@@ -0,0 +1,200 @@
+from __future__ import annotations
+from typing import Iterator, Optional
+from datetime import datetime
+import json
+import mimetypes
+import os
+import zipfile
+from sqlalchemy import select
+from ..extensions import db
+from ..models.interview import Interview, Message
+from ..models.media import Media
+from ..models.summary import Summary
+from .storage import resolve_storage_path
+from .summaries import original_summaries
+from .summary_formats import html_to_markdown
+
+
+# Hand bytes to the WSGI server once this much output has accumulated.
+FLUSH_BYTES = 64 * 1024
+# Rows fetched per round trip from the server-side cursor.
+YIELD_PER = 1000
+# Read size when copying media files into the archive.
+COPY_BYTES = 1024 * 1024
+# Formats that are already compressed; deflating them again only burns CPU.
+_STORED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".mp3", ".m4a", ".aac", ".ogg", ".oga", ".opus", ".webm", ".mp4", ".mov",
+    ".pdf", ".zip", ".gz",
+}
+
+
+def _already_compressed(arcname: str, mime_type: Optional[str]) -> bool:
+    # Blobs are named by hash alone, so judge by the archive name and the recorded type
+    if os.path.splitext(arcname)[1].lower() in _STORED_EXTENSIONS:
+        return True
+    return bool(mime_type) and mimetypes.guess_extension(mime_type) in _STORED_EXTENSIONS
+
+
+class _ZipSink:
+    """Write-only, non-seekable file object that collects zip output for the generator.
+
+    It deliberately has no ``tell``/``seek`` so ``zipfile`` streams entries with
+    data descriptors instead of seeking back to patch headers.
+    """
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self._buf += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def _zip_info(name: str, when: Optional[datetime], *, stored: bool = False) -> zipfile.ZipInfo:
+    ts = when or datetime.utcnow()
+    info = zipfile.ZipInfo(name, date_time=(max(ts.year, 1980), ts.month, ts.day, ts.hour, ts.minute, ts.second))
+    info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+    return info
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _jsonl(row: dict) -> bytes:
+    return (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _stream_rows(stmt):
+    """Execute ``stmt`` with a server-side cursor, fetching YIELD_PER rows at a time."""
+    return db.session.execute(stmt.execution_options(yield_per=YIELD_PER))
+
+
+def _iter_files(user_id: int):
+    """Yield (arcname, path, created_at, mime_type) for every stored file belonging to the user.
+
+    Paged by primary key rather than held open on a cursor, because each file
+    can take a long time to reach a slow client.
+    """
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Media.id, Media.file_path, Media.original_name, Media.created_at, Media.mime_type)
+            .where(Media.user_id == user_id, Media.id > last_id)
+            .order_by(Media.id.asc())
+            .limit(200)
+        ).all()
+        if not rows:
+            break
+        for media_id, file_path, original_name, created_at, mime_type in rows:
+            # Content-addressed blobs are named by hash; prefer the name the user uploaded
+            name = os.path.basename((original_name or "").replace("\\", "/")) or os.path.basename(file_path)
+            yield f"media/{media_id}_{name}", file_path, created_at, mime_type
+        last_id = rows[-1][0]
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Message.id, Message.audio_path, Message.created_at)
+            .join(Interview, Interview.id == Message.interview_id)
+            .where(Interview.user_id == user_id, Message.audio_path.is_not(None), Message.id > last_id)
+            .order_by(Message.id.asc())
+            .limit(200)
+        ).all()
+        if not rows:
+            break
+        for message_id, audio_path, created_at in rows:
+            yield f"audio/{message_id}_{os.path.basename(audio_path)}", audio_path, created_at, None
+        last_id = rows[-1][0]
+
+
+def stream_account_archive(user_id: int) -> Iterator[bytes]:
+    """Build a ZIP of everything a user owns and yield it piece by piece.
+
+    Contents: ``interviews.jsonl``, ``messages.jsonl``, one HTML file per stored
+    summary, and the files referenced by ``Media.file_path`` and
+    ``Message.audio_path``. Nothing is staged on disk and memory use is bounded
+    by FLUSH_BYTES plus one cursor batch, regardless of account size.
+    """
+    return (chunk for chunk in _archive_chunks(user_id) if chunk)
+
+
+def _archive_chunks(user_id: int) -> Iterator[bytes]:
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", allowZip64=True) as zf:
+        with zf.open(_zip_info("interviews.jsonl", None), "w", force_zip64=True) as fh:
+            stmt = (
+                select(Interview.id, Interview.title, Interview.created_at)
+                .where(Interview.user_id == user_id)
+                .order_by(Interview.id.asc())
+            )
+            for interview_id, title, created_at in _stream_rows(stmt):
+                fh.write(_jsonl({"id": interview_id, "title": title, "created_at": _iso(created_at)}))
+                if len(sink) >= FLUSH_BYTES:
+                    yield sink.drain()
+        yield sink.drain()
+
+        with zf.open(_zip_info("messages.jsonl", None), "w", force_zip64=True) as fh:
+            stmt = (
+                select(Message.id, Message.interview_id, Message.role, Message.content, Message.audio_path, Message.created_at)
+                .join(Interview, Interview.id == Message.interview_id)
+                .where(Interview.user_id == user_id)
+                .order_by(Message.interview_id.asc(), Message.id.asc())
+            )
+            for message_id, interview_id, role, content, audio_path, created_at in _stream_rows(stmt):
+                fh.write(_jsonl({
+                    "id": message_id,
+                    "interview_id": interview_id,
+                    "role": role,
+                    "content": content,
+                    "audio_path": audio_path,
+                    "created_at": _iso(created_at),
+                }))
+                if len(sink) >= FLUSH_BYTES:
+                    yield sink.drain()
+        yield sink.drain()
+
+        stmt = (
+            select(Summary.interview_id, Summary.kind, Summary.format, Summary.content, Summary.updated_at)
+            .where(Summary.user_id == user_id, original_summaries())
+            .order_by(Summary.interview_id.asc(), Summary.id.asc())
+        )
+        for interview_id, kind, fmt, content, updated_at in _stream_rows(stmt):
+            ext = {"html": "html", "markdown": "md"}.get(fmt, "txt")
+            if fmt == "html":
+                # A Markdown copy alongside, converted locally
+                zf.writestr(_zip_info(f"summaries/interview_{interview_id}_{kind}.md", updated_at), html_to_markdown(content))
+                content = f"<!doctype html>\n<html><head><meta charset='utf-8'></head><body>\n{content}\n</body></html>\n"
+            zf.writestr(_zip_info(f"summaries/interview_{interview_id}_{kind}.{ext}", updated_at), content)
+            if len(sink) >= FLUSH_BYTES:
+                yield sink.drain()
+        yield sink.drain()
+
+        for arcname, stored_path, created_at, mime_type in _iter_files(user_id):
+            path = resolve_storage_path(stored_path)
+            if not path:
+                continue
+            stored = _already_compressed(arcname, mime_type)
+            with open(path, "rb") as src, zf.open(_zip_info(arcname, created_at, stored=stored), "w", force_zip64=True) as dst:
+                while True:
+                    block = src.read(COPY_BYTES)
+                    if not block:
+                        break
+                    dst.write(block)
+                    if len(sink) >= FLUSH_BYTES:
+                        yield sink.drain()
+            yield sink.drain()
+    # Central directory is written when the ZipFile closes.
+    yield sink.drain()
@@ -0,0 +1,57 @@
+"""Template caching for the interview pages.
+
+Compiled templates are kept in a FileSystemBytecodeCache so new workers skip
+Jinja compilation, and rendered message/summary blocks are kept in a per-worker
+LRU so a long transcript only renders the messages it has not seen yet.
+
+Messages are never edited, so a message block is keyed by its id (plus
+created_at, in case an id is reused after a delete) and the speaker label.
+Summary blocks are keyed by id and updated_at, which changes on every refresh.
+"""
+from __future__ import annotations
+import os
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from .cache import TTLCache
+
+
+_fragments = TTLCache(maxsize=5000)
+
+
+def _render(template_name: str, key, **context) -> Markup:
+    html = _fragments.get(key)
+    if html is None:
+        html = current_app.jinja_env.get_template(template_name).render(**context)
+        _fragments.set(key, html)
+    return Markup(html)
+
+
+def message_block(message, speaker: str) -> Markup:
+    return _render(
+        "interview/_message.html",
+        ("message", message.id, message.created_at, speaker),
+        m=message,
+        speaker=speaker,
+    )
+
+
+def summary_block(summary) -> Markup:
+    return _render(
+        "interview/_summary_body.html",
+        ("summary", summary.id, summary.updated_at, summary.format),
+        summary=summary,
+    )
+
+
+def clear() -> None:
+    _fragments.clear()
+
+
+def init_app(app) -> None:
+    cache_dir = app.config.get("JINJA_CACHE_DIR")
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    _fragments.maxsize = int(app.config.get("FRAGMENT_CACHE_SIZE", 5000))
+    app.jinja_env.globals.update(message_block=message_block, summary_block=summary_block)
@@ -0,0 +1,87 @@
+"""Conditional GET helpers for private, per-user pages.
+
+Routes build an ETag from the versions that determine their output (row ids,
+``updated_at`` stamps, the viewer's ``User.version``) and call
+:func:`not_modified` before doing any rendering; a matching
+``If-None-Match``/``If-Modified-Since`` turns the request into an empty 304.
+Responses are marked ``private, no-cache`` so browsers keep a copy but always
+revalidate, and shared proxies never store them.
+"""
+from __future__ import annotations
+from typing import Optional
+from datetime import datetime, timezone
+import hashlib
+import os
+from flask import Response, current_app, request, session
+from ..middleware.compression import ENCODINGS
+
+
+_templates_tag: Optional[str] = None
+
+
+def _deploy_tag() -> str:
+    # Newest template mtime, so a deploy that changes markup invalidates old ETags
+    global _templates_tag
+    if _templates_tag is None:
+        newest = 0.0
+        for root, _dirs, files in os.walk(os.path.join(current_app.root_path, current_app.template_folder or "templates")):
+            for name in files:
+                newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+        _templates_tag = str(int(newest))
+    return _templates_tag
+
+
+def make_etag(*parts) -> str:
+    raw = "|".join(str(p) for p in (_deploy_tag(),) + parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def cacheable() -> bool:
+    """False when the page will carry one-off content such as pending flash messages."""
+    return not session.get("_flashes")
+
+
+def _http_date(value: Optional[datetime]) -> Optional[datetime]:
+    # Stored timestamps are naive UTC; HTTP dates have one-second resolution
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def cache_headers(response: Response, etag: str, last_modified: Optional[datetime] = None) -> Response:
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _http_date(last_modified)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+    return response
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """Return a 304 response if the client's copy is current, else None.
+
+    ``If-None-Match`` takes precedence; ``If-Modified-Since`` is only consulted
+    when the client sent no ETag, as RFC 9110 requires. The compression
+    middleware suffixes the ETag of gzip/br bodies, so those forms match too
+    (weak comparison, as RFC 9110 prescribes for If-None-Match), and the 304
+    carries back the tag the client holds.
+    """
+    if not cacheable():
+        return None
+    if request.if_none_match:
+        fresh = False
+        # Same suffix as compression.encoded_etag adds
+        for candidate in (etag,) + tuple(f"{etag}-{enc}" for enc in ENCODINGS):
+            if request.if_none_match.contains_weak(candidate):
+                etag, fresh = candidate, True
+                break
+    elif last_modified is not None and request.if_modified_since is not None:
+        fresh = _http_date(last_modified) <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return cache_headers(Response(status=304), etag, last_modified)
@@ -0,0 +1,150 @@
+"""Resized renditions of photo Media, made on demand and cached on disk.
+
+Derivatives live under ``MEDIA_DIR/derived/`` named by the original's content
+hash, the size name and the format, so they never need invalidating and two
+Media rows sharing a blob share their thumbnails too. Resizing runs on a
+bounded process pool (IMAGE_RENDER_WORKERS) with requests for the same file
+coalesced, and EXIF orientation is applied so phone photos come out upright.
+
+A "photo" PIL cannot decode is logged once and remembered with a ``.bad``
+marker next to where its renditions would go, so later requests fail fast
+instead of rendering it again.
+"""
+from __future__ import annotations
+from typing import Optional
+from concurrent.futures import TimeoutError as FutureTimeout
+import importlib.util
+import os
+import tempfile
+from flask import current_app, url_for
+from .render_pool import RenderPool
+from .storage import resolve_storage_path
+
+
+# Longest edge in pixels for each rendition
+SIZES = {"thumb": 320, "web": 1600}
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+
+pool = RenderPool("images")
+
+
+class ImageUnavailable(RuntimeError):
+    pass
+
+
+class ImageUndecodable(ImageUnavailable):
+    """The stored file is not an image PIL can read."""
+
+
+class ImageRenderTimeout(RuntimeError):
+    """The rendition is still being made after IMAGE_RENDER_TIMEOUT seconds."""
+
+
+def available() -> bool:
+    return importlib.util.find_spec("PIL") is not None
+
+
+def _render(src: str, dest: str, max_edge: int, fmt: str, quality: int) -> str:
+    # Runs in a pool process
+    from PIL import Image, ImageOps  # type: ignore
+
+    try:
+        with Image.open(src) as img:
+            if img.format == "JPEG":
+                # Let the JPEG decoder downscale while reading; far cheaper for big scans
+                img.draft("RGB", (max_edge, max_edge))
+            img = ImageOps.exif_transpose(img)
+            if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            elif img.mode not in ("RGB", "RGBA", "L"):
+                img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        # Corrupt, truncated or not an image at all (UnidentifiedImageError is an OSError)
+        raise ImageUndecodable(f"{e.__class__.__name__}: {e}") from None
+    with img:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                img.save(out, fmt, quality=quality, optimize=fmt == "JPEG", method=4 if fmt == "WEBP" else 0)
+            os.replace(tmp, dest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+    return dest
+
+
+def _source_key(media, src: str) -> str:
+    if media.sha256:
+        return media.sha256
+    # Files stored before content hashing: key by id and modification time
+    return f"media{media.id}-{int(os.path.getmtime(src))}"
+
+
+def _derivative_path(media, src: str, size: str, fmt: str) -> str:
+    key = _source_key(media, src)
+    ext = "jpg" if fmt == "jpeg" else fmt
+    root = os.path.join(os.path.abspath(current_app.config["MEDIA_DIR"]), "derived", key[:2])
+    return os.path.join(root, f"{key}_{size}.{ext}")
+
+
+def _bad_marker(media, src: str) -> str:
+    return _derivative_path(media, src, "source", "bad")
+
+
+def derivative(media, size: str, fmt: str = "jpeg", timeout: Optional[float] = None) -> str:
+    """Path of ``media`` resized to ``size`` in ``fmt``, rendering it first if needed.
+
+    Raises ImageUnavailable when the original is missing, ImageUndecodable when
+    it cannot be read as an image, and ImageRenderTimeout when rendering takes
+    longer than ``timeout`` (the render carries on for the next request).
+    """
+    if size not in SIZES or fmt not in FORMATS:
+        raise ValueError(f"Unknown rendition {size}/{fmt}")
+    src = resolve_storage_path(media.file_path)
+    if src is None:
+        raise ImageUnavailable("Original image is missing")
+    dest = _derivative_path(media, src, size, fmt)
+    if os.path.exists(dest):
+        return dest
+    marker = _bad_marker(media, src)
+    if os.path.exists(marker):
+        raise ImageUndecodable("Original could not be decoded")
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    quality = int(current_app.config.get("IMAGE_QUALITY", 80))
+    timeout = timeout if timeout is not None else current_app.config.get("IMAGE_RENDER_TIMEOUT", 60)
+    try:
+        return pool.run(dest, _render, src, dest, SIZES[size], FORMATS[fmt][0], quality, timeout=timeout)
+    except FutureTimeout:
+        raise ImageRenderTimeout(f"Rendering media {media.id} took longer than {timeout}s") from None
+    except ImageUndecodable as e:
+        current_app.logger.warning("Media %s is not a decodable image: %s", media.id, e)
+        with open(marker, "w") as fh:
+            fh.write(f"{e}\n")
+        raise
+
+
+def warm(media) -> None:
+    """Start rendering every rendition of a new photo without waiting for the results."""
+    if media.kind != "photo" or not available():
+        return
+    src = resolve_storage_path(media.file_path)
+    if src is None:
+        return
+    quality = int(current_app.config.get("IMAGE_QUALITY", 80))
+    for size, max_edge in SIZES.items():
+        for fmt, (pil_format, _mime) in FORMATS.items():
+            dest = _derivative_path(media, src, size, fmt)
+            if not os.path.exists(dest):
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                pool.submit(dest, _render, src, dest, max_edge, pil_format, quality)
+
+
+def image_url(media, size: str = "thumb") -> str:
+    return url_for("media.media_image", media_id=media.id, size=size)
+
+
+def init_app(app) -> None:
+    pool.configure(app.config.get("IMAGE_RENDER_WORKERS", 2))
+    app.jinja_env.globals["media_image_url"] = image_url
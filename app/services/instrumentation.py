@@ -0,0 +1,300 @@
+"""Per-request timings, SQL accounting and the admin request profiler.
+
+Requests time their phases: SQL statements ("db"), calls to the chat model
+("llm"), persona and style resolution ("persona") and template rendering
+("render"). The phases can overlap; persona resolution, for example,
+includes its own queries. The totals are sent back in a ``Server-Timing``
+header and written as one ``request_timing`` log line. SERVER_TIMING decides
+who gets them: "admin" (the default), "all", or "off".
+
+Every request counts its SQL statements by shape (the statement text with
+parameters and IN-lists collapsed). When one shape runs more than
+SQL_REPEAT_WARN times in a request, a warning is logged, which is the usual
+sign of an N+1 loop.
+
+An admin who switches profiling on gets each of their requests run under
+cProfile, with every statement and its timing recorded. Results are written
+to PROFILE_DIR, which keeps only the newest PROFILE_KEEP, and are listed at
+/admin/profiles. Profiling stops at ``after_request``, so the body of a
+streamed response is not included.
+"""
+from __future__ import annotations
+from typing import List, Optional
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+import cProfile
+import glob
+import itertools
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from flask import before_render_template, current_app, g, has_request_context, request, session, template_rendered
+from flask_login import current_user
+from sqlalchemy import event
+from ..extensions import db
+
+
+SESSION_KEY = "profile_requests"
+SORT_KEYS = {"cumulative": 3, "tottime": 2, "ncalls": 1}
+_SKIP_ENDPOINTS = {"static", "asset", "admin.profiles", "admin.profile_detail", "admin.toggle_profiling"}
+_ID_RE = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9]+-[0-9]+$")
+_PARAM_RE = re.compile(r"%\(\w+\)s|\?")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+# cProfile allows one active profiler per process on newer Pythons, so
+# concurrent profiled requests take turns; the loser is simply not profiled.
+_profile_lock = threading.Lock()
+_sequence = itertools.count()
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    shape = _PARAM_RE.sub("?", statement)
+    shape = _IN_LIST_RE.sub("(?)", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+
+def _add_timing(name: str, seconds: float) -> None:
+    timings = g.get("_timings")
+    if timings is None:
+        timings = g._timings = {}
+    timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timing(name: str):
+    """Add the time spent in the block to this request's ``name`` phase."""
+    if not has_request_context():
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_timing(name, time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    shapes = g.get("_sql_shapes")
+    if shapes is None:
+        shapes = g._sql_shapes = Counter()
+    shapes[statement_shape(statement)] += 1
+    conn.info.setdefault("_cmh_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    started = conn.info.get("_cmh_query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    _add_timing("db", elapsed)
+    if g.get("_sql_log") is not None:
+        g._sql_log.append({"sql": statement[:2000], "ms": round(elapsed * 1000.0, 3)})
+
+
+def _before_render(sender, template, context, **extra):
+    g._render_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    started = g.pop("_render_started", None)
+    if started is not None:
+        _add_timing("render", time.perf_counter() - started)
+
+
+def _start_request() -> None:
+    g._request_started = time.perf_counter()
+
+
+def _timing_enabled() -> bool:
+    mode = current_app.config.get("SERVER_TIMING", "admin")
+    if mode == "all":
+        return True
+    if mode == "admin":
+        return current_user.is_authenticated and current_user.is_admin
+    return False
+
+
+def _server_timing(response):
+    started = g.get("_request_started")
+    if started is None or not _timing_enabled():
+        return response
+    total_ms = (time.perf_counter() - started) * 1000.0
+    timings = {name: seconds * 1000.0 for name, seconds in (g.get("_timings") or {}).items()}
+    queries = sum((g.get("_sql_shapes") or {}).values())
+    parts = []
+    for name in ("db", "llm", "persona", "render"):
+        if name in timings:
+            desc = f';desc="{queries} queries"' if name == "db" else ""
+            parts.append(f"{name};dur={timings[name]:.1f}{desc}")
+    parts.append(f"total;dur={total_ms:.1f}")
+    response.headers["Server-Timing"] = ", ".join(parts)
+    current_app.logger.info(
+        "request_timing method=%s path=%s endpoint=%s status=%s total_ms=%.1f db_ms=%.1f queries=%d llm_ms=%.1f persona_ms=%.1f render_ms=%.1f",
+        request.method, request.path, request.endpoint, response.status_code, total_ms,
+        timings.get("db", 0.0), queries, timings.get("llm", 0.0), timings.get("persona", 0.0), timings.get("render", 0.0),
+    )
+    return response
+
+
+def profiling_enabled() -> bool:
+    return bool(session.get(SESSION_KEY)) and current_user.is_authenticated and current_user.is_admin
+
+
+def _start_profile() -> None:
+    if request.endpoint in _SKIP_ENDPOINTS or not profiling_enabled():
+        return
+    if not _profile_lock.acquire(blocking=False):
+        return
+    g._sql_log = []
+    g._profile_started = time.perf_counter()
+    g._profiler = cProfile.Profile()
+    g._profiler.enable()
+
+
+def _finish_profile(response):
+    profiler = g.pop("_profiler", None)
+    if profiler is None:
+        return response
+    try:
+        profiler.disable()
+        elapsed_ms = (time.perf_counter() - g._profile_started) * 1000.0
+        _save_profile(profiler, {
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "ms": round(elapsed_ms, 1),
+            "sql": g.pop("_sql_log", []),
+            "repeated": repeated_statements(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        })
+    except Exception:
+        current_app.logger.exception("Could not save request profile")
+    finally:
+        _profile_lock.release()
+    return response
+
+
+def repeated_statements(threshold: Optional[int] = None) -> List[dict]:
+    """Statement shapes this request ran more than ``threshold`` times, most frequent first."""
+    if threshold is None:
+        threshold = int(current_app.config.get("SQL_REPEAT_WARN", 10))
+    shapes = g.get("_sql_shapes") or {}
+    return [{"sql": shape, "count": n} for shape, n in Counter(shapes).most_common() if n > threshold]
+
+
+def _teardown(_exc=None) -> None:
+    profiler = g.pop("_profiler", None)
+    if profiler is not None:
+        # The request failed before after_request ran
+        profiler.disable()
+        _profile_lock.release()
+    _warn_repeated()
+
+
+def _warn_repeated() -> None:
+    threshold = int(current_app.config.get("SQL_REPEAT_WARN", 10))
+    if threshold <= 0:
+        return
+    for item in repeated_statements(threshold):
+        current_app.logger.warning(
+            "Possible N+1: %s %s ran the same statement %d times: %s",
+            request.method, request.path, item["count"], item["sql"][:300],
+        )
+
+
+def _profile_dir() -> str:
+    return os.path.abspath(current_app.config.get("PROFILE_DIR", "storage/profiles"))
+
+
+def _save_profile(profiler: cProfile.Profile, meta: dict) -> None:
+    root = _profile_dir()
+    os.makedirs(root, exist_ok=True)
+    profile_id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{os.getpid()}-{next(_sequence)}"
+    meta["id"] = profile_id
+    profiler.dump_stats(os.path.join(root, f"{profile_id}.prof"))
+    with open(os.path.join(root, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    _enforce_retention(root, int(current_app.config.get("PROFILE_KEEP", 50)))
+
+
+def _newest_first(root: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(root, "*.json")), key=lambda p: (os.path.getmtime(p), p), reverse=True)
+
+
+def _enforce_retention(root: str, keep: int) -> None:
+    entries = _newest_first(root)
+    for path in entries[max(keep, 0):]:
+        for stale in (path, path[: -len(".json")] + ".prof"):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def list_profiles() -> List[dict]:
+    root = _profile_dir()
+    out = []
+    for path in _newest_first(root):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta["queries"] = len(meta.pop("sql", []))
+        out.append(meta)
+    return out
+
+
+def load_profile(profile_id: str, sort: str = "cumulative", limit: int = 60) -> Optional[dict]:
+    """Metadata, SQL list and the top ``limit`` functions of one stored profile."""
+    if not _ID_RE.match(profile_id):
+        return None
+    base = os.path.join(_profile_dir(), profile_id)
+    try:
+        with open(base + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        stats = pstats.Stats(base + ".prof")
+    except (OSError, ValueError):
+        return None
+    project_root = os.path.dirname(current_app.root_path) + os.sep
+    column = SORT_KEYS.get(sort, SORT_KEYS["cumulative"])
+    rows = []
+    for (filename, line, func), (primitive, calls, tottime, cumtime, _callers) in sorted(
+        stats.stats.items(), key=lambda item: item[1][column], reverse=True
+    )[:limit]:
+        rows.append({
+            "function": f"{filename.replace(project_root, '')}:{line}({func})",
+            "ncalls": calls if calls == primitive else f"{calls}/{primitive}",
+            "tottime_ms": round(tottime * 1000, 2),
+            "cumtime_ms": round(cumtime * 1000, 2),
+            "percall_ms": round(cumtime * 1000 / calls, 3) if calls else 0,
+        })
+    meta["functions"] = rows
+    meta["total_sql_ms"] = round(sum(q["ms"] for q in meta.get("sql", [])), 2)
+    return meta
+
+
+def init_app(app) -> None:
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.before_request(_start_request)
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    # Registered last so it runs first, before the profile is written to disk
+    app.after_request(_server_timing)
+    app.teardown_request(_teardown)
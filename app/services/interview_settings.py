@@ -0,0 +1,65 @@
+from __future__ import annotations
+from typing import Optional
+from dataclasses import dataclass
+from flask import current_app
+from sqlalchemy import select
+from ..extensions import db
+from ..models.interview import Interview, InterviewSettings
+from .cache import TTLCache
+
+
+@dataclass(frozen=True)
+class InterviewSettingsSnapshot:
+    persona_id: Optional[int] = None
+    debug_chat: bool = False
+    no_thread: bool = False
+
+
+# Per-worker cache; writes below evict the local entry and other workers
+# pick the change up once INTERVIEW_SETTINGS_CACHE_TTL expires.
+_cache = TTLCache(maxsize=4096)
+
+
+def get_interview_settings(interview_id: int) -> InterviewSettingsSnapshot:
+    """Return persona selection and admin toggles for an interview (one query on a miss)."""
+    snapshot = _cache.get(interview_id)
+    if snapshot is not None:
+        return snapshot
+    row = db.session.execute(
+        select(Interview.persona_id, InterviewSettings.debug_chat, InterviewSettings.no_thread)
+        .outerjoin(InterviewSettings, InterviewSettings.interview_id == Interview.id)
+        .where(Interview.id == interview_id)
+    ).first()
+    if row is None:
+        snapshot = InterviewSettingsSnapshot()
+    else:
+        snapshot = InterviewSettingsSnapshot(
+            persona_id=row[0],
+            debug_chat=bool(row[1]),
+            no_thread=bool(row[2]),
+        )
+    _cache.set(interview_id, snapshot, ttl=current_app.config.get("INTERVIEW_SETTINGS_CACHE_TTL", 5))
+    return snapshot
+
+
+def invalidate_interview_settings(interview_id: int) -> None:
+    _cache.pop(interview_id)
+
+
+def select_interview_persona(interview_id: int, persona_id: Optional[int]) -> None:
+    Interview.query.filter_by(id=interview_id).update({Interview.persona_id: persona_id})
+    db.session.commit()
+    invalidate_interview_settings(interview_id)
+
+
+def set_interview_flag(interview_id: int, name: str, enabled: bool) -> None:
+    """Persist one of the admin toggles (``debug_chat`` or ``no_thread``)."""
+    if name not in ("debug_chat", "no_thread"):
+        raise ValueError(f"Unknown interview setting: {name}")
+    settings = InterviewSettings.query.get(interview_id)
+    if settings is None:
+        settings = InterviewSettings(interview_id=interview_id)
+        db.session.add(settings)
+    setattr(settings, name, bool(enabled))
+    db.session.commit()
+    invalidate_interview_settings(interview_id)
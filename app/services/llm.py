@@ -1,14 +1,21 @@
 from __future__ import annotations
 from typing import List, Dict, Optional
 import os
+import time
 from datetime import datetime
-from flask import current_app, session
+from flask import current_app
 from flask_login import current_user
+from sqlalchemy import event
+from ..extensions import db
 from ..models.interview import Message
 from ..models.persona import Persona, PersonaStyle, CommStyle
 from .providers.openai_provider import OpenAIProvider
 from .providers.anthropic_provider import AnthropicProvider
 from .providers.google_provider import GoogleProvider
+from .providers.stub_provider import StubChatProvider
+from .interview_settings import get_interview_settings
+from .instrumentation import timing
+from . import llm_usage
 
 
 def _provider():
@@ -17,17 +24,76 @@ def _provider():
         return AnthropicProvider()
     if provider == "google":
         return GoogleProvider()
+    if provider == "stub":
+        return StubChatProvider()
     return OpenAIProvider()
 
 
+# Writes sent to the database but not yet committed: flushed ORM changes and
+# session.execute(insert/update/delete). _chat refuses to run over them.
+_UNCOMMITTED = "uncommitted_writes"
+
+
+@event.listens_for(db.session, "after_flush")
+def _note_flush(session, _flush_context):
+    session.info[_UNCOMMITTED] = True
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def _note_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_UNCOMMITTED] = True
+
+
+@event.listens_for(db.session, "after_transaction_end")
+def _forget_writes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_UNCOMMITTED, None)
+
+
+def _chat(messages: List[Dict[str, str]], *, purpose: str, interview_id: Optional[int] = None,
+          user_id: Optional[int] = None) -> str:
+    """Call the configured provider and record the call in the usage ledger.
+
+    Callers must have committed their writes first, including flushed changes
+    and bulk statements; anything still uncommitted raises RuntimeError. The
+    session's read transaction is then rolled back, so no pooled connection
+    sits idle for the seconds the provider takes. Objects loaded before the
+    call reload on next access.
+    """
+    if db.session.new or db.session.dirty or db.session.deleted or db.session.info.get(_UNCOMMITTED):
+        # Ending the transaction here would silently commit or drop the caller's unit of work
+        raise RuntimeError("Commit pending database changes before calling the model")
+    db.session.rollback()
+    provider = _provider()
+    started = time.perf_counter()
+    error = None
+    try:
+        with timing("llm"):
+            return provider.chat(messages)
+    except Exception as e:
+        error = f"{e.__class__.__name__}: {e}"
+        raise
+    finally:
+        llm_usage.record(
+            provider=current_app.config.get("LLM_PROVIDER", "openai"),
+            model=str(getattr(provider, "model", "")),
+            purpose=purpose,
+            latency_ms=(time.perf_counter() - started) * 1000.0,
+            usage=getattr(provider, "last_usage", None),
+            error=error,
+            interview_id=interview_id,
+            user_id=user_id,
+        )
+
+
 def _default_system_prompt(*, interview_id: Optional[int] = None) -> Dict[str, str]:
     # If a persona is selected for this interview, use a neutral base instruction
     # so the persona styles fully shape tone and language.
     has_selected_persona = False
     if interview_id is not None:
         try:
-            sel = session.get(f"sel_persona_{interview_id}")
-            has_selected_persona = bool(sel)
+            has_selected_persona = bool(get_interview_settings(interview_id).persona_id)
         except Exception:
             has_selected_persona = False
     content = (
@@ -49,9 +115,9 @@ def _active_persona_system_suffix(*, interview_id: Optional[int] = None) -> Opti
 		persona: Optional[Persona] = None
 		if interview_id is not None:
 			try:
-				pid_raw = session.get(f"sel_persona_{interview_id}")
-				if pid_raw:
-					p_tmp = Persona.query.get(int(pid_raw))
+				pid = get_interview_settings(interview_id).persona_id
+				if pid:
+					p_tmp = Persona.query.get(pid)
 					if p_tmp and (p_tmp.is_system or p_tmp.user_id == current_user.id):
 						persona = p_tmp
 			except Exception:
@@ -72,12 +138,25 @@ def _active_persona_system_suffix(*, interview_id: Optional[int] = None) -> Opti
 			.order_by(CommStyle.sort.asc(), CommStyle.style_name.asc())
 			.all()
 		)
-		prompts = [s.prompt.strip() for s in styles if s.prompt and s.visible]
-		return "\n\n".join(prompts) if prompts else None
+		return _format_style_suffix(styles)
 	except Exception:
 		return None
 
 
+def _format_style_suffix(styles: List[CommStyle]) -> Optional[str]:
+	prompts = [s.prompt.strip() for s in styles if s.prompt and s.visible]
+	return "\n\n".join(prompts) if prompts else None
+
+
+def _with_persona(system: Dict[str, str], style_block: Optional[str], suffix: Optional[str]) -> Dict[str, str]:
+	"""``system`` with the persona's styles appended, as every chat turn adds them."""
+	# Prefer the structured style constraints block; fall back to raw suffix if needed
+	composed_suffix = style_block if style_block else suffix
+	if not composed_suffix:
+		return system
+	return {**system, "content": f"{system['content'].rstrip()}\n\n{composed_suffix}"}
+
+
 def _selected_persona_and_styles(interview_id: Optional[int]) -> Optional[Dict[str, object]]:
 	"""Return selected Persona and its styles (sorted), if any."""
 	try:
@@ -85,10 +164,10 @@ def _selected_persona_and_styles(interview_id: Optional[int]) -> Optional[Dict[s
 			return None
 		persona: Optional[Persona] = None
 		if interview_id is not None:
-			pid_raw = session.get(f"sel_persona_{interview_id}")
-			if pid_raw:
+			pid = get_interview_settings(interview_id).persona_id
+			if pid:
 				try:
-					p_tmp = Persona.query.get(int(pid_raw))
+					p_tmp = Persona.query.get(pid)
 					if p_tmp and (p_tmp.is_system or p_tmp.user_id == current_user.id):
 						persona = p_tmp
 				except Exception:
@@ -116,6 +195,10 @@ def _style_constraints_block(interview_id: Optional[int]) -> Optional[str]:
 	if not meta:
 		return None
 	styles: List[CommStyle] = meta["styles"]  # type: ignore[assignment]
+	return _format_style_constraints(styles)
+
+
+def _format_style_constraints(styles: List[CommStyle]) -> Optional[str]:
 	if not styles:
 		return None
 	lines = [
@@ -132,10 +215,52 @@ def _style_constraints_block(interview_id: Optional[int]) -> Optional[str]:
 	return "\n".join(lines)
 
 
+def persona_styles(persona_id: Optional[int]) -> List[CommStyle]:
+	"""Visible styles of a persona in prompt order, without the per-request access checks."""
+	if not persona_id:
+		return []
+	return (
+		CommStyle.query.join(PersonaStyle, PersonaStyle.comm_style_id == CommStyle.id)
+		.filter(PersonaStyle.persona_id == persona_id, CommStyle.visible == True)  # noqa: E712
+		.order_by(CommStyle.sort.asc(), CommStyle.style_name.asc())
+		.all()
+	)
+
+
+def opening_question_prompt(topic: str, styles: List[CommStyle], *,
+                            interview_id: Optional[int] = None) -> List[Dict[str, str]]:
+    """Prompt for the first question of a new interview.
+
+    The system message is assembled exactly as ``get_chat_response`` builds it
+    for the interview's later turns, so the opening question and the rest of
+    the conversation share one base instruction and persona text.
+    """
+    system = _with_persona(
+        _default_system_prompt(interview_id=interview_id),
+        _format_style_constraints(styles),
+        _format_style_suffix(styles),
+    )
+    return [
+        system,
+        {
+            "role": "user",
+            "content": (
+                f"We are starting a new interview about: {topic}. "
+                "Open it with a single warm, specific question about this topic. Reply with the question only."
+            ),
+        },
+    ]
+
+
+def generate_opening_question(messages: List[Dict[str, str]], *, interview_id: Optional[int] = None,
+                              user_id: Optional[int] = None) -> str:
+    return _chat(messages, purpose="opening", interview_id=interview_id, user_id=user_id).strip()
+
+
 def get_chat_response(interview_id: int) -> str:
     history: List[Message] = (
         Message.query.filter_by(interview_id=interview_id)
-        .order_by(Message.created_at.asc())
+        .order_by(Message.created_at.asc(), Message.id.asc())
         .all()
     )
 
@@ -145,27 +270,33 @@ def get_chat_response(interview_id: int) -> str:
     ]
 
     # Ensure a system message exists and is augmented with persona styles
-    suffix = _active_persona_system_suffix(interview_id=interview_id)
-    style_block = _style_constraints_block(interview_id)
-    # Prefer the structured style constraints block; fall back to raw suffix if needed
-    composed_suffix = style_block if style_block else suffix
-
-    if messages and messages[0]["role"] == "system":
-        if composed_suffix:
-            messages[0]["content"] = f"{messages[0]['content'].rstrip()}\n\n{composed_suffix}"
-    else:
-        base = _default_system_prompt(interview_id=interview_id)
-        if composed_suffix:
-            base["content"] = f"{base['content']}\n\n{composed_suffix}"
-        messages = [base] + messages
+    with timing("persona"):
+        suffix = _active_persona_system_suffix(interview_id=interview_id)
+        style_block = _style_constraints_block(interview_id)
+
+        if messages and messages[0]["role"] == "system":
+            messages[0] = _with_persona(messages[0], style_block, suffix)
+        else:
+            messages = [_with_persona(_default_system_prompt(interview_id=interview_id), style_block, suffix)] + messages
+
+    # Everything the debug dump reads from the database is loaded before the provider call
+    debug_meta = None
+    debug = get_interview_settings(interview_id).debug_chat and current_user.is_authenticated and current_user.is_admin
+    if debug:
+        meta = _selected_persona_and_styles(interview_id)
+        if meta:
+            p = meta["persona"]
+            debug_meta = {
+                "persona": f"id={p.id} name={p.name} system={p.is_system} default={p.is_default}",
+                "styles": [f"- {s.style_name} (key={s.key})" for s in meta["styles"]],
+            }
 
     # Call provider
-    response_text = _provider().chat(messages)
+    response_text = _chat(messages, purpose="chat", interview_id=interview_id)
 
     # Optional debug dump for admins
     try:
-        dbg_key = f"debug_chat_{interview_id}"
-        if session.get(dbg_key) == "1" and current_user.is_authenticated and current_user.is_admin:
+        if debug:
             try:
                 os.makedirs("debugs", exist_ok=True)
             except Exception:
@@ -183,18 +314,15 @@ def get_chat_response(interview_id: int) -> str:
             except Exception:
                 provider_name = "<unknown>"
                 provider_model = "<unknown>"
-            meta = _selected_persona_and_styles(interview_id)
             with open(fname, "a", encoding="utf-8") as f:
                 f.write(f"=== PROVIDER ===\n{name:=<{1}}".replace("name", ""))
                 f.write(f"provider={provider_name} model={provider_model}\n\n")
-                if meta:
-                    p = meta["persona"]
-                    styles = meta["styles"]
+                if debug_meta:
                     f.write(f"=== SELECTED PERSONA ===\n")
-                    f.write(f"id={p.id} name={p.name} system={p.is_system} default={p.is_default}\n")
+                    f.write(debug_meta["persona"] + "\n")
                     f.write("Styles (sorted):\n")
-                    for s in styles:
-                        f.write(f"- {s.style_name} (key={s.key})\n")
+                    for line in debug_meta["styles"]:
+                        f.write(line + "\n")
                     f.write("\n")
                 f.write("=== SYSTEM PROMPT ===\n")
                 if sys_msg:
@@ -216,25 +344,19 @@ def get_chat_response(interview_id: int) -> str:
     return response_text
 
 
-def summarize_transcript(
-    messages: List[Dict[str, str]], *, output_format: str = "html", person_name: Optional[str] = None
-) -> str:
-    """Generate a structured summary of an interview transcript.
+_SUMMARY_SYSTEM = (
+    "You are an expert biographer and editor. Given an interview transcript, "
+    "produce an engaging, well-organized, and visually engaging personal history. "
+    "Write warmly, faithful to the speaker's voice. Avoid inventing facts."
+)
 
-    messages: list of {role, content} across the interview.
-    output_format: 'html' | 'markdown' | 'text'
-    """
-    system = (
-        "You are an expert biographer and editor. Given an interview transcript, "
-        "produce an engaging, well-organized, and visually engaging personal history. "
-        "Write warmly, faithful to the speaker's voice. Avoid inventing facts."
-    )
 
+def _summary_instructions(output_format: str, person_name: Optional[str]) -> str:
     # Personalization for heading
     heading_name = person_name or "the speaker"
 
     if output_format == "html":
-        instructions = (
+        return (
             "Return RAW HTML (no Markdown fences) with these sections in order: "
             f"<h1>From the personal history of {heading_name} ❤️</h1> (emoji at the end), a short <p> intro, "
             "<h2>Chapters 📖</h2> with multiple <section> elements each containing <h3>Chapter title 🔸</h3> and <p> blocks, "
@@ -243,24 +365,60 @@ def summarize_transcript(
             "Use only simple tags: h1,h2,h3,p,section,ul,ol,li,blockquote,em,strong. "
             "DO NOT include any backticks or code fences."
         )
-    elif output_format == "markdown":
-        instructions = (
+    if output_format == "markdown":
+        return (
             f"Return Markdown beginning with: # From the personal history of {heading_name} ❤️ (emoji at the end). "
             "Then an introductory paragraph, ## Chapters (### per chapter), ## Themes as a bullet list, and ## Timeline if applicable. "
             "Emphasize 3–7 standout phrases with *italics*. Do not include code fences."
         )
-    else:
-        instructions = (
-            "Return a plain text narrative summary, followed by sections for THEMES and TIMELINE if applicable."
-        )
+    return "Return a plain text narrative summary, followed by sections for THEMES and TIMELINE if applicable."
+
+
+def _transcript_text(messages: List[Dict[str, str]]) -> str:
+    return "\n".join([f"{m['role']}: {m['content']}" for m in messages])
 
+
+def summarize_transcript(
+    messages: List[Dict[str, str]], *, output_format: str = "html", person_name: Optional[str] = None,
+    interview_id: Optional[int] = None,
+) -> str:
+    """Generate a structured summary of an interview transcript.
+
+    messages: list of {role, content} across the interview.
+    output_format: 'html' | 'markdown' | 'text'
+    """
     prompt_messages: List[Dict[str, str]] = [
-        {"role": "system", "content": system},
-        {"role": "user", "content": instructions},
+        {"role": "system", "content": _SUMMARY_SYSTEM},
+        {"role": "user", "content": _summary_instructions(output_format, person_name)},
         {"role": "user", "content": "Here is the interview transcript:"},
+        {"role": "user", "content": _transcript_text(messages)},
     ]
+    return _chat(prompt_messages, purpose=f"summary_{output_format}", interview_id=interview_id)
+
 
-    transcript_text = "\n".join([f"{m['role']}: {m['content']}" for m in messages])
-    prompt_messages.append({"role": "user", "content": transcript_text})
+def update_summary(
+    previous: str, new_messages: List[Dict[str, str]], *, output_format: str = "html",
+    person_name: Optional[str] = None, interview_id: Optional[int] = None,
+) -> str:
+    """Merge the part of a transcript added since ``previous`` was written into it.
 
-    return _provider().chat(prompt_messages)
+    Only the earlier summary and the new messages are sent, so refreshing after
+    a short session costs a fraction of a full ``summarize_transcript``.
+    """
+    prompt_messages: List[Dict[str, str]] = [
+        {"role": "system", "content": _SUMMARY_SYSTEM},
+        {"role": "user", "content": _summary_instructions(output_format, person_name)},
+        {"role": "user", "content": "Here is the summary written so far:"},
+        {"role": "user", "content": previous},
+        {"role": "user", "content": "Here is the part of the interview transcript recorded since then:"},
+        {"role": "user", "content": _transcript_text(new_messages)},
+        {
+            "role": "user",
+            "content": (
+                "Return the complete updated summary in the same format. Keep everything that is still accurate, "
+                "weave the new material into the right chapters, themes and timeline (adding chapters where needed), "
+                "and do not drop earlier content."
+            ),
+        },
+    ]
+    return _chat(prompt_messages, purpose=f"summary_update_{output_format}", interview_id=interview_id)
@@ -0,0 +1,231 @@
+"""Ledger of chat-model calls: tokens, latency, outcome and estimated cost.
+
+``record`` only puts the row on an in-memory queue. A background thread in
+each worker writes the queue with one multi-row INSERT every
+LLM_LEDGER_FLUSH_SECONDS, so recording a call adds no database round trip
+to the request that made it. The queue is bounded; if the database falls
+far behind, new rows are dropped and counted instead of blocking requests.
+
+Costs are estimated from LLM_PRICES (USD per million input, output and
+cached-input tokens) at the time of the call.
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+import atexit
+import json
+import os
+import queue
+import threading
+from flask import current_app, has_request_context
+from flask_login import current_user
+from sqlalchemy import case, func, insert, select
+from ..extensions import db
+from ..models.llm_call import LlmCall
+from ..models.user import User
+
+
+# USD per 1M tokens: (input, output, cached input). Override with LLM_PRICES.
+DEFAULT_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60, 0.075),
+    "gpt-4o": (2.50, 10.00, 1.25),
+    "claude-3-haiku-20240307": (0.25, 1.25, 0.03),
+    "claude-3-5-haiku-latest": (0.80, 4.00, 0.08),
+    "gemini-1.5-flash": (0.075, 0.30, 0.01875),
+    "stub": (0.0, 0.0, 0.0),
+}
+
+
+def estimate_cost(model: str, input_tokens: Optional[int], output_tokens: Optional[int],
+                  cached_tokens: Optional[int], prices: Dict[str, tuple]) -> Optional[float]:
+    price = prices.get(model)
+    if price is None or input_tokens is None or output_tokens is None:
+        return None
+    cached = min(cached_tokens or 0, input_tokens)
+    in_price, out_price, cached_price = (tuple(price) + (price[0],))[:3]
+    return ((input_tokens - cached) * in_price + cached * cached_price + output_tokens * out_price) / 1_000_000
+
+
+class LedgerWriter:
+    def __init__(self, app, *, flush_seconds: float = 2.0, batch_size: int = 200, max_pending: int = 10000):
+        self.app = app
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def put(self, row: dict) -> None:
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self) -> None:
+        # Started lazily, and again in a forked worker where the parent's thread does not exist
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="llm-ledger", daemon=True)
+                self._thread.start()
+
+    def _drain(self, first: Optional[dict] = None) -> List[dict]:
+        rows = [first] if first is not None else []
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                continue
+            self._write(self._drain(first))
+
+    def _write(self, rows: List[dict]) -> None:
+        if not rows:
+            return
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(insert(LlmCall.__table__), rows)
+            self.written += len(rows)
+        except Exception:
+            self.failed += len(rows)
+            self.app.logger.exception("Could not write %d LLM ledger rows", len(rows))
+
+    def flush(self) -> None:
+        """Write everything queued so far from the calling thread."""
+        while not self._queue.empty():
+            self._write(self._drain())
+
+    def stats(self) -> dict:
+        return {"pending": self._queue.qsize(), "written": self.written, "dropped": self.dropped, "failed": self.failed}
+
+
+writer: Optional[LedgerWriter] = None
+
+
+def init_app(app) -> None:
+    global writer
+    writer = LedgerWriter(app, flush_seconds=float(app.config.get("LLM_LEDGER_FLUSH_SECONDS", 2)))
+    atexit.register(writer.flush)
+    app.extensions["llm_ledger"] = writer
+
+
+def _prices() -> Dict[str, tuple]:
+    prices = dict(DEFAULT_PRICES)
+    raw = current_app.config.get("LLM_PRICES")
+    if raw:
+        try:
+            prices.update({k: tuple(v) for k, v in json.loads(raw).items()})
+        except (ValueError, TypeError, AttributeError):
+            current_app.logger.warning("Ignoring malformed LLM_PRICES")
+    return prices
+
+
+def record(*, provider: str, model: str, purpose: str, latency_ms: float, usage: Optional[dict] = None,
+           error: Optional[str] = None, interview_id: Optional[int] = None, user_id: Optional[int] = None) -> None:
+    if writer is None:
+        return
+    usage = usage or {}
+    if user_id is None and has_request_context() and current_user.is_authenticated:
+        user_id = current_user.id
+    input_tokens = usage.get("input_tokens")
+    output_tokens = usage.get("output_tokens")
+    cached_tokens = usage.get("cached_tokens")
+    writer.put({
+        "created_at": datetime.utcnow(),
+        "user_id": user_id,
+        "interview_id": interview_id,
+        "purpose": purpose,
+        "provider": provider,
+        "model": model or "<unknown>",
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_tokens": cached_tokens,
+        "latency_ms": int(round(latency_ms)),
+        "outcome": "error" if error else "ok",
+        "error": error[:255] if error else None,
+        "cost_usd": estimate_cost(model, input_tokens, output_tokens, cached_tokens, _prices()),
+    })
+
+
+def _totals(*group_by):
+    return (
+        *group_by,
+        func.count(LlmCall.id),
+        func.sum(case((LlmCall.outcome == "error", 1), else_=0)),
+        func.sum(LlmCall.input_tokens),
+        func.sum(LlmCall.output_tokens),
+        func.sum(LlmCall.cost_usd),
+        func.avg(LlmCall.latency_ms),
+        func.max(LlmCall.latency_ms),
+    )
+
+
+def _row(values) -> dict:
+    calls, errors, tokens_in, tokens_out, cost, avg_ms, max_ms = values
+    return {
+        "calls": int(calls or 0),
+        "errors": int(errors or 0),
+        "input_tokens": int(tokens_in or 0),
+        "output_tokens": int(tokens_out or 0),
+        "cost_usd": round(float(cost or 0), 4),
+        "avg_ms": int(avg_ms or 0),
+        "max_ms": int(max_ms or 0),
+    }
+
+
+def _since(days: int) -> datetime:
+    return datetime.utcnow() - timedelta(days=days)
+
+
+def by_day(days: int = 14) -> List[dict]:
+    day = func.date(LlmCall.created_at)
+    stmt = select(*_totals(day)).where(LlmCall.created_at >= _since(days)).group_by(day).order_by(day.desc())
+    return [{"day": r[0], **_row(r[1:])} for r in db.session.execute(stmt)]
+
+
+def by_user(days: int = 30, limit: int = 25) -> List[dict]:
+    stmt = (
+        select(*_totals(LlmCall.user_id, User.name, User.email))
+        .outerjoin(User, User.id == LlmCall.user_id)
+        .where(LlmCall.created_at >= _since(days))
+        .group_by(LlmCall.user_id, User.name, User.email)
+        .order_by(func.sum(LlmCall.cost_usd).desc(), func.count(LlmCall.id).desc())
+        .limit(limit)
+    )
+    return [{"user_id": r[0], "name": r[1], "email": r[2], **_row(r[3:])} for r in db.session.execute(stmt)]
+
+
+def by_interview(days: int = 30, limit: int = 25) -> List[dict]:
+    stmt = (
+        select(*_totals(LlmCall.interview_id, LlmCall.user_id))
+        .where(LlmCall.created_at >= _since(days), LlmCall.interview_id.isnot(None))
+        .group_by(LlmCall.interview_id, LlmCall.user_id)
+        .order_by(func.sum(LlmCall.cost_usd).desc(), func.count(LlmCall.id).desc())
+        .limit(limit)
+    )
+    return [{"interview_id": r[0], "user_id": r[1], **_row(r[2:])} for r in db.session.execute(stmt)]
+
+
+def by_purpose(days: int = 30) -> List[dict]:
+    stmt = (
+        select(*_totals(LlmCall.purpose, LlmCall.provider, LlmCall.model))
+        .where(LlmCall.created_at >= _since(days))
+        .group_by(LlmCall.purpose, LlmCall.provider, LlmCall.model)
+        .order_by(func.count(LlmCall.id).desc())
+    )
+    return [{"purpose": r[0], "provider": r[1], "model": r[2], **_row(r[3:])} for r in db.session.execute(stmt)]
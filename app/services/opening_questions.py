@@ -0,0 +1,221 @@
+"""First assistant question for a new interview, ready before the page loads.
+
+Questions are cached per (topic, persona) in ``opening_questions``. An entry
+counts only when it was generated from the same prompt, so editing a
+persona's styles retires its questions. ``scripts/warm_opening_questions.py``
+(run it from cron) fills in the recommended topics for the system default
+persona and for the default personas of users who started an interview
+within OPENING_QUESTION_MAX_AGE_HOURS, and regenerates entries older than
+that. Until then an old entry is still served. Every other persona gets its
+questions on demand.
+
+A title with no usable entry, such as a custom topic, gets its question from
+a background thread started when the interview is created. The thread holds
+the interview's chat-turn lease, so a first message sent in the meantime
+waits for the question instead of overtaking it.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
+import hashlib
+import threading
+from flask import current_app
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from ..extensions import db
+from ..models.interview import Interview, Message
+from ..models.opening_question import OpeningQuestion
+from ..models.persona import Persona
+from .chat_turns import TurnBusy, interview_lease
+from .llm import generate_opening_question, opening_question_prompt, persona_styles
+
+
+UNTITLED = "Untitled Topic"
+
+# Suggested topics – complementary areas commonly included in a life history
+RECOMMENDED_TOPICS = [
+    "Childhood",
+    "Family",
+    "School",
+    "Work and Career",
+    "Relationships",
+    "Marriage",
+    "Children",
+    "Hobbies",
+    "Travel",
+    "Traditions",
+    "Turning Points",
+    "Faith and Beliefs",
+    "Homes and Places Lived",
+    "Military Service",
+    "Community Service",
+    "Health and Challenges",
+    "Technology in Your Life",
+    "Daily Life and Routines",
+    "Holidays and Celebrations",
+    "Favorite Books and Movies",
+    "Lessons Learned",
+    "Advice to Descendants",
+]
+
+
+def normalize_topic(title: str) -> str:
+    return " ".join((title or "").split()).lower()[:255]
+
+
+def _cacheable(topic: str) -> bool:
+    # Custom titles are rarely reused; only shared topics earn a cache row
+    return topic in {normalize_topic(t) for t in RECOMMENDED_TOPICS + [UNTITLED]}
+
+
+def _prompt(title: str, styles, interview_id: Optional[int] = None) -> Tuple[List[Dict[str, str]], str]:
+    topic = title
+    if normalize_topic(title) == normalize_topic(UNTITLED):
+        topic = "whatever part of their life they would like to start with"
+    messages = opening_question_prompt(topic, styles, interview_id=interview_id)
+    # The topic is part of the cache key; the hash covers everything else in the prompt,
+    # including the base instruction and the persona's style block or suffix
+    template = opening_question_prompt("{topic}", styles, interview_id=interview_id)
+    digest = hashlib.sha1("\n".join(m["content"] for m in template).encode("utf-8")).hexdigest()
+    return messages, digest
+
+
+def effective_persona_id(user_id: int) -> Optional[int]:
+    """The persona a new interview starts with: the user's default, else the system default."""
+    return db.session.execute(
+        select(Persona.id)
+        .where(Persona.is_default == True)  # noqa: E712
+        .where((Persona.user_id == user_id) | (Persona.is_system == True))  # noqa: E712
+        .order_by(Persona.is_system.asc(), Persona.id.asc())
+        .limit(1)
+    ).scalar()
+
+
+def lookup(title: str, persona_id: Optional[int], prompt_hash: str) -> Optional[str]:
+    return db.session.execute(
+        select(OpeningQuestion.content).where(
+            OpeningQuestion.topic == normalize_topic(title),
+            OpeningQuestion.persona_key == (persona_id or 0),
+            OpeningQuestion.prompt_hash == prompt_hash,
+        )
+    ).scalar()
+
+
+def store(title: str, persona_id: Optional[int], prompt_hash: str, content: str) -> None:
+    values = {"prompt_hash": prompt_hash, "content": content, "generated_at": datetime.utcnow()}
+    where = (OpeningQuestion.topic == normalize_topic(title), OpeningQuestion.persona_key == (persona_id or 0))
+    if db.session.execute(update(OpeningQuestion).where(*where).values(**values)).rowcount == 0:
+        db.session.add(OpeningQuestion(topic=normalize_topic(title), persona_key=persona_id or 0, **values))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker inserted it first; theirs is as good as ours
+            db.session.rollback()
+        return
+    db.session.commit()
+
+
+def start_interview(interview: Interview) -> bool:
+    """Give a new interview its opening question.
+
+    Returns True when a cached question was added right away, False when one
+    is being generated in the background (or the feature is off).
+    """
+    if not current_app.config.get("OPENING_QUESTIONS", True):
+        return False
+    persona_id = effective_persona_id(interview.user_id)
+    _messages, prompt_hash = _prompt(interview.title, persona_styles(persona_id), interview.id)
+    content = lookup(interview.title, persona_id, prompt_hash)
+    if content:
+        db.session.add(Message(interview_id=interview.id, role="assistant", content=content))
+        db.session.commit()
+        return True
+    start_in_background(interview.id, interview.user_id, interview.title, persona_id)
+    return False
+
+
+def start_in_background(interview_id: int, user_id: int, title: str, persona_id: Optional[int]) -> None:
+    app = current_app._get_current_object()
+
+    def _target():
+        with app.app_context():
+            try:
+                generate_for_interview(interview_id, user_id, title, persona_id)
+            except Exception:
+                app.logger.exception("Could not generate the opening question for interview %s", interview_id)
+
+    threading.Thread(target=_target, name=f"opening-{interview_id}", daemon=True).start()
+
+
+def generate_for_interview(interview_id: int, user_id: int, title: str, persona_id: Optional[int]) -> bool:
+    messages, prompt_hash = _prompt(title, persona_styles(persona_id), interview_id)
+    try:
+        with interview_lease(interview_id):
+            started = db.session.execute(
+                select(func.count(Message.id)).where(Message.interview_id == interview_id)
+            ).scalar()
+            if started:
+                # The user got there first; an opening question now would be out of place
+                return False
+            content = generate_opening_question(messages, interview_id=interview_id, user_id=user_id)
+            if not content:
+                return False
+            db.session.add(Message(interview_id=interview_id, role="assistant", content=content))
+            db.session.commit()
+    except TurnBusy:
+        return False
+    if _cacheable(normalize_topic(title)):
+        store(title, persona_id, prompt_hash, content)
+    return True
+
+
+def _personas_to_warm(since: datetime) -> List[Optional[int]]:
+    # The system default (None when there is none), then the defaults of recently active users.
+    # Warming every user's default would cost a model call per topic per signup.
+    system_default = db.session.execute(
+        select(Persona.id)
+        .where(Persona.is_system == True, Persona.is_default == True)  # noqa: E712
+        .order_by(Persona.id.asc())
+        .limit(1)
+    ).scalar()
+    recent = db.session.execute(
+        select(Persona.id)
+        .join(Interview, Interview.user_id == Persona.user_id)
+        .where(Persona.is_default == True, Interview.created_at >= since)  # noqa: E712
+        .distinct()
+        .order_by(Persona.id.asc())
+    ).scalars()
+    return [system_default] + [pid for pid in recent if pid != system_default]
+
+
+def warm(topics: Optional[Iterable[str]] = None, force: bool = False) -> Dict[str, int]:
+    """Generate missing, outdated and (with ``force``) all entries for the personas worth warming."""
+    topics = list(topics if topics is not None else RECOMMENDED_TOPICS + [UNTITLED])
+    max_age = timedelta(hours=float(current_app.config.get("OPENING_QUESTION_MAX_AGE_HOURS", 168)))
+    cutoff = datetime.utcnow() - max_age
+    persona_ids = _personas_to_warm(cutoff)
+    existing = {
+        (row.topic, row.persona_key): row
+        for row in db.session.execute(
+            select(OpeningQuestion.topic, OpeningQuestion.persona_key, OpeningQuestion.prompt_hash, OpeningQuestion.generated_at)
+        )
+    }
+    stats = {"generated": 0, "fresh": 0, "failed": 0}
+    for persona_id in persona_ids:
+        styles = persona_styles(persona_id)
+        for title in topics:
+            messages, prompt_hash = _prompt(title, styles)
+            row = existing.get((normalize_topic(title), persona_id or 0))
+            if not force and row is not None and row.prompt_hash == prompt_hash and row.generated_at >= cutoff:
+                stats["fresh"] += 1
+                continue
+            try:
+                content = generate_opening_question(messages)
+            except Exception:
+                current_app.logger.exception("Could not generate an opening question for %r", title)
+                stats["failed"] += 1
+                continue
+            if content:
+                store(title, persona_id, prompt_hash, content)
+                stats["generated"] += 1
+    return stats
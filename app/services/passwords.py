@@ -0,0 +1,130 @@
+"""Password hashing on a small bounded thread pool.
+
+bcrypt releases the GIL while it works, so running it on a dedicated pool
+caps how many CPU cores sign-ins can use at once: a burst of logins queues
+behind PASSWORD_HASH_WORKERS threads instead of competing with chat requests
+for every core. Request threads simply wait on the result.
+"""
+from __future__ import annotations
+from typing import Callable, Optional, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+import math
+import os
+import re
+import threading
+import time
+from ..extensions import bcrypt
+
+
+T = TypeVar("T")
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 15
+_COST_RE = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+
+class PasswordHashingBusy(RuntimeError):
+    """Raised when the hashing queue stays full for longer than the wait limit."""
+
+
+class PasswordHasher:
+    def __init__(self, *, workers: int = 2, queue_size: int = 32, wait_seconds: float = 10.0, rounds: int = 12):
+        self.rounds = rounds
+        self.wait_seconds = wait_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="bcrypt")
+        # Running + queued jobs; further callers wait, then give up
+        self._slots = threading.BoundedSemaphore(max(1, workers) + max(0, queue_size))
+
+    def _run(self, fn: Callable[..., T], *args) -> T:
+        if not self._slots.acquire(timeout=self.wait_seconds):
+            raise PasswordHashingBusy("Password hashing queue is full")
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(bcrypt.generate_password_hash, password, self.rounds).decode("utf-8")
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._run(bcrypt.check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: Optional[str]) -> bool:
+        """True when a bcrypt hash was made with a lower work factor than the current one.
+
+        Stronger hashes are left alone, so lowering the cost never weakens
+        existing passwords.
+        """
+        m = _COST_RE.match(password_hash or "")
+        return bool(m) and int(m.group(1)) < self.rounds
+
+
+def calibrate_rounds(target_ms: float) -> int:
+    """Pick the bcrypt cost whose hash time on this machine is closest to, but not over, target_ms."""
+    started = time.perf_counter()
+    bcrypt.generate_password_hash("calibration", MIN_ROUNDS)
+    elapsed_ms = max((time.perf_counter() - started) * 1000.0, 0.1)
+    # Each extra round doubles the work
+    extra = math.floor(math.log2(max(target_ms, elapsed_ms) / elapsed_ms))
+    return max(MIN_ROUNDS, min(MAX_ROUNDS, MIN_ROUNDS + extra))
+
+
+hasher = PasswordHasher()
+
+_ROUNDS_SETTING = "bcrypt_log_rounds"
+
+
+def init_app(app) -> None:
+    """Size the pool from config; the work factor is settled by settle_rounds once tables exist."""
+    global hasher
+    hasher = PasswordHasher(
+        workers=int(app.config.get("PASSWORD_HASH_WORKERS", 2)),
+        queue_size=int(app.config.get("PASSWORD_HASH_QUEUE", 32)),
+        wait_seconds=float(app.config.get("PASSWORD_HASH_WAIT", 10)),
+        rounds=int(app.config["BCRYPT_LOG_ROUNDS"]),
+    )
+
+
+def settle_rounds(app) -> int:
+    """Pick the work factor every worker uses. Call inside an app context.
+
+    An explicit BCRYPT_LOG_ROUNDS in the environment wins. Otherwise the first
+    worker to start calibrates against BCRYPT_TARGET_MS and stores the result
+    in ``app_settings``; later workers, on this host or another, read it back
+    instead of calibrating again, so they all agree on one cost. Delete the
+    row to recalibrate.
+    """
+    from sqlalchemy.exc import IntegrityError
+    from ..extensions import db
+    from ..models.app_setting import AppSetting
+
+    if os.getenv("BCRYPT_LOG_ROUNDS"):
+        rounds = int(app.config["BCRYPT_LOG_ROUNDS"])
+    else:
+        setting = db.session.get(AppSetting, _ROUNDS_SETTING)
+        if setting is None:
+            calibrated = calibrate_rounds(float(app.config.get("BCRYPT_TARGET_MS", 250)))
+            db.session.add(AppSetting(key=_ROUNDS_SETTING, value=str(calibrated)))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another worker stored its calibration first; use that one
+                db.session.rollback()
+            setting = db.session.get(AppSetting, _ROUNDS_SETTING)
+        rounds = int(setting.value)
+    app.config["BCRYPT_LOG_ROUNDS"] = rounds
+    hasher.rounds = rounds
+    app.logger.info("bcrypt work factor %s, %s hashing threads", rounds, app.config.get("PASSWORD_HASH_WORKERS", 2))
+    return rounds
+
+
+def hash_password(password: str) -> str:
+    return hasher.hash(password)
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    return hasher.verify(password_hash, password)
+
+
+def needs_rehash(password_hash: Optional[str]) -> bool:
+    return hasher.needs_rehash(password_hash)
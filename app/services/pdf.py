@@ -0,0 +1,93 @@
+"""Summary PDF export, rendered off the web worker and cached on disk.
+
+PDFs are stored under PDF_CACHE_DIR keyed by (summary id, updated_at,
+PDF_TEMPLATE_VERSION), so repeat downloads are served straight from disk and a
+refreshed summary or changed wrapper markup simply produces a new file.
+"""
+from __future__ import annotations
+from typing import Optional
+import glob
+import importlib.util
+import os
+import tempfile
+from flask import current_app
+from .render_pool import RenderPool
+
+
+# Bump when the wrapper markup below changes so cached copies are rebuilt
+PDF_TEMPLATE_VERSION = 1
+
+_HTML_WRAPPER = """
+    <html><head>
+    <meta charset='utf-8'>
+    <style>
+      body {{ font-family: DejaVu Sans, Arial, sans-serif; }}
+      h1, h2, h3 {{ color: #111; }}
+      .standout {{ font-style: italic; }}
+    </style>
+    </head><body>
+    {content}
+    </body></html>
+    """
+
+pool = RenderPool("pdf")
+
+
+class PdfRenderError(RuntimeError):
+    pass
+
+
+def available() -> bool:
+    return importlib.util.find_spec("xhtml2pdf") is not None
+
+
+def _render_to_file(html_doc: str, dest: str) -> str:
+    # Runs in a pool process: write next to the target, then rename into place
+    # so readers never see a partial file.
+    from xhtml2pdf import pisa  # type: ignore
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            result = pisa.CreatePDF(html_doc, dest=out)
+        if result.err:
+            raise PdfRenderError(f"xhtml2pdf reported {result.err} error(s)")
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return dest
+
+
+def _cache_path(summary) -> str:
+    stamp = summary.updated_at.strftime("%Y%m%d%H%M%S%f") if summary.updated_at else "0"
+    name = f"summary_{summary.id}_{stamp}_v{PDF_TEMPLATE_VERSION}.pdf"
+    return os.path.join(os.path.abspath(current_app.config["PDF_CACHE_DIR"]), name)
+
+
+def _remove_stale(summary, keep: str) -> None:
+    pattern = os.path.join(os.path.abspath(current_app.config["PDF_CACHE_DIR"]), f"summary_{summary.id}_*.pdf")
+    for path in glob.glob(pattern):
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def summary_pdf_path(summary, timeout: Optional[float] = None) -> str:
+    """Return the path of the rendered PDF for ``summary``, rendering it on a miss."""
+    path = _cache_path(summary)
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    html_doc = _HTML_WRAPPER.format(content=summary.content)
+    timeout = timeout if timeout is not None else current_app.config.get("PDF_RENDER_TIMEOUT", 120)
+    pool.run(path, _render_to_file, html_doc, path, timeout=timeout)
+    _remove_stale(summary, keep=path)
+    return path
+
+
+def init_app(app) -> None:
+    pool.configure(app.config.get("PDF_RENDER_WORKERS", 2))
@@ -9,7 +9,8 @@ class AnthropicProvider:
     def __init__(self):
         api_key = current_app.config.get("ANTHROPIC_API_KEY") or os.getenv("ANTHROPIC_API_KEY")
         self.client = anthropic.Client(api_key=api_key)
-        self.model = "claude-3-haiku-20240307"
+        self.model = current_app.config.get("ANTHROPIC_MODEL") or "claude-3-haiku-20240307"
+        self.last_usage: Dict[str, int] = {}
 
     def chat(self, messages: List[Dict[str, str]]) -> str:
         # Anthropic supports a "system" field and chat-style list
@@ -28,4 +29,13 @@ class AnthropicProvider:
             system=system or "You are a kind, patient biographer interviewing an elderly person.",
             messages=content_messages or [{"role": "user", "content": "Hello"}],
         )
+        usage = getattr(msg, "usage", None)
+        if usage is not None:
+            cached = getattr(usage, "cache_read_input_tokens", None) or 0
+            # Anthropic reports cache reads separately from input_tokens
+            self.last_usage = {
+                "input_tokens": usage.input_tokens + cached,
+                "output_tokens": usage.output_tokens,
+                "cached_tokens": cached,
+            }
         return msg.content[0].text.strip()
@@ -9,10 +9,19 @@ class GoogleProvider:
     def __init__(self):
         api_key = current_app.config.get("GOOGLE_API_KEY") or os.getenv("GOOGLE_API_KEY")
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-flash")
+        self.model = current_app.config.get("GOOGLE_MODEL") or "gemini-1.5-flash"
+        self.client = genai.GenerativeModel(self.model)
+        self.last_usage: Dict[str, int] = {}
 
     def chat(self, messages: List[Dict[str, str]]) -> str:
         # Flatten messages into a conversation string
         convo = "\n".join([f"{m['role']}: {m['content']}" for m in messages])
-        resp = self.model.generate_content(convo)
+        resp = self.client.generate_content(convo)
+        usage = getattr(resp, "usage_metadata", None)
+        if usage is not None:
+            self.last_usage = {
+                "input_tokens": usage.prompt_token_count,
+                "output_tokens": usage.candidates_token_count,
+                "cached_tokens": getattr(usage, "cached_content_token_count", None) or 0,
+            }
         return resp.text.strip()
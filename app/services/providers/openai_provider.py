@@ -9,9 +9,18 @@ class OpenAIProvider:
     def __init__(self):
         api_key = current_app.config.get("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
         self.client = OpenAI(api_key=api_key)
-        self.model = "gpt-4o-mini"
+        self.model = current_app.config.get("OPENAI_MODEL") or "gpt-4o-mini"
+        self.last_usage: Dict[str, int] = {}
 
     def chat(self, messages: List[Dict[str, str]]) -> str:
         # Map to OpenAI format
         response = self.client.chat.completions.create(model=self.model, messages=messages, temperature=0.4)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            self.last_usage = {
+                "input_tokens": usage.prompt_tokens,
+                "output_tokens": usage.completion_tokens,
+                "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+            }
         return response.choices[0].message.content.strip()
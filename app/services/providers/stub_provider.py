@@ -0,0 +1,52 @@
+from __future__ import annotations
+from typing import Dict, List
+import hashlib
+import os
+import time
+from flask import current_app
+
+
+class StubTranscriptionProvider:
+    """Offline stand-in for a speech-to-text API, for tests and local development.
+
+    Returns a placeholder naming the chunk file after sleeping
+    TRANSCRIPTION_STUB_DELAY seconds to mimic network latency.
+    """
+
+    def __init__(self):
+        self.model = "stub"
+        self.delay = float(current_app.config.get("TRANSCRIPTION_STUB_DELAY", 0))
+
+    def transcribe(self, path: str, language: str | None = None) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        return f"[transcribed {os.path.basename(path)}]"
+
+
+class StubChatProvider:
+    """Deterministic offline chat model (LLM_PROVIDER=stub) for benchmarks and development.
+
+    The reply depends only on the conversation, so repeated runs do the same
+    work. Sleeps LLM_STUB_DELAY seconds first to stand in for API latency.
+    """
+
+    def __init__(self):
+        self.model = "stub"
+        self.delay = float(current_app.config.get("LLM_STUB_DELAY", 0))
+        self.last_usage: Dict[str, int] = {}
+
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        digest = hashlib.sha1("\n".join(m["content"] for m in messages).encode("utf-8")).hexdigest()[:8]
+        words = sum(len(m["content"].split()) for m in messages)
+        if any("RAW HTML" in m["content"] for m in messages):
+            reply = (
+                f"<h1>From the personal history of the speaker ❤️</h1><p>Stub summary {digest} of {words} words.</p>"
+                "<h2>Chapters 📖</h2><section><h3>Early years 🔸</h3><p>A <em class='standout'>stub</em> chapter.</p></section>"
+            )
+        else:
+            reply = f"Stub reply {digest}: what happened next? ({len(messages)} messages, {words} words so far)"
+        # Rough token counts so the usage ledger has something to add up
+        self.last_usage = {"input_tokens": words * 4 // 3, "output_tokens": len(reply.split()) * 4 // 3, "cached_tokens": 0}
+        return reply
@@ -0,0 +1,19 @@
+from __future__ import annotations
+import os
+from openai import OpenAI
+from flask import current_app
+
+
+class WhisperProvider:
+    def __init__(self):
+        api_key = current_app.config.get("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY")
+        self.client = OpenAI(api_key=api_key)
+        self.model = current_app.config.get("TRANSCRIPTION_MODEL") or "whisper-1"
+
+    def transcribe(self, path: str, language: str | None = None) -> str:
+        with open(path, "rb") as f:
+            kwargs = {"model": self.model, "file": f}
+            if language:
+                kwargs["language"] = language
+            response = self.client.audio.transcriptions.create(**kwargs)
+        return (response.text or "").strip()
@@ -0,0 +1,66 @@
+"""Bounded process pools for CPU-heavy rendering, with request coalescing.
+
+Work such as PDF layout is pure Python and holds the GIL, so running it in a
+web worker stalls every other request on that worker. A :class:`RenderPool`
+hands it to a small ``spawn`` process pool instead, and concurrent callers
+asking for the same key share one job rather than rendering it twice.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Hashable, Optional
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import threading
+
+
+class RenderPool:
+    def __init__(self, name: str, workers: int = 2):
+        self.name = name
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, workers: int) -> None:
+        with self._lock:
+            self.workers = max(1, int(workers))
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Created on first use so each web worker process gets its own pool after forking
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args) -> Future:
+        """Start ``fn(*args)`` in the pool unless a job for ``key`` is already running."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            try:
+                future = self._pool().submit(fn, *args)
+            except BrokenProcessPool:
+                # A pool process died (e.g. OOM-killed); start a fresh pool
+                self._executor = None
+                future = self._pool().submit(fn, *args)
+            self._inflight[key] = future
+        # Outside the lock: a future that is already done runs the callback right here,
+        # and _forget takes the lock itself
+        future.add_done_callback(lambda _f: self._forget(key, _f))
+        return future
+
+    def run(self, key: Hashable, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        return self.submit(key, fn, *args).result(timeout=timeout)
+
+    def _forget(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,75 @@
+from __future__ import annotations
+from typing import Optional
+import os
+import re
+import shutil
+from flask import current_app
+
+
+_SHA256_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def storage_roots() -> list[str]:
+    """Absolute storage directories that stored file paths may live under."""
+    roots = []
+    for key in ("MEDIA_DIR", "UPLOAD_DIR"):
+        value = current_app.config.get(key)
+        if value:
+            roots.append(os.path.abspath(value))
+    return roots
+
+
+def resolve_storage_path(path: Optional[str]) -> Optional[str]:
+    """Map a stored `file_path`/`audio_path` to an existing file on disk.
+
+    Relative paths are tried against MEDIA_DIR then UPLOAD_DIR. Anything that
+    resolves outside those directories is refused so a bad row can't be used
+    to read arbitrary files.
+    """
+    if not path:
+        return None
+    roots = storage_roots()
+    candidates = [path] if os.path.isabs(path) else [os.path.join(root, path) for root in roots]
+    for candidate in candidates:
+        real = os.path.realpath(candidate)
+        if not any(real == r or real.startswith(r + os.sep) for r in map(os.path.realpath, roots)):
+            continue
+        if os.path.isfile(real):
+            return real
+    return None
+
+
+def blob_relpath(sha256: str) -> str:
+    """Content-addressed location for a file, relative to MEDIA_DIR.
+
+    Two levels of two-hex-digit shards keep directories small:
+    ``blobs/ab/cd/abcd...``. The name is the hash alone, so the same bytes
+    uploaded as ``.JPG``, ``.jpeg`` or with no extension share one blob; the
+    extension and MIME type live on the ``Media`` row.
+    """
+    return os.path.join("blobs", sha256[:2], sha256[2:4], sha256)
+
+
+def blob_sha256(path: Optional[str]) -> Optional[str]:
+    """The content hash a blob path was named after, or None for any other stored path."""
+    parts = (path or "").replace("\\", "/").split("/")
+    if len(parts) == 4 and parts[0] == "blobs" and _SHA256_RE.fullmatch(parts[3]):
+        return parts[3]
+    return None
+
+
+def store_blob(src: str, sha256: str) -> str:
+    """Move ``src`` into content-addressed storage and return its MEDIA_DIR-relative path.
+
+    If a file with the same hash is already stored, ``src`` is discarded and
+    the existing blob is shared.
+    """
+    rel = blob_relpath(sha256)
+    dest = os.path.join(os.path.abspath(current_app.config["MEDIA_DIR"]), rel)
+    if os.path.exists(dest):
+        os.remove(src)
+        return rel
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    # shutil.move renames when UPLOAD_DIR and MEDIA_DIR share a filesystem and copies otherwise
+    shutil.move(src, dest)
+    return rel
@@ -0,0 +1,292 @@
+"""Declarative sync of communication styles and system personas from YAML.
+
+The file is either the legacy flat mapping ``key: prompt`` (as in
+``ses_specs/comm_styles.yaml``) or a document with two sections::
+
+    styles:
+      casual: "prompt text"            # or a mapping:
+      formal: {name: Formal, prompt: "...", visible: true, sort: 20}
+    personas:
+      - name: Grandchild
+        description: Curious and warm
+        is_default: true
+        styles: [casual, empathetic]
+
+Styles are matched by key and system personas by name. Fields given in the
+file win; fields left out keep their database value on update and get a
+default on create. Nothing is deleted. ``plan_sync`` reads the current state
+in three queries and ``apply_sync`` writes every change with bulk statements
+in a single transaction, so the cost does not grow with the number of styles.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Set
+from dataclasses import dataclass, field
+from datetime import datetime
+import os
+import yaml
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+from ..extensions import db
+from ..models.persona import CommStyle, Persona, PersonaStyle
+
+
+STYLE_FIELDS = ("style_name", "prompt", "visible", "sort")
+PERSONA_FIELDS = ("description", "is_default")
+
+
+class StyleSyncError(ValueError):
+    pass
+
+
+@dataclass
+class Change:
+    kind: str  # "style" or "persona"
+    action: str  # "create" or "update"
+    key: str
+    fields: Dict[str, object] = field(default_factory=dict)
+
+    def describe(self) -> str:
+        sign = "+" if self.action == "create" else "~"
+        if self.action == "create":
+            return f"{sign} {self.kind} {self.key}"
+        return f"{sign} {self.kind} {self.key}: {', '.join(sorted(self.fields))}"
+
+
+@dataclass
+class SyncPlan:
+    changes: List[Change] = field(default_factory=list)
+    unchanged: int = 0
+
+    def count(self, kind: str, action: str) -> int:
+        return sum(1 for c in self.changes if c.kind == kind and c.action == action)
+
+    def summary(self) -> str:
+        return (
+            f"Styles: {self.count('style', 'create')} new, {self.count('style', 'update')} changed. "
+            f"Personas: {self.count('persona', 'create')} new, {self.count('persona', 'update')} changed. "
+            f"{self.unchanged} unchanged."
+        )
+
+
+def default_path() -> str:
+    return os.path.join(os.path.dirname(current_app.root_path), "ses_specs", "comm_styles.yaml")
+
+
+def _display_name(key: str) -> str:
+    return key.replace("_", " ").replace("-", " ").title()
+
+
+def _style_key(key) -> str:
+    # YAML turns a bare ``null:`` key into None
+    key_str = key if isinstance(key, str) else "null"
+    return (key_str or "null").strip() or "null"
+
+
+def parse_spec(data) -> tuple:
+    """Normalise a loaded YAML document into (styles, personas) lists of field dicts."""
+    data = data or {}
+    if not isinstance(data, dict):
+        raise StyleSyncError("Expected a mapping at the top level")
+    if set(data) & {"styles", "personas"} and set(data) <= {"styles", "personas"}:
+        raw_styles = data.get("styles") or {}
+        raw_personas = data.get("personas") or []
+    else:
+        raw_styles, raw_personas = data, []
+    if not isinstance(raw_styles, dict):
+        raise StyleSyncError("'styles' must be a mapping of key to prompt")
+    if not isinstance(raw_personas, list):
+        raise StyleSyncError("'personas' must be a list")
+
+    styles = []
+    for position, (key, value) in enumerate(raw_styles.items(), start=1):
+        spec = {"key": _style_key(key), "position": position}
+        if isinstance(value, dict):
+            if "prompt" in value:
+                spec["prompt"] = str(value["prompt"] or "").strip()
+            if value.get("name"):
+                spec["style_name"] = str(value["name"]).strip()
+            if "visible" in value:
+                spec["visible"] = bool(value["visible"])
+            if "sort" in value:
+                spec["sort"] = int(value["sort"])
+        else:
+            spec["prompt"] = str(value or "").strip()
+        styles.append(spec)
+
+    personas = []
+    for entry in raw_personas:
+        if not isinstance(entry, dict) or not str(entry.get("name") or "").strip():
+            raise StyleSyncError("Every persona needs a name")
+        spec = {"name": str(entry["name"]).strip()}
+        if "description" in entry:
+            spec["description"] = (str(entry["description"] or "").strip() or None)
+        if "is_default" in entry:
+            spec["is_default"] = bool(entry["is_default"])
+        if "styles" in entry:
+            spec["styles"] = [_style_key(k) for k in (entry["styles"] or [])]
+        personas.append(spec)
+    if sum(1 for p in personas if p.get("is_default")) > 1:
+        raise StyleSyncError("Only one persona can be the default")
+    return styles, personas
+
+
+def load_spec(path: Optional[str] = None) -> tuple:
+    with open(path or default_path(), "r", encoding="utf-8") as f:
+        return parse_spec(yaml.safe_load(f))
+
+
+def _current_state():
+    styles = {
+        row.key: row
+        for row in db.session.execute(
+            select(CommStyle.id, CommStyle.key, CommStyle.style_name, CommStyle.prompt, CommStyle.visible, CommStyle.sort)
+        )
+    }
+    personas = {
+        row.name: row
+        for row in db.session.execute(
+            select(Persona.id, Persona.name, Persona.description, Persona.is_default).where(Persona.is_system == True)  # noqa: E712
+        )
+    }
+    links: Dict[int, Set[int]] = {}
+    for persona_id, style_id in db.session.execute(
+        select(PersonaStyle.persona_id, PersonaStyle.comm_style_id)
+        .join(Persona, Persona.id == PersonaStyle.persona_id)
+        .where(Persona.is_system == True)  # noqa: E712
+    ):
+        links.setdefault(persona_id, set()).add(style_id)
+    return styles, personas, links
+
+
+def plan_sync(styles: List[dict], personas: List[dict]) -> SyncPlan:
+    current_styles, current_personas, links = _current_state()
+    known_keys = set(current_styles) | {s["key"] for s in styles}
+    plan = SyncPlan()
+
+    for spec in styles:
+        row = current_styles.get(spec["key"])
+        if row is None:
+            plan.changes.append(Change("style", "create", spec["key"], {
+                "style_name": spec.get("style_name") or _display_name(spec["key"]),
+                "prompt": spec.get("prompt", ""),
+                "visible": spec.get("visible", True),
+                "sort": spec.get("sort", spec["position"] * 10),
+            }))
+            continue
+        fields = {f: spec[f] for f in STYLE_FIELDS if f in spec and spec[f] != getattr(row, f)}
+        if not row.style_name and "style_name" not in fields:
+            fields["style_name"] = _display_name(spec["key"])
+        if fields:
+            plan.changes.append(Change("style", "update", spec["key"], fields))
+        else:
+            plan.unchanged += 1
+
+    style_ids = {key: row.id for key, row in current_styles.items()}
+    for spec in personas:
+        missing = [k for k in spec.get("styles", []) if k not in known_keys]
+        if missing:
+            raise StyleSyncError(f"Persona {spec['name']!r} refers to unknown styles: {', '.join(missing)}")
+        row = current_personas.get(spec["name"])
+        if row is None:
+            plan.changes.append(Change("persona", "create", spec["name"], {
+                "description": spec.get("description"),
+                "is_default": spec.get("is_default", False),
+                "styles": spec.get("styles", []),
+            }))
+            continue
+        fields = {f: spec[f] for f in PERSONA_FIELDS if f in spec and spec[f] != getattr(row, f)}
+        if "styles" in spec:
+            wanted = spec["styles"]
+            # Styles created by this same sync have no id yet, so they always count as a change
+            if {style_ids.get(k) for k in wanted} != links.get(row.id, set()):
+                fields["styles"] = wanted
+        if fields:
+            plan.changes.append(Change("persona", "update", spec["name"], fields))
+        else:
+            plan.unchanged += 1
+    return plan
+
+
+def apply_sync(plan: SyncPlan) -> None:
+    """Write ``plan`` in one transaction using a fixed number of bulk statements."""
+    now = datetime.utcnow()
+    try:
+        new_styles = [
+            {"key": c.key, "created_at": now, "updated_at": now, **c.fields}
+            for c in plan.changes if c.kind == "style" and c.action == "create"
+        ]
+        if new_styles:
+            db.session.execute(insert(CommStyle), new_styles)
+
+        changed_styles = [c for c in plan.changes if c.kind == "style" and c.action == "update"]
+        persona_changes = [c for c in plan.changes if c.kind == "persona"]
+        if changed_styles or persona_changes:
+            style_ids = dict(db.session.execute(select(CommStyle.key, CommStyle.id)).all())
+        if changed_styles:
+            db.session.execute(
+                update(CommStyle),
+                [{"id": style_ids[c.key], "updated_at": now, **c.fields} for c in changed_styles],
+            )
+
+        if persona_changes:
+            if any(c.fields.get("is_default") for c in persona_changes):
+                db.session.execute(
+                    update(Persona)
+                    .where(Persona.is_system == True, Persona.is_default == True)  # noqa: E712
+                    .values(is_default=False, updated_at=now)
+                )
+            new_personas = [c for c in persona_changes if c.action == "create"]
+            if new_personas:
+                db.session.execute(insert(Persona), [
+                    {"name": c.key, "description": c.fields["description"], "is_default": c.fields["is_default"],
+                     "is_system": True, "created_at": now, "updated_at": now}
+                    for c in new_personas
+                ])
+            names = [c.key for c in persona_changes]
+            persona_ids = dict(db.session.execute(
+                select(Persona.name, Persona.id).where(Persona.is_system == True, Persona.name.in_(names))  # noqa: E712
+            ).all())
+            updated_personas = [c for c in persona_changes if c.action == "update"]
+            if updated_personas:
+                db.session.execute(update(Persona), [
+                    {"id": persona_ids[c.key], "updated_at": now,
+                     **{f: v for f, v in c.fields.items() if f in PERSONA_FIELDS}}
+                    for c in updated_personas
+                ])
+            relinked = [c for c in persona_changes if "styles" in c.fields]
+            if relinked:
+                db.session.execute(
+                    delete(PersonaStyle).where(PersonaStyle.persona_id.in_([persona_ids[c.key] for c in relinked]))
+                )
+                link_rows = [
+                    {"persona_id": persona_ids[c.key], "comm_style_id": style_ids[k]}
+                    for c in relinked for k in dict.fromkeys(c.fields["styles"])
+                ]
+                if link_rows:
+                    db.session.execute(insert(PersonaStyle), link_rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def sync_from_yaml(path: Optional[str] = None, dry_run: bool = False) -> SyncPlan:
+    styles, personas = load_spec(path)
+    plan = plan_sync(styles, personas)
+    if not dry_run and plan.changes:
+        apply_sync(plan)
+    return plan
+
+
+def existing_style_ids(style_ids: Iterable) -> List[int]:
+    """Filter submitted style ids down to ones that exist, in one query, keeping their order."""
+    ids = []
+    for sid in style_ids:
+        try:
+            ids.append(int(sid))
+        except (TypeError, ValueError):
+            continue
+    if not ids:
+        return []
+    found = set(db.session.execute(select(CommStyle.id).where(CommStyle.id.in_(ids))).scalars())
+    return [i for i in dict.fromkeys(ids) if i in found]
@@ -0,0 +1,166 @@
+"""Session summaries that grow with the interview instead of being rewritten.
+
+A summary remembers the newest message it covers (``last_message_id``). A
+refresh sends the model only the current summary and the messages added
+since, and asks for a merged version. After SUMMARY_REBUILD_AFTER merges in a
+row, or when asked to, the summary is rebuilt from the whole transcript so
+small inaccuracies from repeated merging do not pile up.
+
+Markdown and plain-text versions are converted locally from the HTML (see
+``summary_formats``) and stored as Summary rows of kind ``<kind>:<format>``.
+A stored version is reused while its ``updated_at`` matches the source's.
+"""
+from __future__ import annotations
+from typing import Optional
+from dataclasses import dataclass
+from flask import current_app
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from ..extensions import db
+from ..models.interview import Message
+from ..models.summary import Summary
+from .llm import summarize_transcript, update_summary
+from .summary_formats import CONVERTERS
+
+
+@dataclass
+class SummaryRefresh:
+    mode: str  # "full", "incremental" or "unchanged"
+    new_messages: int = 0
+
+
+def strip_code_fences(text: str) -> str:
+    t = text.strip()
+    if t.startswith("```"):
+        # Remove leading ```lang and trailing ```
+        first_newline = t.find("\n")
+        if first_newline != -1:
+            t = t[first_newline + 1 :]
+        if t.endswith("```"):
+            t = t[:-3]
+        return t.strip()
+    return t
+
+
+def _convo(messages) -> list:
+    return [{"role": m.role, "content": m.content} for m in messages]
+
+
+def refresh_session_summary(interview_id: int, user_id: int, *, person_name: Optional[str] = None,
+                            full: bool = False) -> SummaryRefresh:
+    """Bring the interview's session summary up to date with its transcript.
+
+    Raises LookupError when the interview has no messages yet; errors from the
+    model propagate and leave the stored summary as it was.
+    """
+    summary = Summary.query.filter_by(interview_id=interview_id, kind="session").first()
+    last_id = db.session.execute(
+        select(func.max(Message.id)).where(Message.interview_id == interview_id)
+    ).scalar()
+    if last_id is None:
+        raise LookupError("No messages to summarize yet.")
+    if summary is not None and not full and summary.last_message_id == last_id:
+        return SummaryRefresh("unchanged")
+
+    rebuild_after = int(current_app.config.get("SUMMARY_REBUILD_AFTER", 5))
+    incremental = (
+        summary is not None
+        and not full
+        and summary.format == "html"
+        and summary.last_message_id is not None
+        and summary.incremental_updates < rebuild_after
+    )
+    base_id = summary.last_message_id if summary is not None else None
+    if incremental:
+        new = (
+            Message.query.filter(Message.interview_id == interview_id, Message.id > base_id, Message.id <= last_id)
+            .order_by(Message.created_at.asc(), Message.id.asc())
+            .all()
+        )
+        html = update_summary(summary.content, _convo(new), output_format="html",
+                              person_name=person_name, interview_id=interview_id)
+        count = len(new)
+    else:
+        history = (
+            Message.query.filter(Message.interview_id == interview_id, Message.id <= last_id)
+            .order_by(Message.created_at.asc(), Message.id.asc())
+            .all()
+        )
+        html = summarize_transcript(_convo(history), output_format="html",
+                                    person_name=person_name, interview_id=interview_id)
+        count = len(history)
+    html = strip_code_fences(html)
+
+    # The model call above held no connection; store the result in a short transaction of its own
+    if summary is None:
+        db.session.add(Summary(user_id=user_id, interview_id=interview_id, kind="session", format="html",
+                               content=html, last_message_id=last_id, incremental_updates=0))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent refresh created it first
+            db.session.rollback()
+            return SummaryRefresh("unchanged")
+        return SummaryRefresh("full", count)
+
+    if incremental:
+        # Only merge into the version we started from
+        current = Summary.last_message_id == base_id
+    else:
+        # A refresh that finished first and covers more wins
+        current = Summary.last_message_id.is_(None) | (Summary.last_message_id <= last_id)
+    stored = db.session.execute(
+        update(Summary)
+        .where(Summary.interview_id == interview_id, Summary.kind == "session", current)
+        .values(
+            content=html,
+            format="html",
+            last_message_id=last_id,
+            incremental_updates=(Summary.incremental_updates + 1) if incremental else 0,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if not stored:
+        return SummaryRefresh("unchanged")
+    return SummaryRefresh("incremental" if incremental else "full", count)
+
+
+def derived_kind(kind: str, fmt: str) -> str:
+    return f"{kind}:{fmt}"
+
+
+def original_summaries():
+    """Condition that leaves out the stored Markdown/text copies of summaries."""
+    return Summary.kind.notlike("%:%")
+
+
+def summary_in_format(summary: Summary, fmt: str) -> str:
+    """``summary``'s content as ``fmt`` ("markdown" or "text"), converting and storing it on first use."""
+    if fmt == summary.format:
+        return summary.content
+    if summary.format != "html" or fmt not in CONVERTERS:
+        raise ValueError(f"Cannot derive {fmt} from a {summary.format} summary")
+    kind = derived_kind(summary.kind, fmt)
+    derived = Summary.query.filter_by(interview_id=summary.interview_id, kind=kind).first()
+    if (derived is not None and derived.updated_at == summary.updated_at
+            and derived.last_message_id == summary.last_message_id):
+        return derived.content
+
+    content = CONVERTERS[fmt](summary.content)
+    if derived is None:
+        db.session.add(Summary(
+            user_id=summary.user_id, interview_id=summary.interview_id, kind=kind, format=fmt, content=content,
+            last_message_id=summary.last_message_id, updated_at=summary.updated_at,
+        ))
+    else:
+        derived.content = content
+        derived.last_message_id = summary.last_message_id
+        # Set explicitly so onupdate does not stamp the current time
+        derived.updated_at = summary.updated_at
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent export stored the same conversion
+        db.session.rollback()
+    return content
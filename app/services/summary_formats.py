@@ -0,0 +1,168 @@
+"""Markdown and plain-text renditions of an HTML summary, made without the model.
+
+``summarize_transcript`` asks for a small tag set (h1-h3, p, section, ul/ol/li,
+blockquote, em, strong), so a stdlib HTMLParser walk is enough. Unknown tags
+are dropped and their text kept.
+"""
+from __future__ import annotations
+from typing import List, Optional
+from html.parser import HTMLParser
+import re
+
+
+_SPACE_RE = re.compile(r"\s+")
+_BREAK = "\x00"  # survives whitespace collapsing; becomes a line break
+_MD_ESCAPE_RE = re.compile(r"([\\`*_\[\]])")
+_MD_LINE_START_RE = re.compile(r"^(#|>|[-+] )")
+_MD_NUMBERED_RE = re.compile(r"^(\d+)\. ")
+
+
+class _Renderer(HTMLParser):
+    def __init__(self, markdown: bool):
+        super().__init__(convert_charrefs=True)
+        self.markdown = markdown
+        self.blocks: List[tuple] = []  # (kind, text)
+        self.parts: List[str] = []
+        self.prefix = ""
+        self.prefix_quote = 0  # quote depth when ``prefix`` was set
+        self.kind = "p"
+        self.heading: Optional[int] = None
+        self.lists: List[list] = []  # [tag, next number]
+        self.quote = 0
+        self.opened = False
+        self.list_start = False
+
+    def _quoted(self, text: str, depth: int) -> str:
+        if not depth:
+            return text
+        marker = "> " * depth if self.markdown else "    " * depth
+        return "\n".join(marker + line for line in text.split("\n"))
+
+    # Inline text is collected into ``parts`` and written out as one block.
+    # ``keep`` leaves a pending list marker or heading in place when there is no
+    # text yet, so ``<li><p>...</p></li>`` still renders as a list item.
+    def _flush(self, keep: bool = False) -> None:
+        text = _SPACE_RE.sub(" ", "".join(self.parts)).strip()
+        text = re.sub(f" ?{_BREAK} ?", "  \n" if self.markdown else "\n", text)
+        self.parts = []
+        if not text and keep:
+            return
+        if text:
+            if self.heading and not self.markdown:
+                if self.heading == 1:
+                    text = f"{text.upper()}\n{'=' * len(text)}"
+                elif self.heading == 2:
+                    text = f"{text}\n{'-' * len(text)}"
+            elif self.markdown and not self.prefix:
+                # Keep paragraph text from reading as a heading, quote or list item
+                if _MD_LINE_START_RE.match(text):
+                    text = "\\" + text
+                text = _MD_NUMBERED_RE.sub(r"\1\\. ", text)
+            # Quotes opened inside a list item go after its marker, enclosing ones before it
+            inner = self.quote - self.prefix_quote if self.prefix else 0
+            text = self._quoted(self.prefix + self._quoted(text, inner), self.quote - inner)
+            self.blocks.append((self.kind, text))
+        self.prefix = ""
+        self.prefix_quote = 0
+        self.kind = "p"
+        self.heading = None
+
+    def _open(self, marker: str) -> None:
+        if self.markdown:
+            self.parts.append(marker)
+            self.opened = True
+
+    def _close(self, marker: str) -> None:
+        if not self.markdown:
+            return
+        # "*word *" is not emphasis in Markdown; move the space outside the marker
+        trailing = ""
+        if self.parts and self.parts[-1][-1:].isspace():
+            trailing = " "
+            self.parts[-1] = self.parts[-1].rstrip()
+        self.parts.append(marker + trailing)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("h1", "h2", "h3"):
+            self._flush()
+            self.heading = int(tag[1])
+            if self.markdown:
+                self.prefix = "#" * self.heading + " "
+                self.prefix_quote = self.quote
+        elif tag in ("p", "section", "div"):
+            self._flush(keep=True)
+        elif tag in ("ul", "ol"):
+            self._flush()
+            self.list_start = not self.lists
+            self.lists.append([tag, 1])
+        elif tag == "li":
+            self._flush()
+            indent = "  " * max(len(self.lists) - 1, 0)
+            if self.lists and self.lists[-1][0] == "ol":
+                self.prefix = f"{indent}{self.lists[-1][1]}. "
+                self.lists[-1][1] += 1
+            else:
+                self.prefix = f"{indent}- "
+            self.prefix_quote = self.quote
+            self.kind = "li-first" if self.list_start else "li"
+            self.list_start = False
+        elif tag == "blockquote":
+            self._flush(keep=True)
+            self.quote += 1
+        elif tag == "br":
+            self.parts.append(_BREAK)
+        elif tag in ("em", "i"):
+            self._open("*")
+        elif tag in ("strong", "b"):
+            self._open("**")
+
+    def handle_endtag(self, tag):
+        if tag in ("h1", "h2", "h3", "p", "section", "div", "li"):
+            self._flush()
+        elif tag in ("ul", "ol"):
+            self._flush()
+            if self.lists:
+                self.lists.pop()
+        elif tag == "blockquote":
+            self._flush()
+            self.quote = max(self.quote - 1, 0)
+        elif tag in ("em", "i"):
+            self._close("*")
+        elif tag in ("strong", "b"):
+            self._close("**")
+
+    def handle_data(self, data):
+        if self.markdown:
+            data = _MD_ESCAPE_RE.sub(r"\\\1", data)
+            if self.opened and data.strip():
+                self.opened = False
+                if data[:1].isspace():
+                    marker = self.parts.pop()
+                    self.parts.append(" " + marker)
+                    data = data.lstrip()
+        self.parts.append(data)
+
+    def render(self, html: str) -> str:
+        self.feed(html)
+        self.close()
+        self._flush()
+        out: List[str] = []
+        previous = None
+        for kind, text in self.blocks:
+            if out:
+                # List items stay together; everything else is a separate paragraph
+                out.append("\n" if kind == "li" and previous in ("li", "li-first") else "\n\n")
+            out.append(text)
+            previous = kind
+        return "".join(out) + "\n" if out else ""
+
+
+def html_to_markdown(html: str) -> str:
+    return _Renderer(markdown=True).render(html)
+
+
+def html_to_text(html: str) -> str:
+    return _Renderer(markdown=False).render(html)
+
+
+CONVERTERS = {"markdown": html_to_markdown, "text": html_to_text}
@@ -0,0 +1,225 @@
+"""Server-side transcription of recorded audio into interview messages.
+
+A job splits the recording at silences into ~TRANSCRIPTION_CHUNK_SECONDS
+pieces, sends up to TRANSCRIPTION_CONCURRENCY of them to the provider at once,
+and writes one user ``Message`` per chunk in recording order, with the chunk's
+position stored in ``audio_start_ms``/``audio_end_ms``. An hour of audio in
+60-second chunks at concurrency 4 therefore takes about 15 provider round
+trips' worth of wall time instead of 60.
+
+Jobs run on a background thread in the web process when
+TRANSCRIPTION_IN_PROCESS is true; otherwise (or after a restart) they are
+picked up by ``scripts/run_transcriptions.py``.
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import os
+import shutil
+import threading
+import time
+from flask import current_app
+from ..extensions import db
+from ..models.interview import Message
+from ..models.media import Media
+from ..models.transcription import TranscriptionJob
+from .audio import detect_silences, duration_seconds, extract_chunk, plan_chunks
+from .providers.stub_provider import StubTranscriptionProvider
+from .providers.whisper_provider import WhisperProvider
+from .storage import resolve_storage_path
+
+
+# Jobs still marked running but untouched this long are assumed orphaned by a restart
+STALE_AFTER = timedelta(minutes=15)
+
+
+def _provider():
+    if current_app.config.get("TRANSCRIPTION_PROVIDER", "openai") == "stub":
+        return StubTranscriptionProvider()
+    return WhisperProvider()
+
+
+def job_state(job: TranscriptionJob) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "interview_id": job.interview_id,
+        "media_id": job.media_id,
+        "chunks_total": job.chunks_total,
+        "chunks_done": job.chunks_done,
+        "audio_seconds": job.audio_seconds,
+        "messages_created": job.messages_created,
+        "error": job.error,
+    }
+
+
+def create_job(media: Media, interview_id: int, language: Optional[str] = None) -> TranscriptionJob:
+    """Queue a transcription of ``media`` into ``interview_id``; reuses a live or finished job."""
+    job = (
+        TranscriptionJob.query.filter_by(media_id=media.id, interview_id=interview_id)
+        .filter(TranscriptionJob.status != "failed")
+        .first()
+    )
+    if job is not None:
+        return job
+    job = TranscriptionJob(
+        user_id=media.user_id,
+        interview_id=interview_id,
+        media_id=media.id,
+        audio_path=media.file_path,
+        language=language,
+        status="queued",
+    )
+    db.session.add(job)
+    db.session.commit()
+    if current_app.config.get("TRANSCRIPTION_IN_PROCESS", True):
+        start_in_background(job.id)
+    return job
+
+
+def start_in_background(job_id: int) -> None:
+    app = current_app._get_current_object()
+
+    def _target():
+        with app.app_context():
+            run_job(job_id)
+
+    threading.Thread(target=_target, name=f"transcribe-{job_id}", daemon=True).start()
+
+
+def _claim(job_id: int) -> bool:
+    # Conditional update so two runners never process the same job
+    cutoff = datetime.utcnow() - STALE_AFTER
+    claimed = (
+        TranscriptionJob.query.filter(TranscriptionJob.id == job_id)
+        .filter(
+            (TranscriptionJob.status == "queued")
+            | ((TranscriptionJob.status == "running") & (TranscriptionJob.updated_at < cutoff))
+        )
+        .update(
+            {TranscriptionJob.status: "running", TranscriptionJob.started_at: datetime.utcnow(),
+             TranscriptionJob.updated_at: datetime.utcnow(), TranscriptionJob.chunks_done: 0},
+            synchronize_session=False,
+        )
+    )
+    db.session.commit()
+    return bool(claimed)
+
+
+def _transcribe_chunk(provider, source: str, workdir: str, index: int, start: float, end: float,
+                      language: Optional[str], retries: int = 2) -> str:
+    path = extract_chunk(source, start, end, os.path.join(workdir, f"{index:05d}.wav"))
+    try:
+        for attempt in range(retries + 1):
+            try:
+                return provider.transcribe(path, language)
+            except Exception:
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return ""
+
+
+def run_job(job_id: int) -> Optional[TranscriptionJob]:
+    """Process one job to completion. Returns None if another runner already has it."""
+    if not _claim(job_id):
+        return None
+    job = db.session.get(TranscriptionJob, job_id)
+    config = current_app.config
+    workdir = os.path.join(os.path.abspath(config["UPLOAD_DIR"]), "transcribe", str(job.id))
+    try:
+        source = resolve_storage_path(job.audio_path)
+        if source is None:
+            raise FileNotFoundError(f"Audio file not found: {job.audio_path}")
+        duration = duration_seconds(source)
+        chunks = plan_chunks(
+            duration,
+            detect_silences(source),
+            target=float(config.get("TRANSCRIPTION_CHUNK_SECONDS", 60)),
+            maximum=float(config.get("TRANSCRIPTION_MAX_CHUNK_SECONDS", 120)),
+        )
+        job.audio_seconds = duration
+        job.chunks_total = len(chunks)
+        db.session.commit()
+
+        os.makedirs(workdir, exist_ok=True)
+        provider = _provider()
+        texts: Dict[int, str] = {}
+        workers = max(1, int(config.get("TRANSCRIPTION_CONCURRENCY", 4)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"transcribe-{job.id}") as pool:
+            futures = {
+                pool.submit(_transcribe_chunk, provider, source, workdir, i, start, end, job.language): i
+                for i, (start, end) in enumerate(chunks)
+            }
+            for future in as_completed(futures):
+                texts[futures[future]] = future.result()
+                job.chunks_done = len(texts)
+                db.session.commit()
+
+        job.messages_created = _write_messages(job, chunks, texts)
+        job.status = "done"
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Transcription job %s failed", job_id)
+        job = db.session.get(TranscriptionJob, job_id)
+        job.status = "failed"
+        job.error = str(e)[:2000]
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return job
+
+
+def _write_messages(job: TranscriptionJob, chunks: List[tuple], texts: Dict[int, str]) -> int:
+    # Segments share one created_at (MySQL DATETIME drops sub-second parts, so
+    # offsets would not survive); they are inserted in recording order and the
+    # transcript queries break created_at ties by id. The real position in the
+    # recording is in audio_start_ms/audio_end_ms.
+    created_at = datetime.utcnow()
+    created = 0
+    for i, (start, end) in enumerate(chunks):
+        text = (texts.get(i) or "").strip()
+        if not text:
+            continue
+        db.session.add(
+            Message(
+                interview_id=job.interview_id,
+                role="user",
+                content=text,
+                audio_path=job.audio_path,
+                audio_start_ms=int(start * 1000),
+                audio_end_ms=int(end * 1000),
+                created_at=created_at,
+            )
+        )
+        created += 1
+    return created
+
+
+def run_pending_jobs() -> int:
+    """Run queued jobs and ones orphaned by a restart, oldest first. Returns how many ran."""
+    cutoff = datetime.utcnow() - STALE_AFTER
+    ids = [
+        row[0]
+        for row in db.session.query(TranscriptionJob.id)
+        .filter(
+            (TranscriptionJob.status == "queued")
+            | ((TranscriptionJob.status == "running") & (TranscriptionJob.updated_at < cutoff))
+        )
+        .order_by(TranscriptionJob.id.asc())
+        .all()
+    ]
+    ran = 0
+    for job_id in ids:
+        if run_job(job_id) is not None:
+            ran += 1
+    return ran
@@ -0,0 +1,236 @@
+"""Resumable chunked uploads into content-addressed media storage.
+
+Protocol (all JSON, see ``blueprints/media/routes.py``):
+
+1. ``POST /media/uploads`` announces the file (name, size, optional sha256)
+   and returns an upload id, the chunk size and the current offset.
+2. ``PUT /media/uploads/<id>`` sends one chunk with ``Upload-Offset`` and
+   ``X-Chunk-Sha256`` headers. The body is streamed to the partial file and
+   hashed on the way; a chunk that does not match its hash is rolled back.
+3. After a dropped connection the client ``GET``s the upload to learn the
+   offset and resumes from there.
+4. ``POST /media/uploads/<id>/complete`` checks the whole-file hash, moves the
+   file into ``MEDIA_DIR/blobs/`` by hash and creates the ``Media`` row.
+
+Identical files share one blob on disk. A user re-uploading a file they
+already have gets their existing ``Media`` row back without sending it again;
+other users' files are only matched after the bytes have actually arrived, so
+knowing a hash never grants access to someone else's file.
+"""
+from __future__ import annotations
+from typing import BinaryIO, Optional, Union
+from datetime import datetime, timedelta
+import hashlib
+import mimetypes
+import os
+import re
+import secrets
+from flask import current_app
+from ..extensions import db
+from ..models.media import Media, Upload
+from .storage import store_blob
+
+
+_BLOCK = 64 * 1024
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UploadError(Exception):
+    def __init__(self, message: str, status: int = 400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+def _kind_for(mime_type: Optional[str]) -> str:
+    major = (mime_type or "").split("/", 1)[0]
+    return {"image": "photo", "audio": "audio", "video": "video"}.get(major, "document")
+
+
+def _partial_path(upload: Upload) -> str:
+    return os.path.join(os.path.abspath(current_app.config["UPLOAD_DIR"]), "partial", f"{upload.id}.part")
+
+
+def _normalize_sha(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    value = value.strip().lower()
+    if not _SHA256_RE.match(value):
+        raise UploadError("sha256 must be 64 hex characters")
+    return value
+
+
+def upload_state(upload: Upload) -> dict:
+    return {
+        "id": upload.id,
+        "status": upload.status,
+        "offset": upload.received_bytes,
+        "size": upload.total_size,
+        "chunk_size": upload.chunk_size,
+        "media_id": upload.media_id,
+    }
+
+
+def start_upload(
+    user_id: int,
+    filename: str,
+    size: int,
+    *,
+    mime_type: Optional[str] = None,
+    kind: Optional[str] = None,
+    sha256: Optional[str] = None,
+    interview_id: Optional[int] = None,
+) -> Union[Upload, Media]:
+    """Create an upload, or return the user's existing Media if they already stored this file."""
+    filename = os.path.basename((filename or "").replace("\\", "/")).strip()[:255]
+    if not filename:
+        raise UploadError("filename is required")
+    max_size = current_app.config["UPLOAD_MAX_SIZE"]
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError("size must be a positive number of bytes")
+    if size > max_size:
+        raise UploadError(f"Files larger than {max_size} bytes are not accepted", status=413)
+    sha256 = _normalize_sha(sha256)
+    mime_type = mime_type or mimetypes.guess_type(filename)[0]
+
+    if sha256:
+        existing = Media.query.filter_by(user_id=user_id, sha256=sha256).first()
+        if existing is not None:
+            return existing
+
+    upload = Upload(
+        id=secrets.token_hex(16),
+        user_id=user_id,
+        interview_id=interview_id,
+        filename=filename,
+        kind=kind or _kind_for(mime_type),
+        mime_type=mime_type,
+        total_size=size,
+        chunk_size=current_app.config["UPLOAD_CHUNK_SIZE"],
+        sha256=sha256,
+        received_bytes=0,
+    )
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def write_chunk(upload: Upload, offset: int, stream: BinaryIO, length: Optional[int], chunk_sha256: Optional[str]) -> Upload:
+    """Append one chunk read from ``stream`` at ``offset``.
+
+    The body is copied in 64 KiB blocks, so memory use does not depend on the
+    chunk size. On any failure the partial file is truncated back to ``offset``.
+    """
+    if upload.status != "pending":
+        raise UploadError("Upload is already finished", status=409)
+    if offset != upload.received_bytes:
+        raise UploadError("Chunk does not start at the current offset", status=409, offset=upload.received_bytes)
+    if length is None:
+        raise UploadError("Content-Length is required", status=411)
+    if length <= 0 or length > upload.chunk_size:
+        raise UploadError(f"Chunks must be between 1 and {upload.chunk_size} bytes", status=413)
+    if offset + length > upload.total_size:
+        raise UploadError("Chunk runs past the announced file size", status=413)
+    expected = _normalize_sha(chunk_sha256)
+    if expected is None:
+        raise UploadError("X-Chunk-Sha256 header is required")
+
+    path = _partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    remaining = length
+    with open(path, "r+b" if os.path.exists(path) else "w+b") as out:
+        out.seek(offset)
+        try:
+            while remaining:
+                block = stream.read(min(_BLOCK, remaining))
+                if not block:
+                    raise UploadError("Connection closed before the chunk was complete", offset=offset)
+                digest.update(block)
+                out.write(block)
+                remaining -= len(block)
+            if digest.hexdigest() != expected:
+                raise UploadError("Chunk checksum mismatch", offset=offset)
+            out.flush()
+            os.fsync(out.fileno())
+        except BaseException:
+            out.truncate(offset)
+            raise
+        out.truncate(offset + length)
+
+    # Only advance if nobody else moved the offset meanwhile (e.g. a retried request)
+    updated = Upload.query.filter_by(id=upload.id, received_bytes=offset).update(
+        {Upload.received_bytes: offset + length, Upload.updated_at: datetime.utcnow()}
+    )
+    db.session.commit()
+    if not updated:
+        db.session.refresh(upload)
+        raise UploadError("Chunk was already received", status=409, offset=upload.received_bytes)
+    db.session.refresh(upload)
+    return upload
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete_upload(upload: Upload, caption: Optional[str] = None) -> Media:
+    """Verify the assembled file and turn it into a Media row (idempotent)."""
+    if upload.status == "complete":
+        return db.session.get(Media, upload.media_id)
+    if upload.received_bytes != upload.total_size:
+        raise UploadError("Upload is not finished yet", status=409, offset=upload.received_bytes)
+
+    path = _partial_path(upload)
+    if not os.path.exists(path) or os.path.getsize(path) != upload.total_size:
+        raise UploadError("Uploaded data is missing; please start again", status=410)
+    actual = _file_sha256(path)
+    if upload.sha256 and actual != upload.sha256:
+        os.remove(path)
+        upload.received_bytes = 0
+        db.session.commit()
+        raise UploadError("File checksum mismatch; please upload it again", offset=0)
+
+    media = Media.query.filter_by(user_id=upload.user_id, sha256=actual).first()
+    if media is None:
+        rel = store_blob(path, actual)
+        media = Media(
+            user_id=upload.user_id,
+            interview_id=upload.interview_id,
+            kind=upload.kind,
+            file_path=rel,
+            caption=caption,
+            sha256=actual,
+            size_bytes=upload.total_size,
+            mime_type=upload.mime_type,
+            original_name=upload.filename,
+        )
+        db.session.add(media)
+        db.session.flush()
+    else:
+        os.remove(path)
+    upload.status = "complete"
+    upload.media_id = media.id
+    db.session.commit()
+    return media
+
+
+def cancel_upload(upload: Upload) -> None:
+    path = _partial_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+    db.session.delete(upload)
+    db.session.commit()
+
+
+def purge_stale_uploads(older_than: timedelta) -> int:
+    """Delete unfinished uploads (and their partial files) untouched for ``older_than``."""
+    cutoff = datetime.utcnow() - older_than
+    stale = Upload.query.filter(Upload.status == "pending", Upload.updated_at < cutoff).all()
+    for upload in stale:
+        cancel_upload(upload)
+    return len(stale)
@@ -0,0 +1,178 @@
+"""Daily per-user activity rollups for the admin dashboard.
+
+``refresh_rollups`` recounts activity per (UTC day, user) from the newest day
+already rolled up through today, so a periodic run only touches recent rows.
+Days are processed in month-sized windows and each window is replaced in one
+transaction. LLM calls come from the ``llm_calls`` ledger.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import case, delete, func, insert, select
+from ..extensions import db
+from ..models.interview import Interview, Message
+from ..models.llm_call import LlmCall
+from ..models.summary import Summary
+from ..models.usage import UsageRollup
+from .summaries import original_summaries
+from ..models.user import User
+
+
+METRICS = ("interviews", "messages", "summaries", "llm_calls")
+_WINDOW = timedelta(days=31)
+
+
+def _as_date(value) -> date:
+    # func.date() returns a date on MySQL and an ISO string on SQLite
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _count_queries(start: datetime, end: datetime):
+    interview_day = func.date(Interview.created_at)
+    message_day = func.date(Message.created_at)
+    summary_day = func.date(Summary.created_at)
+    yield "interviews", (
+        select(Interview.user_id, interview_day, func.count(Interview.id))
+        .where(Interview.created_at >= start, Interview.created_at < end)
+        .group_by(Interview.user_id, interview_day)
+    )
+    yield "messages", (
+        select(Interview.user_id, message_day, func.count(Message.id))
+        .join(Interview, Interview.id == Message.interview_id)
+        .where(Message.created_at >= start, Message.created_at < end, Message.role != "system")
+        .group_by(Interview.user_id, message_day)
+    )
+    call_day = func.date(LlmCall.created_at)
+    yield "llm_calls", (
+        select(LlmCall.user_id, call_day, func.count(LlmCall.id))
+        # Ledger rows can outlive their user; rollups only keep existing accounts
+        .join(User, User.id == LlmCall.user_id)
+        .where(LlmCall.created_at >= start, LlmCall.created_at < end)
+        .group_by(LlmCall.user_id, call_day)
+    )
+    yield "summaries", (
+        select(Summary.user_id, summary_day, func.count(Summary.id))
+        .where(Summary.created_at >= start, Summary.created_at < end, original_summaries())
+        .group_by(Summary.user_id, summary_day)
+    )
+
+
+def _earliest_activity() -> Optional[date]:
+    first = db.session.execute(select(func.min(Interview.created_at))).scalar()
+    return first.date() if first else None
+
+
+def refresh_rollups(since: Optional[date] = None, rebuild: bool = False) -> int:
+    """Recount days from ``since`` (default: newest rolled-up day) through today.
+
+    Returns the number of rollup rows written. ``rebuild`` recounts everything,
+    e.g. after importing old data with historic timestamps.
+    """
+    if rebuild:
+        db.session.execute(delete(UsageRollup))
+        db.session.commit()
+        since = None
+    if since is None:
+        since = db.session.execute(select(func.max(UsageRollup.day))).scalar()
+        since = _as_date(since) if since else _earliest_activity()
+    if since is None:
+        return 0
+
+    written = 0
+    today = datetime.utcnow().date()
+    window_start = since
+    while window_start <= today:
+        window_end = min(window_start + _WINDOW, today + timedelta(days=1))
+        start_dt = datetime.combine(window_start, datetime.min.time())
+        end_dt = datetime.combine(window_end, datetime.min.time())
+
+        counts: Dict[Tuple[date, int], Dict[str, int]] = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+        for metric, stmt in _count_queries(start_dt, end_dt):
+            for user_id, day, n in db.session.execute(stmt):
+                counts[(_as_date(day), user_id)][metric] = n
+
+        db.session.execute(
+            delete(UsageRollup).where(UsageRollup.day >= window_start, UsageRollup.day < window_end)
+        )
+        rows = [{"day": day, "user_id": user_id, **values} for (day, user_id), values in counts.items()]
+        if rows:
+            db.session.execute(insert(UsageRollup), rows)
+        db.session.commit()
+        written += len(rows)
+        window_start = window_end
+    return written
+
+
+def rollups_as_of() -> Optional[date]:
+    day = db.session.execute(select(func.max(UsageRollup.day))).scalar()
+    return _as_date(day) if day else None
+
+
+def user_activity(user_ids: Iterable[int], days: int = 30) -> Dict[int, dict]:
+    """Recent and all-time totals for a page of users, in one grouped query."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    cutoff = datetime.utcnow().date() - timedelta(days=days - 1)
+
+    def recent(col):
+        return func.sum(case((UsageRollup.day >= cutoff, col), else_=0))
+
+    stmt = (
+        select(
+            UsageRollup.user_id,
+            recent(UsageRollup.interviews),
+            recent(UsageRollup.messages),
+            recent(UsageRollup.summaries),
+            recent(UsageRollup.llm_calls),
+            func.sum(UsageRollup.messages),
+            func.max(UsageRollup.day),
+        )
+        .where(UsageRollup.user_id.in_(user_ids))
+        .group_by(UsageRollup.user_id)
+    )
+    out = {}
+    for user_id, interviews, messages, summaries, llm_calls, messages_total, last_day in db.session.execute(stmt):
+        out[user_id] = {
+            "interviews": int(interviews or 0),
+            "messages": int(messages or 0),
+            "summaries": int(summaries or 0),
+            "llm_calls": int(llm_calls or 0),
+            "messages_total": int(messages_total or 0),
+            "last_active": _as_date(last_day) if last_day else None,
+        }
+    return out
+
+
+def daily_totals(days: int = 14) -> List[dict]:
+    """Site-wide totals per day, newest first."""
+    cutoff = datetime.utcnow().date() - timedelta(days=days - 1)
+    stmt = (
+        select(
+            UsageRollup.day,
+            func.count(UsageRollup.user_id),
+            func.sum(UsageRollup.interviews),
+            func.sum(UsageRollup.messages),
+            func.sum(UsageRollup.summaries),
+            func.sum(UsageRollup.llm_calls),
+        )
+        .where(UsageRollup.day >= cutoff)
+        .group_by(UsageRollup.day)
+        .order_by(UsageRollup.day.desc())
+    )
+    return [
+        {
+            "day": _as_date(day),
+            "active_users": int(active or 0),
+            "interviews": int(interviews or 0),
+            "messages": int(messages or 0),
+            "summaries": int(summaries or 0),
+            "llm_calls": int(llm_calls or 0),
+        }
+        for day, active, interviews, messages, summaries, llm_calls in db.session.execute(stmt)
+    ]
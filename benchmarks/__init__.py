@@ -0,0 +1,7 @@
+"""End-to-end benchmarks for the hot request paths.
+
+Run ``python -m benchmarks.run --help``. The suite fills a database with
+synthetic users, interviews and messages, drives the real app through the
+Flask test client with the offline ``stub`` LLM provider, and reports latency
+percentiles, SQL queries per request and memory for each scenario.
+"""
@@ -0,0 +1,302 @@
+"""Drive the app's hot paths through the Flask test client and report latency, queries and memory.
+
+    python -m benchmarks.run                          # fresh SQLite database in a temp dir
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json   # exit 1 on regressions
+    python -m benchmarks.run --database-uri mysql+pymysql://u:p@host/bench_db --users 200
+
+Against an existing database the synthetic users (``*@bench.example.invalid``)
+are created once and reused on later runs.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: Callable[[int], str]
+    data: Optional[Callable[[int], dict]] = None
+    enabled: bool = True
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # Nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _configure_environment(args, workdir: str) -> None:
+    # Config is read from the environment when the app package is imported
+    if args.database_uri:
+        os.environ["SQLALCHEMY_DATABASE_URI"] = args.database_uri
+    else:
+        os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+    os.environ["LLM_PROVIDER"] = "stub"
+    os.environ["LLM_STUB_DELAY"] = str(args.llm_delay)
+    os.environ.setdefault("BCRYPT_LOG_ROUNDS", "4")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    for name, sub in (("JINJA_CACHE_DIR", "jinja_cache"), ("PDF_CACHE_DIR", "pdf_cache"),
+                      ("UPLOAD_DIR", "uploads"), ("MEDIA_DIR", "media")):
+        os.environ.setdefault(name, os.path.join(workdir, sub))
+
+
+def build_scenarios(interview_ids: List[int], summarized_ids: List[int], pdf_enabled: bool) -> List[Scenario]:
+    def pick(ids):
+        return lambda i: ids[i % len(ids)]
+
+    any_interview = pick(interview_ids)
+    with_summary = pick(summarized_ids or interview_ids)
+    return [
+        Scenario("index", "GET", lambda i: "/"),
+        Scenario("list_interviews", "GET", lambda i: "/interview/"),
+        Scenario("view_interview", "GET", lambda i: f"/interview/{any_interview(i)}"),
+        Scenario("send_message", "POST", lambda i: f"/interview/{any_interview(i)}/send",
+                 data=lambda i: {"content": f"Benchmark answer {i}: we lived by the river near the mill."}),
+        Scenario("summarize_interview", "POST", lambda i: f"/interview/{any_interview(i)}/summarize"),
+        Scenario("view_summary", "GET", lambda i: f"/interview/{with_summary(i)}/summary"),
+        Scenario("export_markdown", "GET", lambda i: f"/interview/{with_summary(i)}/export/markdown"),
+        Scenario("export_pdf", "GET", lambda i: f"/interview/{with_summary(i)}/export/pdf", enabled=pdf_enabled),
+        Scenario("export_archive", "GET", lambda i: "/interview/export/archive"),
+    ]
+
+
+def watch_llm_connections(engine) -> List[int]:
+    """Record how many pooled connections this thread has checked out whenever the stub model is called.
+
+    The chat path ends its transaction before calling the provider, so every
+    entry should be 0. Connections held by background writers (the usage
+    ledger) are not counted.
+    """
+    from sqlalchemy import event
+    from app.services.providers.stub_provider import StubChatProvider
+
+    owners: Dict[int, int] = {}
+    event.listen(engine, "checkout", lambda _dbapi, record, _proxy: owners.__setitem__(id(record), threading.get_ident()))
+    event.listen(engine, "checkin", lambda _dbapi, record: owners.pop(id(record), None))
+
+    samples: List[int] = []
+    chat = StubChatProvider.chat
+
+    def _chat(self, messages):
+        me = threading.get_ident()
+        samples.append(sum(1 for owner in list(owners.values()) if owner == me))
+        return chat(self, messages)
+
+    StubChatProvider.chat = _chat
+    return samples
+
+
+def run_scenario(client, engine, scenario: Scenario, iterations: int, warmup: int, llm_samples: List[int]) -> dict:
+    from sqlalchemy import event
+
+    queries = [0]
+    # Background writers (the LLM usage ledger) use the same engine; count only this thread
+    thread = threading.get_ident()
+
+    def _count(*_args):
+        if threading.get_ident() == thread:
+            queries[0] += 1
+
+    def _request(i: int):
+        kwargs = {"data": scenario.data(i)} if scenario.data else {}
+        response = client.open(scenario.path(i), method=scenario.method, **kwargs)
+        body = response.get_data()  # drain streamed bodies
+        response.close()
+        return response.status_code, len(body)
+
+    for i in range(warmup):
+        _request(i)
+
+    del llm_samples[:]
+    event.listen(engine, "before_cursor_execute", _count)
+    latencies, query_counts, errors, size = [], [], 0, 0
+    try:
+        for i in range(warmup, warmup + iterations):
+            queries[0] = 0
+            started = time.perf_counter()
+            status, size = _request(i)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            query_counts.append(queries[0])
+            if status >= 400:
+                errors += 1
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    # One extra request under tracemalloc; kept out of the timed runs because it slows Python down
+    tracemalloc.start()
+    _request(warmup + iterations)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "n": iterations,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "queries": round(statistics.median(query_counts), 1),
+        "queries_max": max(query_counts),
+        "peak_kib": round(peak / 1024, 1),
+        "response_bytes": size,
+        "errors": errors,
+        "llm_calls": len(llm_samples),
+        "conns_during_llm": max(llm_samples, default=0),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, noise_ms: float) -> List[str]:
+    """Human-readable regressions of ``results`` against ``baseline``."""
+    problems = []
+    for name, now in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if now[key] > before[key] * (1 + tolerance) and now[key] - before[key] > noise_ms:
+                problems.append(f"{name}: {key} {before[key]} -> {now[key]}")
+        if now["queries"] > before["queries"]:
+            problems.append(f"{name}: queries {before['queries']} -> {now['queries']}")
+        if now["peak_kib"] > before["peak_kib"] * (1 + tolerance) and now["peak_kib"] - before["peak_kib"] > 256:
+            problems.append(f"{name}: peak memory {before['peak_kib']} KiB -> {now['peak_kib']} KiB")
+        if now["errors"] > before["errors"]:
+            problems.append(f"{name}: errors {before['errors']} -> {now['errors']}")
+    return problems
+
+
+def held_connections(results: dict) -> List[str]:
+    return [
+        f"{name}: {r['conns_during_llm']} pooled connection(s) checked out during an LLM call"
+        for name, r in results["scenarios"].items() if r.get("conns_during_llm")
+    ]
+
+
+def print_table(results: dict, baseline: Optional[dict]) -> None:
+    header = f"{'scenario':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'peak KiB':>10}{'errors':>8}{'llm conns':>11}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results["scenarios"].items():
+        line = (f"{name:<22}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+                f"{r['queries']:>9g}{r['peak_kib']:>10.0f}{r['errors']:>8}"
+                f"{(str(r['conns_during_llm']) if r['llm_calls'] else '-'):>11}")
+        before = (baseline or {}).get("scenarios", {}).get(name)
+        if before:
+            line += f"   (baseline p95 {before['p95_ms']:.1f}, queries {before['queries']:g})"
+        print(line)
+    print(f"max RSS {results['meta']['max_rss_mib']} MiB")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-uri", help="Database to fill and use (default: new SQLite file in a temp dir)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--interviews", type=int, default=10, help="Interviews per user")
+    parser.add_argument("--messages", type=int, default=40, help="Messages per interview")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=50, help="Timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="Seconds the stub LLM sleeps per call")
+    parser.add_argument("--only", action="append", help="Run only these scenarios (repeatable)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against this results file; exit 1 on regressions")
+    parser.add_argument("--save-baseline", help="Write results to this file as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown (default 0.2)")
+    parser.add_argument("--noise-ms", type=float, default=2.0, help="Ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cmh-bench-")
+    _configure_environment(args, workdir)
+
+    from app import create_app
+    from app.extensions import db
+    from app.models.interview import Interview
+    from app.models.summary import Summary
+    from app.services import pdf
+    from .synthetic import PASSWORD, Scale, bench_email, generate
+
+    app = create_app()
+    app.config["TESTING"] = True
+    scale = Scale(args.users, args.interviews, args.messages, args.seed)
+    with app.app_context():
+        started = time.perf_counter()
+        users = generate(scale)
+        print(f"data ready in {time.perf_counter() - started:.1f}s ({app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0]})")
+        user_id = users[bench_email(0)]
+        interview_ids = list(db.session.execute(
+            db.select(Interview.id).where(Interview.user_id == user_id).order_by(Interview.id)
+        ).scalars())
+        summarized_ids = list(db.session.execute(
+            db.select(Summary.interview_id).where(Summary.user_id == user_id, Summary.kind == "session").order_by(Summary.interview_id)
+        ).scalars())
+        engine = db.engine
+    llm_samples = watch_llm_connections(engine)
+
+    client = app.test_client()
+    response = client.post("/login", data={"email": bench_email(0), "password": PASSWORD})
+    if response.status_code != 302:
+        print("Could not sign in as the benchmark user", file=sys.stderr)
+        return 2
+
+    results = {
+        "meta": {
+            "users": scale.users, "interviews": scale.interviews, "messages": scale.messages,
+            "iterations": args.iterations, "llm_delay": args.llm_delay,
+            "database": engine.dialect.name, "python": platform.python_version(),
+        },
+        "scenarios": {},
+    }
+    for scenario in build_scenarios(interview_ids, summarized_ids, pdf.available()):
+        if not scenario.enabled or (args.only and scenario.name not in args.only):
+            continue
+        results["scenarios"][scenario.name] = run_scenario(client, engine, scenario, args.iterations, args.warmup, llm_samples)
+    # ru_maxrss is KiB on Linux
+    results["meta"]["max_rss_mib"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"wrote {path}")
+
+    held = held_connections(results)
+    if held:
+        print("CONNECTIONS HELD ACROSS LLM CALLS:")
+        for line in held:
+            print(f"  {line}")
+    if baseline is not None:
+        problems = compare(results, baseline, args.tolerance, args.noise_ms)
+        if problems:
+            print("REGRESSIONS:")
+            for line in problems:
+                print(f"  {line}")
+            return 1
+        print("no regressions against baseline")
+    return 1 if held else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+"""Deterministic synthetic data for benchmarks, written with bulk inserts."""
+from __future__ import annotations
+from typing import Dict, List
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import random
+from sqlalchemy import insert, select
+from app.extensions import db
+from app.models.interview import Interview, Message
+from app.models.persona import Persona
+from app.models.summary import Summary
+from app.models.user import User
+from app.services.passwords import hash_password
+
+
+EMAIL_DOMAIN = "bench.example.invalid"
+PASSWORD = "benchmark-password"
+
+_WORDS = (
+    "grandmother farm winter school church river father mother brother sister war letter train city "
+    "house garden wedding summer kitchen bread music dance teacher friend horse snow harvest store "
+    "radio car sunday holiday uncle aunt cousin village mountain ocean ship factory nurse doctor"
+).split()
+_TOPICS = ("Childhood", "Family", "School", "Work and Career", "Marriage", "Travel", "Traditions", "Military Service")
+
+
+@dataclass
+class Scale:
+    users: int = 20
+    interviews: int = 10  # per user
+    messages: int = 40  # per interview
+    seed: int = 1
+
+
+def bench_email(n: int) -> str:
+    return f"user{n}@{EMAIL_DOMAIN}"
+
+
+def _sentence(rng: random.Random, lo: int, hi: int) -> str:
+    words = rng.choices(_WORDS, k=rng.randint(lo, hi))
+    return " ".join(words).capitalize() + "."
+
+
+def existing_users() -> Dict[str, int]:
+    rows = db.session.execute(select(User.email, User.id).where(User.email.like(f"%@{EMAIL_DOMAIN}")))
+    return dict(rows.all())
+
+
+def generate(scale: Scale) -> Dict[str, int]:
+    """Create the synthetic data set unless it already exists; returns {email: user id}."""
+    users = existing_users()
+    if users:
+        return users
+    rng = random.Random(scale.seed)
+    password_hash = hash_password(PASSWORD)
+    start = datetime.utcnow() - timedelta(days=90)
+
+    db.session.execute(insert(User), [
+        {"email": bench_email(n), "name": f"Bench User {n}", "password_hash": password_hash,
+         "is_admin": False, "created_at": start, "version": 0}
+        for n in range(scale.users)
+    ])
+    users = existing_users()
+    user_ids = [users[bench_email(n)] for n in range(scale.users)]
+
+    db.session.execute(insert(Persona), [
+        {"user_id": uid, "name": "My interviewer", "description": "Synthetic persona", "is_default": True,
+         "is_system": False, "created_at": start, "updated_at": start}
+        for uid in user_ids
+    ])
+
+    interview_rows = []
+    for uid in user_ids:
+        for n in range(scale.interviews):
+            interview_rows.append({
+                "user_id": uid,
+                "title": f"{_TOPICS[n % len(_TOPICS)]} {n}",
+                "created_at": start + timedelta(days=n, seconds=uid),
+            })
+    db.session.execute(insert(Interview), interview_rows)
+    interviews: List[tuple] = db.session.execute(
+        select(Interview.id, Interview.user_id, Interview.created_at).where(Interview.user_id.in_(user_ids))
+    ).all()
+
+    batch: List[dict] = []
+    summaries: List[dict] = []
+    for interview_id, user_id, created_at in interviews:
+        for n in range(scale.messages):
+            role = "assistant" if n % 2 == 0 else "user"
+            text = _sentence(rng, 6, 14) if role == "assistant" else " ".join(_sentence(rng, 8, 30) for _ in range(rng.randint(1, 4)))
+            batch.append({"interview_id": interview_id, "role": role, "content": text,
+                          "created_at": created_at + timedelta(minutes=n)})
+        if interview_id % 2 == 0:
+            body = "".join(f"<section><h3>Chapter {c} 🔸</h3><p>{_sentence(rng, 40, 80)}</p></section>" for c in range(5))
+            summaries.append({"user_id": user_id, "interview_id": interview_id, "kind": "session", "format": "html",
+                              "content": f"<h1>From the personal history of Bench User ❤️</h1>{body}",
+                              "created_at": created_at, "updated_at": created_at})
+        if len(batch) >= 5000:
+            db.session.execute(insert(Message), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Message), batch)
+    if summaries:
+        db.session.execute(insert(Summary), summaries)
+    db.session.commit()
+    return users
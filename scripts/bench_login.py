@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Measure sign-in throughput through the bounded bcrypt pool.
+
+Runs --logins password verifications from --concurrency request threads while
+a background loop times a small CPU-bound "chat" task, so you can see both the
+login rate and how much sign-ins slow everything else down.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.passwords import PasswordHasher, calibrate_rounds
+
+
+def _chat_like_task() -> None:
+    # Roughly the pure-Python work of rendering a transcript page
+    sum(i * i for i in range(20000))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16, help="Simulated request threads")
+    parser.add_argument("--workers", type=int, default=2, help="PASSWORD_HASH_WORKERS")
+    parser.add_argument("--rounds", type=int, help="bcrypt cost (default: calibrate to --target-ms)")
+    parser.add_argument("--target-ms", type=float, default=250)
+    args = parser.parse_args()
+
+    rounds = args.rounds or calibrate_rounds(args.target_ms)
+    hasher = PasswordHasher(workers=args.workers, queue_size=args.concurrency, wait_seconds=600, rounds=rounds)
+    stored = hasher.hash("correct horse battery staple")
+
+    chat_latencies = []
+    stop = threading.Event()
+
+    def chat_loop():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            _chat_like_task()
+            chat_latencies.append((time.perf_counter() - t0) * 1000)
+
+    # Baseline chat latency with no logins running
+    for _ in range(20):
+        t0 = time.perf_counter()
+        _chat_like_task()
+        chat_latencies.append((time.perf_counter() - t0) * 1000)
+    idle_chat = statistics.median(chat_latencies)
+    chat_latencies.clear()
+
+    login_latencies = []
+
+    def one_login(_):
+        t0 = time.perf_counter()
+        assert hasher.verify(stored, "correct horse battery staple")
+        login_latencies.append((time.perf_counter() - t0) * 1000)
+
+    chatter = threading.Thread(target=chat_loop, daemon=True)
+    chatter.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one_login, range(args.logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    chatter.join()
+
+    login_latencies.sort()
+    p95 = login_latencies[int(0.95 * (len(login_latencies) - 1))]
+    print(f"bcrypt cost {rounds}, {args.workers} hashing threads, {args.concurrency} request threads")
+    print(f"logins: {args.logins} in {elapsed:.2f}s = {args.logins / elapsed:.1f}/s "
+          f"(p50 {statistics.median(login_latencies):.0f} ms, p95 {p95:.0f} ms)")
+    if chat_latencies:
+        print(f"chat-like task: idle p50 {idle_chat:.1f} ms, during logins p50 {statistics.median(chat_latencies):.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Copy static files into static/dist under content-hashed names.
+
+Writes <name>.<hash>.<ext> for every file in static/ (except sources like
+input.css), gzip and brotli siblings for text formats, and manifest.json.
+Run after `npm run build:css` and before (re)starting the app. Brotli output
+needs the optional `brotli` package; without it only .gz files are written.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.assets import COMPRESSIBLE_EXTENSIONS, DIST_DIRNAME, MANIFEST_NAME
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # optional
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), '..', 'static')
+# Build inputs that are never linked from pages
+SKIP = {"css/input.css"}
+
+
+def _write(path: str, data: bytes) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def collect(static_dir: str, prune: bool = False) -> dict:
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root) == os.path.abspath(static_dir) and DIST_DIRNAME in dirs:
+            dirs.remove(DIST_DIRNAME)
+        for name in sorted(files):
+            src = os.path.join(root, name)
+            rel = os.path.relpath(src, static_dir).replace(os.sep, "/")
+            if rel in SKIP:
+                continue
+            with open(src, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            stem, ext = os.path.splitext(rel)
+            hashed = f"{stem}.{digest}{ext}"
+            dest = os.path.join(dist_dir, hashed)
+            manifest[rel] = hashed
+            if os.path.exists(dest):
+                continue
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            _write(dest, data)
+            if ext.lower() in COMPRESSIBLE_EXTENSIONS:
+                # mtime=0 keeps the .gz bytes identical across builds
+                _write(dest + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write(dest + ".br", brotli.compress(data, quality=11))
+            print(f"{rel} -> {hashed}")
+
+    _write(os.path.join(dist_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+
+    if prune:
+        keep = set(manifest.values()) | {MANIFEST_NAME}
+        for root, _dirs, files in os.walk(dist_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                rel = os.path.relpath(path, dist_dir).replace(os.sep, "/")
+                base = rel[:-3] if rel.endswith((".gz", ".br")) else rel
+                if base not in keep:
+                    os.remove(path)
+                    print(f"removed {rel}")
+    return manifest
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--static-dir", default=STATIC_DIR)
+    parser.add_argument("--prune", action="store_true",
+                        help="Delete hashed files no longer in the manifest (keep them until old pages are gone)")
+    args = parser.parse_args()
+    manifest = collect(os.path.abspath(args.static_dir), prune=args.prune)
+    print(f"{len(manifest)} file(s) in manifest" + ("" if brotli else " (brotli not installed, .br skipped)"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
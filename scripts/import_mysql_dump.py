@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.services.dump_import import DumpImporter
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Import a legacy mysqldump file into the current database without touching existing rows."
+    )
+    parser.add_argument("dump", help="Path to the .sql dump (UTF-8 or UTF-16, detected automatically)")
+    parser.add_argument("--source", help="Name used for checkpoints; re-use it to resume (default: file name + size)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per transaction (default: 1000)")
+    parser.add_argument("--pause-ms", type=int, default=0, help="Sleep between chunks to leave room for live traffic")
+    parser.add_argument("--encoding", help="Override encoding detection, e.g. utf-16")
+    parser.add_argument("--fix-mojibake", action="store_true",
+                        help="Repair UTF-8 text that was mangled through code page 437 (PowerShell redirects)")
+    parser.add_argument("--restart", action="store_true", help="Forget previous progress for this source and start over")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.dump):
+        print(f"Dump not found: {args.dump}")
+        return 2
+
+    app = create_app()
+    with app.app_context():
+        importer = DumpImporter(
+            args.dump,
+            source=args.source,
+            batch_size=args.batch_size,
+            pause=args.pause_ms / 1000.0,
+            fix_mojibake=args.fix_mojibake,
+            encoding=args.encoding,
+        )
+        if args.restart:
+            importer.reset()
+        stats = importer.run()
+        for table, counts in stats.items():
+            print(f"- {table}: inserted={counts['inserted']} matched={counts['matched']} skipped={counts['skipped']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.services.uploads import purge_stale_uploads
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Delete chunked uploads that were abandoned part-way.")
+    parser.add_argument("--hours", type=float, default=72, help="Remove uploads untouched for this long (default: 72)")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        removed = purge_stale_uploads(timedelta(hours=args.hours))
+    print(f"Removed {removed} stale upload(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
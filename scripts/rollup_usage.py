@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.services.usage import refresh_rollups
+from app.services.chat_turns import prune_turns
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Update the per-user daily usage rollups shown on the admin dashboard and prune expired chat-turn idempotency keys. Run it periodically (e.g. every 10 minutes)."
+    )
+    parser.add_argument("--since", type=date.fromisoformat, help="Recount from this day (YYYY-MM-DD) instead of the newest rolled-up day")
+    parser.add_argument("--rebuild", action="store_true", help="Discard all rollups and recount from the first interview")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        written = refresh_rollups(since=args.since, rebuild=args.rebuild)
+        pruned = prune_turns()
+    print(f"Wrote {written} rollup row(s), pruned {pruned} expired chat turn(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.services.transcription import run_pending_jobs
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Run queued transcription jobs (and ones interrupted by a restart)."
+    )
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="Keep running, checking for new jobs every SECONDS")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        while True:
+            ran = run_pending_jobs()
+            if ran:
+                print(f"Ran {ran} transcription job(s)")
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
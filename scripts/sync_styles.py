@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.services.style_sync import StyleSyncError, sync_from_yaml
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Sync communication styles and system personas from a YAML file.")
+    parser.add_argument("path", nargs="?", help="YAML file (default: ses_specs/comm_styles.yaml)")
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would change")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        try:
+            plan = sync_from_yaml(args.path, dry_run=args.dry_run)
+        except (OSError, yaml.YAMLError, StyleSyncError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    for change in plan.changes:
+        print(change.describe())
+    print(("Dry run: " if args.dry_run else "") + plan.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
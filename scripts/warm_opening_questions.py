@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.services.opening_questions import warm
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Pre-generate the first interview question for each recommended topic, for the system default persona and the default personas of recently active users. Run it periodically (e.g. nightly)."
+    )
+    parser.add_argument("--topic", action="append", help="Only warm this topic (repeatable); default is every recommended topic")
+    parser.add_argument("--force", action="store_true", help="Regenerate every entry, even fresh ones")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        stats = warm(topics=args.topic, force=args.force)
+        app.extensions["llm_ledger"].flush()
+    print(f"Generated {stats['generated']}, {stats['fresh']} already fresh, {stats['failed']} failed")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
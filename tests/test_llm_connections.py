@@ -0,0 +1,120 @@
+"""No pooled database connection may be checked out while the chat model works.
+
+Drives send, change-topic and summarize against SQLite with the stub provider
+and records, at every model call, how many connections the request thread
+holds.
+"""
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+_tmp = tempfile.mkdtemp(prefix="cmh-test-")
+os.environ.update(
+    SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(_tmp, 'app.db')}",
+    SECRET_KEY="test",
+    LLM_PROVIDER="stub",
+    LLM_STUB_DELAY="0",
+    BCRYPT_LOG_ROUNDS="4",
+    OPENING_QUESTIONS="false",
+    UPLOAD_DIR=os.path.join(_tmp, "uploads"),
+    MEDIA_DIR=os.path.join(_tmp, "media"),
+    JINJA_CACHE_DIR=os.path.join(_tmp, "jinja_cache"),
+    PDF_CACHE_DIR=os.path.join(_tmp, "pdf_cache"),
+    PROFILE_DIR=os.path.join(_tmp, "profiles"),
+)
+
+import pytest  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models.interview import Interview, Message  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.providers.stub_provider import StubChatProvider  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        user = User(name="Tester", email="tester@example.com")
+        user.set_password("secret")
+        db.session.add(user)
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def held_during_llm(app, monkeypatch):
+    """List that gets, per model call, the connections the calling thread has checked out."""
+    with app.app_context():
+        engine = db.engine
+    owners = {}
+
+    def _checkout(_dbapi, record, _proxy):
+        owners[id(record)] = threading.get_ident()
+
+    def _checkin(_dbapi, record):
+        owners.pop(id(record), None)
+
+    event.listen(engine, "checkout", _checkout)
+    event.listen(engine, "checkin", _checkin)
+    samples = []
+    chat = StubChatProvider.chat
+
+    def _chat(self, messages):
+        me = threading.get_ident()
+        samples.append(sum(1 for owner in list(owners.values()) if owner == me))
+        return chat(self, messages)
+
+    monkeypatch.setattr(StubChatProvider, "chat", _chat)
+    yield samples
+    event.remove(engine, "checkout", _checkout)
+    event.remove(engine, "checkin", _checkin)
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post("/login", data={"email": "tester@example.com", "password": "secret"})
+    return client
+
+
+@pytest.fixture
+def interview_id(app):
+    with app.app_context():
+        user = User.query.filter_by(email="tester@example.com").one()
+        interview = Interview(user_id=user.id, title="Childhood")
+        db.session.add(interview)
+        db.session.flush()
+        db.session.add(Message(interview_id=interview.id, role="assistant", content="Where did you grow up?"))
+        db.session.commit()
+        return interview.id
+
+
+@pytest.mark.parametrize("path, data", [
+    ("send", {"content": "On a farm near the river."}),
+    ("change-topic", {}),
+    ("summarize", {}),
+])
+def test_no_connection_held_during_llm_call(client, interview_id, held_during_llm, path, data):
+    response = client.post(f"/interview/{interview_id}/{path}", data=data)
+    assert response.status_code == 302
+    assert held_during_llm, "the model was not called"
+    assert held_during_llm == [0] * len(held_during_llm)
+
+
+def test_chat_refuses_uncommitted_writes(app):
+    from sqlalchemy import update
+    from app.services.llm import _chat
+
+    with app.app_context():
+        db.session.execute(update(User).values(name="Changed"))
+        with pytest.raises(RuntimeError):
+            _chat([{"role": "user", "content": "hi"}], purpose="test")
+        db.session.rollback()
+        assert User.query.filter_by(name="Changed").count() == 0